@@ -0,0 +1,256 @@
+import os
+import threading
+from dataclasses import dataclass, field
+
+from engine import PAGE_BATCH_SIZE
+from native_converters import native_route
+
+# 메모리 기반 작업 승인 제어
+# 페이지 수/페이지 이미지 크기/변환 옵션으로 작업 하나의 최대 메모리 사용량을 추정하고,
+# 현재 여유 메모리에 맞춰 바로 실행(admit), 대기(queue), 거절(reject)을 결정합니다.
+# 여유가 부족하면 Marker 내부 배치 크기를 줄인 설정으로 먼저 실행을 시도합니다.
+
+ADMIT = "admit"
+QUEUE = "queue"
+REJECT = "reject"
+
+# 컨테이너 전체 메모리 중 변환에 쓸 수 있는 비율과 항상 남겨 둘 여유분
+MEMORY_BUDGET_FRACTION = float(os.environ.get("MARKER_MEMORY_BUDGET", "0.85"))
+SAFETY_MARGIN_MB = int(os.environ.get("MARKER_MEMORY_MARGIN_MB", "512"))
+# 파이프라인 고정 작업 메모리 (provider, 중간 객체, 파이썬 할당 등)
+BASE_JOB_MB = int(os.environ.get("MARKER_JOB_BASE_MB", "600"))
+LLM_OVERHEAD_MB = 300
+
+# Marker 1.8 CPU 기본 배치 크기 - 메모리 압박 시 이 값에 배율을 곱해 줄임
+MARKER_BATCH_DEFAULTS = {
+    "layout_batch_size": 6,
+    "detection_batch_size": 4,
+    "ocr_error_batch_size": 4,
+    "recognition_batch_size": 32,
+    "table_rec_batch_size": 6,
+}
+# 배치 크기 배율 후보 (큰 것부터 시도)
+BATCH_SCALES = (1.0, 0.5, 0.25)
+
+# 모델 배치 항목 하나당 활성화 메모리 (CPU fp32 기준 대략값, MB)
+ACTIVATION_MB = {
+    "layout_batch_size": 160,
+    "detection_batch_size": 140,
+    "ocr_error_batch_size": 40,
+    "recognition_batch_size": 10,
+    "table_rec_batch_size": 120,
+}
+
+# DocumentBuilder가 페이지마다 만드는 저해상도/고해상도 RGB 이미지
+LOWRES_DPI = 96
+HIGHRES_DPI = 192
+DEFAULT_PAGE_POINTS = (612, 792)
+# 추출 이미지는 문서 전체 동안 보관 - 고해상도 페이지 면적 대비 평균 비율
+EXTRACTED_IMAGE_RATIO = 0.25
+# PDF가 아닌 형식은 페이지 수를 모르므로 파일 크기로 추정 (provider가 PDF로 변환)
+NON_PDF_BYTES_PER_PAGE = 40 * 1024
+NON_PDF_MAX_PAGES = 200
+NON_PDF_CONVERSION_FACTOR = 20
+# 모델 없이 변환하는 HTML/XLSX/DOCX는 파싱 트리 메모리만 필요
+NATIVE_BASE_MB = 64
+NATIVE_PARSE_FACTOR = 10
+
+MB = 1024 * 1024
+
+
+class JobTooLarge(Exception):
+    def __init__(self, estimate, capacity):
+        super().__init__(
+            f"예상 메모리 {estimate / 1024 ** 3:.1f}GB가 처리 가능한 최대치 {max(capacity, 0) / 1024 ** 3:.1f}GB를 넘습니다"
+        )
+        self.estimate = estimate
+        self.capacity = capacity
+
+
+def batch_settings(scale):
+    # Marker config에 그대로 넣을 배치 크기 (최소 1)
+    return {key: max(1, int(value * scale)) for key, value in MARKER_BATCH_DEFAULTS.items()}
+
+
+def page_batch_size(scale):
+    return max(1, int(PAGE_BATCH_SIZE * scale))
+
+
+def _page_sizes(path):
+    if not path.lower().endswith(".pdf"):
+        return None
+    try:
+        import pypdfium2
+        document = pypdfium2.PdfDocument(path)
+        try:
+            return [document.get_page_size(index) for index in range(len(document))]
+        finally:
+            document.close()
+    except Exception:
+        return None
+
+
+def _image_bytes(points, dpi):
+    width, height = points
+    return int(width / 72 * dpi) * int(height / 72 * dpi) * 3
+
+
+@dataclass
+class FootprintEstimate:
+    page_count: int
+    # 배율별 예상 최대 메모리 {배율: 바이트}
+    by_scale: dict = field(default_factory=dict)
+    shards: int = 1
+
+    @property
+    def minimum(self):
+        return min(self.by_scale.values())
+
+    def as_dict(self):
+        return {
+            "page_count": self.page_count,
+            "shards": self.shards,
+            "bytes_by_scale": {str(scale): value for scale, value in self.by_scale.items()},
+        }
+
+
+def estimate_footprint(path, options, page_count=None, shards=1):
+    if native_route(path):
+        native_bytes = NATIVE_BASE_MB * MB + os.path.getsize(path) * NATIVE_PARSE_FACTOR
+        return FootprintEstimate(page_count=1, by_scale={scale: native_bytes for scale in BATCH_SCALES})
+
+    sizes = _page_sizes(path)
+    if sizes:
+        page_count = len(sizes)
+        # 배치에는 큰 페이지가 몰릴 수 있으므로 가장 큰 페이지 기준
+        largest = max(sizes, key=lambda size: size[0] * size[1])
+        extra = 0
+    else:
+        file_size = os.path.getsize(path) if os.path.exists(path) else 0
+        if page_count is None:
+            page_count = max(1, min(NON_PDF_MAX_PAGES, file_size // NON_PDF_BYTES_PER_PAGE))
+        largest = DEFAULT_PAGE_POINTS
+        extra = file_size * NON_PDF_CONVERSION_FACTOR
+
+    per_page_images = _image_bytes(largest, LOWRES_DPI) + _image_bytes(largest, HIGHRES_DPI)
+    extracted = 0
+    if options.extract_images:
+        extracted = int(page_count * _image_bytes(largest, HIGHRES_DPI) * EXTRACTED_IMAGE_RATIO)
+    fixed = BASE_JOB_MB * MB + extra + (LLM_OVERHEAD_MB * MB if options.use_llm else 0)
+
+    estimate = FootprintEstimate(page_count=page_count, shards=shards)
+    for scale in BATCH_SCALES:
+        # 샤드마다 자기 페이지 배치 이미지와 모델 활성화 메모리를 따로 가짐
+        pages_in_batch = min(page_count, page_batch_size(scale))
+        activations = max(
+            ACTIVATION_MB[key] * size * MB for key, size in batch_settings(scale).items()
+        )
+        working_set = pages_in_batch * per_page_images + activations
+        estimate.by_scale[scale] = fixed + extracted + working_set * shards
+    return estimate
+
+
+def _memory():
+    try:
+        import psutil
+        memory = psutil.virtual_memory()
+        return memory.total, memory.available
+    except Exception:
+        return None, None
+
+
+class AdmissionController:
+    def __init__(self, budget_fraction=MEMORY_BUDGET_FRACTION, margin_bytes=SAFETY_MARGIN_MB * MB):
+        self.budget_fraction = budget_fraction
+        self.margin_bytes = margin_bytes
+        self._lock = threading.Lock()
+        # 실행 중인 작업의 예약 메모리 {작업 ID: 바이트}
+        self._reservations = {}
+        self.rejected = 0
+        self.shrunk = 0
+
+    def _model_bytes(self):
+        from model_registry import get_registry
+        return get_registry().resident_bytes or 0
+
+    def capacity(self):
+        # 아무 작업도 없을 때 작업 하나가 쓸 수 있는 최대 메모리 (None이면 제한 없음)
+        total, _ = _memory()
+        if total is None:
+            return None
+        return int(total * self.budget_fraction) - self._model_bytes() - self.margin_bytes
+
+    def headroom(self):
+        # 예약 기준 여유와 실제 여유 메모리 중 작은 값
+        total, available = _memory()
+        if total is None:
+            return None
+        with self._lock:
+            reserved = sum(self._reservations.values())
+        by_budget = int(total * self.budget_fraction) - self._model_bytes() - reserved
+        by_live = available - self.margin_bytes
+        return min(by_budget, by_live)
+
+    def check(self, estimate):
+        # 제출 시점 확인: 가장 작은 배치로도 최대치를 넘으면 거절
+        capacity = self.capacity()
+        if capacity is not None and estimate.minimum > capacity:
+            self.rejected += 1
+            raise JobTooLarge(estimate.minimum, capacity)
+
+    def decide(self, estimate, running):
+        # (결정, 배율) - 여유가 되는 가장 큰 배치 배율을 고름
+        headroom = self.headroom()
+        if headroom is None:
+            return ADMIT, BATCH_SCALES[0]
+        for scale in BATCH_SCALES:
+            if estimate.by_scale[scale] <= headroom:
+                return ADMIT, scale
+        capacity = self.capacity()
+        if estimate.minimum > capacity:
+            return REJECT, BATCH_SCALES[-1]
+        if running == 0:
+            # 실행 중인 작업이 없으면 더 기다려도 여유가 늘지 않으므로 가장 작은 배치로 실행
+            return ADMIT, BATCH_SCALES[-1]
+        return QUEUE, None
+
+    def reserve(self, job_id, estimate, scale):
+        if scale < BATCH_SCALES[0]:
+            self.shrunk += 1
+        with self._lock:
+            self._reservations[job_id] = estimate.by_scale[scale]
+
+    def release(self, job_id):
+        with self._lock:
+            self._reservations.pop(job_id, None)
+
+    def pressure_scale(self):
+        # 실행 중에 실제 여유 메모리가 줄면 다음 페이지 배치부터 배치 크기를 더 줄임
+        _, available = _memory()
+        if available is None:
+            return BATCH_SCALES[0]
+        if available < self.margin_bytes:
+            return BATCH_SCALES[-1]
+        if available < self.margin_bytes * 4:
+            return BATCH_SCALES[1]
+        return BATCH_SCALES[0]
+
+    def stats(self):
+        with self._lock:
+            reserved = sum(self._reservations.values())
+            running = len(self._reservations)
+        return {
+            "capacity_bytes": self.capacity(),
+            "headroom_bytes": self.headroom(),
+            "reserved_bytes": reserved,
+            "reserved_jobs": running,
+            "rejected": self.rejected,
+            "shrunk": self.shrunk,
+        }
+
+
+_controller = AdmissionController()
+
+
+def get_admission_controller():
+    return _controller
@@ -0,0 +1,405 @@
+import email.message
+import json
+import os
+import re
+import shutil
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from admission import JobTooLarge
+from asset_store import ASSET_MIME_TYPES, get_asset_store
+from engine import ConversionOptions
+from exports import export_name, export_path
+from ingest import UploadTooLarge, spool_upload
+from jobs import JobQueueFull, get_job_manager
+from metrics import job_trace, render_prometheus
+from model_registry import get_registry
+from renderers import MIME_TYPES, OUTPUT_FORMATS
+from result_cache import cache_key, get_result_cache
+from warmup import get_warmup
+
+# Streamlit 없이 변환 파이프라인을 호출하는 헤드리스 HTTP API
+# UI와 같은 프로세스에서 띄우면 같은 모델 레지스트리/작업 관리자/결과 캐시를 공유합니다.
+#
+#   POST   /v1/convert             multipart/form-data(file 필드) 또는 본문 그대로 업로드 -> job_id
+#   GET    /v1/jobs/<id>           작업 상태
+#   GET    /v1/jobs/<id>/result    변환 결과 (?format=markdown|json|html)
+#   DELETE /v1/jobs/<id>           작업 취소
+#   GET    /v1/jobs/<id>/trace     단계별 타임라인
+#   GET    /v1/results/<key>       캐시된 결과 (?format=...)
+#          (?bundle=1 이면 문서 + assets/ 이미지를 묶은 ZIP)
+#   GET    /v1/assets/<이름>         추출 이미지 (결과 안의 assets/ 상대 경로가 그대로 이 경로로 풀림)
+#   GET    /metrics                Prometheus 텍스트 형식 지표
+#   GET    /healthz                상태 확인
+#   GET    /readyz                 모델 준비 완료 여부 (준비 전 503)
+
+API_HOST = os.environ.get("MARKER_API_HOST", "127.0.0.1")
+API_MAX_UPLOAD_MB = int(os.environ.get("MARKER_API_MAX_UPLOAD_MB", os.environ.get("MARKER_MAX_UPLOAD_MB", "50")))
+# ?wait=초 로 요청하면 결과가 나올 때까지 응답을 붙잡아 두는 최대 시간
+API_MAX_WAIT_SECONDS = 600
+API_POLL_SECONDS = 0.2
+# multipart 본문을 소켓에서 읽는 단위와 part 헤더 최대 크기
+MULTIPART_CHUNK_BYTES = 256 * 1024
+MULTIPART_MAX_HEADER_BYTES = 16 * 1024
+
+_JOB_PATH_RE = re.compile(r"^/v1/jobs/([0-9a-f]{32})(/result|/trace)?$")
+_RESULT_PATH_RE = re.compile(r"^/v1/results/([0-9a-f]{64})$")
+# /v1/jobs/<id>/result, /v1/results/<key> 기준 상대 경로 assets/<이름> 도 허용
+_ASSET_PATH_RE = re.compile(r"^/v1/(?:jobs/[0-9a-f]{32}/|results/)?assets/([0-9a-f]{32}\.(?:webp|png))$")
+
+
+class ApiError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def _flag(query, name, default):
+    values = query.get(name)
+    if not values:
+        return default
+    return values[0].lower() in ("1", "true", "yes", "on")
+
+
+def _output_format(query):
+    output_format = (query.get("format") or ["markdown"])[0]
+    if output_format not in OUTPUT_FORMATS:
+        raise ApiError(400, f"지원하지 않는 출력 형식입니다: {output_format}")
+    return output_format
+
+
+def job_status(job):
+    return {
+        "job_id": job.id,
+        "filename": job.filename,
+        "state": job.state,
+        "cache_key": job.cache_key,
+        "pages_done": job.pages_done,
+        "page_count": job.page_count,
+        "progress": job.progress,
+        "queue_wait": round(job.queue_wait, 3),
+        "elapsed": round(job.elapsed, 3),
+        "sharded": job.sharded,
+        "error": str(job.error) if job.error else None,
+    }
+
+
+class _BodyReader:
+    # Content-Length만큼만 읽는 파일 객체 (소켓에서 바로 디스크로 스풀)
+    def __init__(self, rfile, length):
+        self._rfile = rfile
+        self._remaining = length
+
+    def read(self, size=-1):
+        if self._remaining <= 0:
+            return b""
+        if size < 0 or size > self._remaining:
+            size = self._remaining
+        chunk = self._rfile.read(size)
+        self._remaining -= len(chunk)
+        return chunk
+
+
+def _header_params(name, value):
+    # Content-Type/Content-Disposition 매개변수 해석은 표준 email 모듈에 맡김 (filename*= 등)
+    message = email.message.Message()
+    message[name] = value
+    return message
+
+
+class _MultipartReader:
+    # multipart/form-data 본문을 스트리밍으로 나눔 - part 본문은 청크 단위로만 메모리에 올라옴
+    def __init__(self, stream, boundary):
+        self._stream = stream
+        self._delimiter = b"\r\n--" + boundary.encode("latin-1")
+        # 첫 구분자 앞에는 줄바꿈이 없으므로 붙여서 이후 구분자와 같은 규칙으로 찾음
+        self._buffer = b"\r\n"
+
+    def _fill(self):
+        chunk = self._stream.read(MULTIPART_CHUNK_BYTES)
+        if not chunk:
+            raise ApiError(400, "multipart 본문이 중간에 끝났습니다")
+        self._buffer += chunk
+
+    def next_part(self):
+        # 다음 part의 헤더 (email.message.Message), 마지막 구분자면 None
+        while True:
+            index = self._buffer.find(self._delimiter)
+            if index >= 0:
+                break
+            # 구분자가 청크 경계에 걸칠 수 있으므로 끝부분은 남겨 둠
+            self._buffer = self._buffer[-len(self._delimiter):]
+            self._fill()
+        self._buffer = self._buffer[index + len(self._delimiter):]
+        while len(self._buffer) < 2:
+            self._fill()
+        if self._buffer.startswith(b"--"):
+            return None
+        while b"\r\n\r\n" not in self._buffer:
+            if len(self._buffer) > MULTIPART_MAX_HEADER_BYTES:
+                raise ApiError(400, "multipart part 헤더가 너무 깁니다")
+            self._fill()
+        head, self._buffer = self._buffer.split(b"\r\n\r\n", 1)
+        headers = email.message.Message()
+        # 첫 줄은 구분자 줄의 나머지(공백)이므로 건너뜀
+        for line in head.split(b"\r\n")[1:]:
+            name, _, value = line.decode("utf-8", "replace").partition(":")
+            if name.strip():
+                headers[name.strip()] = value.strip()
+        return headers
+
+    def iter_content(self):
+        # 현재 part 본문을 다음 구분자 직전까지 청크로 돌려줌
+        while True:
+            index = self._buffer.find(self._delimiter)
+            if index >= 0:
+                if index:
+                    yield self._buffer[:index]
+                self._buffer = self._buffer[index:]
+                return
+            safe = len(self._buffer) - len(self._delimiter)
+            if safe > 0:
+                yield self._buffer[:safe]
+                self._buffer = self._buffer[safe:]
+            self._fill()
+
+
+class _ChunkReader:
+    # 청크 iterator를 spool_upload가 읽는 파일 객체로 감쌈
+    def __init__(self, chunks):
+        self._chunks = chunks
+
+    def read(self, size=-1):
+        return next(self._chunks, b"")
+
+
+class ConversionRequestHandler(BaseHTTPRequestHandler):
+    server_version = "MarkerAPI/1.0"
+
+    def log_message(self, format, *args):
+        if os.environ.get("MARKER_API_LOG"):
+            super().log_message(format, *args)
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False, default=str).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_text(self, status, text, content_type):
+        body = text.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", f"{content_type}; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_file(self, path, content_type, headers=None):
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(os.path.getsize(path)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        with open(path, "rb") as source:
+            shutil.copyfileobj(source, self.wfile)
+
+    def _dispatch(self, handler):
+        try:
+            handler(urlparse(self.path))
+        except ApiError as e:
+            self._send_json(e.status, {"error": str(e)})
+        except Exception as e:
+            self._send_json(500, {"error": f"{type(e).__name__}: {e}"})
+
+    def do_GET(self):
+        self._dispatch(self._get)
+
+    def do_POST(self):
+        self._dispatch(self._post)
+
+    def do_DELETE(self):
+        self._dispatch(self._delete)
+
+    def _get(self, url):
+        query = parse_qs(url.query)
+        if url.path == "/readyz":
+            # 모델이 메모리에 올라와 첫 요청도 바로 변환할 수 있는지 (로드 밸런서 준비 확인용)
+            ready = get_registry().loaded
+            self._send_json(200 if ready else 503, {"ready": ready, "warmup": get_warmup().stats()})
+            return
+        if url.path == "/healthz":
+            self._send_json(200, {
+                "status": "ok",
+                "models_loaded": get_registry().loaded,
+                "warmup": get_warmup().stats(),
+                "jobs": get_job_manager().stats(),
+                "cache": get_result_cache().stats(),
+            })
+            return
+        if url.path == "/metrics":
+            self._send_text(200, render_prometheus(), "text/plain; version=0.0.4")
+            return
+
+        match = _ASSET_PATH_RE.match(url.path)
+        if match:
+            store = get_asset_store()
+            path = store.path(match.group(1))
+            if not os.path.exists(path):
+                raise ApiError(404, "이미지를 찾을 수 없습니다")
+            # 파일 이름이 내용 해시이므로 영구 캐시 가능
+            self._send_file(path, ASSET_MIME_TYPES[path.rsplit(".", 1)[-1]], {
+                "Cache-Control": "public, max-age=31536000, immutable",
+            })
+            return
+
+        match = _RESULT_PATH_RE.match(url.path)
+        if match:
+            self._send_result(get_result_cache().get(match.group(1), count=False), query)
+            return
+
+        job, suffix = self._job_from_path(url.path)
+        if suffix == "/trace":
+            self._send_json(200, job_trace(job))
+            return
+        if not suffix:
+            self._send_json(200, job_status(job))
+            return
+        if not job.finished:
+            raise ApiError(409, "아직 변환이 끝나지 않았습니다")
+        if job.result is None:
+            raise ApiError(422, str(job.error) if job.error else "변환 결과가 없습니다")
+        self._send_result(job.result, query)
+
+    def _delete(self, url):
+        job, suffix = self._job_from_path(url.path)
+        if suffix:
+            raise ApiError(405, "작업 자체만 취소할 수 있습니다")
+        cancelled = get_job_manager().cancel(job.id)
+        self._send_json(200, {"job_id": job.id, "cancelled": cancelled, "state": job.state})
+
+    def _post(self, url):
+        if url.path != "/v1/convert":
+            raise ApiError(404, "알 수 없는 경로입니다")
+        query = parse_qs(url.query)
+        options = ConversionOptions(
+            use_llm=_flag(query, "use_llm", False),
+            extract_images=_flag(query, "extract_images", True),
+        )
+        upload = self._read_upload(query)
+
+        key = cache_key(upload.digest, options.use_llm, options.extract_images)
+        if get_result_cache().get(key) is not None:
+            upload.release()
+            self._send_json(200, {"job_id": None, "state": "done", "cached": True, "cache_key": key})
+            return
+
+        try:
+            # 입력 파일은 작업이 소유하고 변환이 끝나면 삭제
+            job = get_job_manager().submit(upload.path, upload.filename, options, key)
+        except JobQueueFull as e:
+            upload.release()
+            raise ApiError(503, str(e))
+        except JobTooLarge as e:
+            upload.release()
+            raise ApiError(413, str(e))
+
+        try:
+            wait = min(float((query.get("wait") or ["0"])[0]), API_MAX_WAIT_SECONDS)
+        except ValueError:
+            wait = 0
+        deadline = time.monotonic() + wait
+        while not job.finished and time.monotonic() < deadline:
+            time.sleep(API_POLL_SECONDS)
+        status = job_status(job)
+        status["cached"] = False
+        self._send_json(200 if job.finished else 202, status)
+
+    def _job_from_path(self, path):
+        match = _JOB_PATH_RE.match(path)
+        if not match:
+            raise ApiError(404, "알 수 없는 경로입니다")
+        job = get_job_manager().get(match.group(1))
+        if job is None:
+            raise ApiError(404, "작업을 찾을 수 없습니다")
+        return job, match.group(2)
+
+    def _read_upload(self, query):
+        max_bytes = API_MAX_UPLOAD_MB * 1024 * 1024
+        try:
+            length = int(self.headers.get("Content-Length", ""))
+        except ValueError:
+            raise ApiError(411, "Content-Length 헤더가 필요합니다")
+        if length > max_bytes:
+            raise ApiError(413, f"파일 크기 초과: 최대 {API_MAX_UPLOAD_MB}MB")
+
+        content_type = self.headers.get("Content-Type", "")
+        try:
+            if content_type.startswith("multipart/form-data"):
+                return self._read_multipart(content_type, length, max_bytes)
+            # 본문 그대로 업로드: 파일 이름은 ?filename= 또는 X-Filename 헤더
+            filename = (query.get("filename") or [self.headers.get("X-Filename", "")])[0]
+            if not filename:
+                raise ApiError(400, "filename 파라미터가 필요합니다")
+            return spool_upload(_BodyReader(self.rfile, length), os.path.basename(filename), max_bytes=max_bytes)
+        except UploadTooLarge as e:
+            raise ApiError(413, str(e))
+
+    def _read_multipart(self, content_type, length, max_bytes):
+        # 본문 전체를 메모리에 올리지 않고 소켓에서 읽으면서 file 필드만 디스크로 스풀
+        # (Content-Length는 호출 전에 상한과 비교했으므로 읽는 양도 그 안으로 제한됨)
+        boundary = _header_params("Content-Type", content_type).get_param("boundary")
+        if not boundary:
+            raise ApiError(400, "multipart boundary가 없습니다")
+        reader = _MultipartReader(_BodyReader(self.rfile, length), boundary)
+        while True:
+            part = reader.next_part()
+            if part is None:
+                break
+            if part.get_param("name", header="content-disposition") != "file":
+                for _ in reader.iter_content():
+                    pass
+                continue
+            filename = part.get_filename()
+            if not filename:
+                raise ApiError(400, "file 필드에 파일 이름이 없습니다")
+            return spool_upload(_ChunkReader(reader.iter_content()), os.path.basename(filename), max_bytes=max_bytes)
+        raise ApiError(400, "multipart 본문에 file 필드가 없습니다")
+
+    def _send_result(self, conversion, query):
+        if conversion is None:
+            raise ApiError(404, "결과를 찾을 수 없습니다")
+        output_format = _output_format(query)
+        # 렌더링 결과를 디스크 파일로 한 번만 쓰고 그 파일을 스트리밍 (응답 크기와 무관하게 메모리 일정)
+        if _flag(query, "bundle", False):
+            path = export_path(conversion, output_format, bundle=True)
+            self._send_file(path, "application/zip", {
+                "Content-Disposition": f'attachment; filename="{export_name(output_format, bundle=True)}"',
+            })
+            return
+        path = export_path(conversion, output_format)
+        self._send_file(path, f"{MIME_TYPES[output_format]}; charset=utf-8")
+
+
+_server = None
+_server_lock = threading.Lock()
+
+
+def start_api_server(port, host=API_HOST):
+    # 프로세스당 한 번만 기동 (Streamlit rerun마다 호출되어도 기존 서버를 반환)
+    global _server
+    with _server_lock:
+        if _server is None:
+            server = ThreadingHTTPServer((host, port), ConversionRequestHandler)
+            server.daemon_threads = True
+            threading.Thread(target=server.serve_forever, name="marker-api", daemon=True).start()
+            _server = server
+        return _server
+
+
+def get_api_server():
+    return _server
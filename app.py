@@ -1,26 +1,31 @@
 import streamlit as st
-import tempfile
 import os
 import sys
-import signal
+import time
 
-# Hugging Face Spaces 환경 설정 - 캐시 디렉토리 권한 문제 해결
-os.environ['HF_HOME'] = '/tmp/huggingface'
-os.environ['TRANSFORMERS_CACHE'] = '/tmp/huggingface/transformers'
-os.environ['HF_DATASETS_CACHE'] = '/tmp/huggingface/datasets'
-os.environ['MARKER_CACHE_DIR'] = '/tmp/marker_cache'
-os.environ['XDG_CACHE_HOME'] = '/tmp/cache'
-os.environ['TORCH_HOME'] = '/tmp/torch'
-os.environ['HUGGINGFACE_HUB_CACHE'] = '/tmp/huggingface/hub'
+from admission import JobTooLarge
+from api import start_api_server
+from asset_store import get_asset_store
+from batch import FINISHED as BATCH_FINISHED, discard_batch, get_batch, start_batch
+from engine import ConversionCancelled, ConversionOptions, ConversionTimeout, ModelLoadError, load_models, prepare_cache_dirs
+from exports import export_name, export_path
+from inference_profile import PROFILE_LABELS, PROFILES
+from ingest import UploadTooLarge, spool_upload
+from jobs import CANCELLED, DONE, FAILED, QUEUED, JobQueueFull, get_job_manager
+from metrics import CONVERSIONS, PAGES
+from model_registry import get_registry
+from page_cache import get_page_cache, incremental_report
+from preview import search_pages, split_chunks
+from renderers import MIME_TYPES, OUTPUT_FORMATS, render_page
+from result_cache import cache_key, get_result_cache
+from sharding import sharding_available
+from text_layer import ROUTE_OCR, ROUTE_TEXT_LAYER, route_summary
+from warmup import FAILED as WARMUP_FAILED, IMPORTING as WARMUP_IMPORTING, LOADING as WARMUP_LOADING
+from warmup import WARMUP_ON_START, get_warmup, start_warmup
+from weight_store import WEIGHTS_OFFLINE, WeightStoreError, manifest_path, verify_store
 
-# 캐시 디렉토리 생성
-cache_dirs = [
-    '/tmp/huggingface', '/tmp/marker_cache', '/tmp/cache', 
-    '/tmp/huggingface/transformers', '/tmp/huggingface/datasets',
-    '/tmp/torch', '/tmp/huggingface/hub'
-]
-for cache_dir in cache_dirs:
-    os.makedirs(cache_dir, exist_ok=True)
+# 모델 가중치/Hugging Face/torch 캐시 경로는 runtime_paths.configure_model_cache()가
+# MARKER_MODEL_CACHE 한 곳으로 통일 (engine import 시 적용, Docker 이미지는 빌드 때 같은 경로에 미리 받아 둠)
 
 # Streamlit Community Cloud 환경설정
 st.set_page_config(
@@ -30,33 +35,362 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-def main():
-    # 앱 시작 시 static 디렉터리 심볼릭 링크 확인/생성
+# 작업 상태 폴링 간격 (초)
+JOB_POLL_SECONDS = 1.0
+
+# 업로드 크기 제한 (MB) - 페이지 샤딩이 가능하면 큰 PDF도 여러 프로세스로 나눠 처리
+MAX_UPLOAD_MB = int(os.environ.get("MARKER_MAX_UPLOAD_MB", "50" if sharding_available() else "10"))
+
+# 추출 이미지 미리보기: 한 쪽에 보여 줄 썸네일 수 / 열 수
+GALLERY_PAGE_SIZE = 12
+GALLERY_COLUMNS = 4
+
+# 미리보기: 검색 결과 목록 최대 표시 수 / 변환 중 미리보기 페이지 수
+SEARCH_LIST_LIMIT = 50
+LIVE_PREVIEW_PAGES = 3
+
+# 헤드리스 변환 API를 같은 프로세스에서 실행 (UI와 모델/작업 큐/결과 캐시 공유)
+API_PORT = os.environ.get("MARKER_API_PORT")
+# 브라우저에서 API에 접근 가능한 주소 (없으면 이 페이지를 연 호스트 + API 포트로 추정)
+API_PUBLIC_URL = os.environ.get("MARKER_API_PUBLIC_URL", "").rstrip("/")
+# API 링크를 쓸 수 없을 때 Streamlit 다운로드 버튼으로 보내는 파일 크기 상한 (버튼은 파일 전체를 서버 메모리에 올림)
+INLINE_DOWNLOAD_MB = float(os.environ.get("MARKER_INLINE_DOWNLOAD_MB", "20"))
+api_server = None
+api_error = None
+if API_PORT:
     try:
-        static_fallback = "/app/.cache/static_fallback"
-        system_static = "/usr/local/lib/python3.10/site-packages/static"
+        api_server = start_api_server(int(API_PORT))
+    except OSError as e:
+        api_error = str(e)
+
+# marker/torch import와 모델 로드를 백그라운드에서 미리 시작 (UI는 기다리지 않고 바로 렌더링)
+warmup = start_warmup() if WARMUP_ON_START else get_warmup()
+
+def show_result(conversion, output_format):
+    # 중간 결과 하나에서 형식별 출력을 만들어냄 (모델 재실행 없음)
+    show_downloads(conversion, output_format)
+    
+    # 결과 미리보기 (선택한 페이지/구간만 화면으로 보냄)
+    st.subheader("📄 변환 결과 미리보기")
+    caption = f"📑 {conversion.page_count} 페이지 · 🖼️ 이미지 {len(conversion.images)}개"
+    routes = route_summary(conversion.metadata.get("page_routes"))
+    if routes[ROUTE_TEXT_LAYER] or routes[ROUTE_OCR]:
+        caption += f" · ⚡ 텍스트 레이어 {routes[ROUTE_TEXT_LAYER]}페이지 / 🔍 OCR {routes[ROUTE_OCR]}페이지"
+    st.caption(caption)
+    show_incremental_report(conversion)
+    show_preview(conversion, output_format)
+
+    if conversion.images:
+        show_image_gallery(conversion)
+
+def show_incremental_report(conversion):
+    # 이전 버전과 같은 페이지를 재사용한 경우에만 어떤 페이지를 다시 변환했는지 표시
+    report = incremental_report(conversion.metadata)
+    if not report or not report["reused"]:
+        return
+    reconverted = report["reconverted"]
+    st.info(f"♻️ 증분 변환: 바뀐 {len(reconverted)}페이지만 다시 변환하고 {len(report['reused'])}페이지는 이전 결과를 재사용했습니다.")
+    if reconverted:
+        with st.expander("📝 다시 변환한 페이지"):
+            st.write(", ".join(f"{page + 1}" for page in reconverted) + " 페이지")
+
+def _request_host():
+    # 브라우저가 이 페이지를 연 호스트 이름 (Streamlit 1.37+의 st.context, 알 수 없으면 None)
+    context = getattr(st, "context", None)
+    host = context.headers.get("Host") if context is not None else None
+    if not host:
+        return None
+    if host.startswith("["):
+        return host.split("]", 1)[0] + "]"
+    return host.rsplit(":", 1)[0]
+
+def api_base_url():
+    # 브라우저에서 닿는 API 주소 - 알 수 없으면 None
+    if API_PUBLIC_URL:
+        return API_PUBLIC_URL
+    if api_server is None:
+        return None
+    host, port = api_server.server_address[:2]
+    request_host = _request_host()
+    if host in ("0.0.0.0", "::", ""):
+        host = request_host
+    elif host in ("127.0.0.1", "::1", "localhost") and request_host not in ("127.0.0.1", "[::1]", "localhost"):
+        # 루프백에만 열린 API는 같은 컴퓨터의 브라우저만 접근 가능
+        return None
+    if not host:
+        return None
+    if ":" in host and not host.startswith("["):
+        host = f"[{host}]"
+    return f"http://{host}:{port}"
+
+def show_downloads(conversion, output_format):
+    # 출력은 서버 디스크에 파일로 한 번만 쓰고, API가 있으면 디스크에서 바로 스트리밍하는 링크로 내려보냄
+    # (Streamlit 다운로드 버튼은 파일 전체를 미디어 저장소 메모리에 올리므로 작은 파일에만 사용)
+    downloads = [(download_format, False) for download_format in OUTPUT_FORMATS]
+    if conversion.images:
+        # 문서 + assets/ 이미지 묶음 (마크다운의 상대 경로가 그대로 열림)
+        downloads.append((output_format, True))
+    base_url = api_base_url()
+    if base_url and get_result_cache().contains(conversion.result_id):
+        links = []
+        for download_format, bundle in downloads:
+            label = f"{download_format.upper()} + 이미지 {len(conversion.images)}개 (ZIP)" if bundle else download_format.upper()
+            url = f"{base_url}/v1/results/{conversion.result_id}?format={download_format}" + ("&bundle=1" if bundle else "")
+            links.append(f"[💾 {label}]({url})")
+        st.markdown("📥 다운로드: " + " · ".join(links))
+        return
+    requested = st.session_state.pop("download_request", None)
+    columns = st.columns(len(downloads))
+    for column, (download_format, bundle) in zip(columns, downloads):
+        label = f"{download_format.upper()} + 이미지 {len(conversion.images)}개 (ZIP)" if bundle else f"{download_format.upper()} 파일"
+        key = f"{download_format}_{'bundle' if bundle else 'file'}"
+        if requested == (conversion.result_id, key):
+            path = export_path(conversion, download_format, bundle=bundle)
+            size_mb = os.path.getsize(path) / 1024 / 1024
+            if size_mb > INLINE_DOWNLOAD_MB:
+                column.caption(f"⚠️ {size_mb:.1f}MB - 큰 파일은 MARKER_API_PORT로 API를 켜면 메모리에 올리지 않고 바로 받을 수 있습니다")
+            with open(path, "rb") as export_file:
+                column.download_button(
+                    label=f"💾 {label} 다운로드 ({size_mb:.1f}MB)",
+                    data=export_file,
+                    file_name=export_name(download_format, bundle),
+                    mime="application/zip" if bundle else MIME_TYPES[download_format],
+                    key=f"download_{key}",
+                    type="primary"
+                )
+        elif column.button(f"📥 {label} 준비", key=f"prepare_{key}"):
+            st.session_state["download_request"] = (conversion.result_id, key)
+            st.rerun()
+
+def show_preview(conversion, output_format):
+    if not conversion.pages:
+        st.info("ℹ️ 변환된 내용이 없습니다.")
+        return
+    query = st.text_input("🔍 결과에서 검색", key="preview_query").strip()
+    if query:
+        hits, total = search_pages(conversion, query)
+        if not hits:
+            st.info(f"🔍 '{query}' 검색 결과가 없습니다.")
+            return
+        st.caption(f"🔍 '{query}': {total}건 · {len(hits)}개 페이지")
+        with st.expander("📋 검색 결과 목록"):
+            for hit in hits[:SEARCH_LIST_LIMIT]:
+                st.text(f"{hit.page + 1} 페이지 ({hit.count}건): …{hit.snippet}…")
+        indexes = [hit.index for hit in hits]
+    else:
+        indexes = list(range(conversion.page_count))
+    
+    position = 1
+    if len(indexes) > 1:
+        # 검색어마다 위치 입력을 따로 두어 범위가 바뀌어도 1부터 시작
+        position = st.number_input(f"📄 페이지 (1-{len(indexes)})", min_value=1, max_value=len(indexes), value=1, key=f"preview_position_{query}")
+    index = indexes[position - 1]
+    chunks = split_chunks(render_page(conversion, index, output_format))
+    chunk = 1
+    if len(chunks) > 1:
+        chunk = st.number_input(f"✂️ 구간 (1-{len(chunks)})", min_value=1, max_value=len(chunks), value=1, key=f"preview_chunk_{index}_{output_format}")
+    page = conversion.pages[index]
+    st.caption(f"📄 {page.page + 1} 페이지" + (f" · 구간 {chunk}/{len(chunks)}" if len(chunks) > 1 else ""))
+    st.code(chunks[chunk - 1], language=output_format)
+
+def show_image_gallery(conversion):
+    # 썸네일은 펼쳤을 때 현재 쪽 것만 저장소에서 만들어 읽음 (원본 이미지는 메모리에 올리지 않음)
+    if not st.checkbox(f"🖼️ 추출 이미지 보기 ({len(conversion.images)}개)", key="show_images"):
+        return
+    refs = sorted(conversion.images)
+    page_count = (len(refs) + GALLERY_PAGE_SIZE - 1) // GALLERY_PAGE_SIZE
+    gallery_page = 1
+    if page_count > 1:
+        gallery_page = st.number_input("이미지 쪽", min_value=1, max_value=page_count, value=1, key="image_page")
+    start = (gallery_page - 1) * GALLERY_PAGE_SIZE
+    store = get_asset_store()
+    columns = st.columns(GALLERY_COLUMNS)
+    for index, ref in enumerate(refs[start:start + GALLERY_PAGE_SIZE]):
+        try:
+            columns[index % GALLERY_COLUMNS].image(store.thumbnail(conversion.images[ref]), caption=ref)
+        except OSError:
+            columns[index % GALLERY_COLUMNS].caption(f"⚠️ {ref} (저장소에서 삭제됨)")
+
+def spool_session_upload(uploaded_file):
+    # 같은 업로드(file_id)는 세션에 보관된 스풀 파일을 재사용
+    source_id = getattr(uploaded_file, "file_id", None) or f"{uploaded_file.name}:{uploaded_file.size}"
+    upload = st.session_state.get("spooled_upload")
+    if upload is not None and upload.source_id == source_id and os.path.exists(upload.path):
+        return upload
+    if upload is not None:
+        # 세션의 사용권만 반납 - 이 파일로 대기/실행 중인 작업이 있으면 작업이 끝날 때 삭제됨
+        upload.release()
+        st.session_state.pop("spooled_upload", None)
+    
+    upload = spool_upload(uploaded_file, uploaded_file.name, max_bytes=MAX_UPLOAD_MB * 1024 * 1024, source_id=source_id)
+    st.session_state["spooled_upload"] = upload
+    return upload
+
+def show_job_status(job):
+    if job.state == QUEUED:
+        st.info(f"⏳ 대기 중: {job.filename} (대기 {job.queue_wait:.0f}초)")
+        if job.estimate is not None:
+            st.caption(f"🧠 예상 메모리 {job.estimate.minimum/1024/1024/1024:.1f}GB 이상 - 메모리 여유가 생기면 시작합니다")
+    else:
+        shard_note = " · 🧩 페이지 샤딩 병렬 변환" if job.sharded else ""
+        if job.batch_scale < 1:
+            shard_note += f" · 🪶 메모리 절약 모드 (배치 크기 {job.batch_scale:.0%})"
+        st.info(f"🔄 {job.filename} 변환 중... ({job.elapsed:.0f}초 경과){shard_note}")
+        if job.progress is not None:
+            # 실제로 끝난 페이지 수 기준 진행률
+            st.progress(job.progress, text=f"📄 {job.pages_done}/{job.page_count} 페이지 완료")
+        else:
+            st.progress(min(job.elapsed / job.timeout_seconds, 1.0), text="📄 페이지 수 확인 전")
+    st.caption(f"🆔 작업 ID: {job.id} · 탭을 닫아도 변환은 계속되며, 같은 파일을 다시 올리면 결과를 바로 받을 수 있습니다.")
+    if job.cancel_token.cancelled:
+        st.warning("⏹️ 취소 요청됨 - 현재 페이지 묶음이 끝나면 중단됩니다")
+    elif st.button("⏹️ 변환 취소", key=f"cancel_{job.id}"):
+        get_job_manager().cancel(job.id)
+        st.rerun()
+    
+    # 완료된 페이지 중 최근 몇 페이지만 미리보기 (1초마다 다시 그리므로 양을 제한)
+    pages = list(job.pages)[-LIVE_PREVIEW_PAGES:]
+    if pages:
+        st.subheader("📄 변환 중 미리보기")
+        if job.pages_done > len(pages):
+            st.caption(f"최근 {len(pages)} 페이지만 표시합니다 (완료 {job.pages_done} 페이지)")
+        for page in pages:
+            preview = page.markdown[:2000] + ("..." if len(page.markdown) > 2000 else "")
+            st.markdown(f"**{page.page + 1} 페이지**")
+            st.markdown("```markdown\n" + preview + "\n```")
+
+def show_conversion_error(e):
+    if isinstance(e, ModelLoadError) and isinstance(e.__cause__, WeightStoreError):
+        st.error("❌ 로컬 가중치 저장소 확인 실패")
+        st.error(f"상세 오류: {str(e)}")
+        st.info("💡 이미지에 포함된 가중치가 없거나 손상되었습니다. python warmup.py --prefetch 로 이미지를 다시 빌드해주세요.")
+        if WEIGHTS_OFFLINE:
+            st.info("🔒 오프라인 모드(MARKER_OFFLINE=1)에서는 가중치를 내려받지 않습니다.")
+
+    elif isinstance(e, ModelLoadError):
+        error_str = str(e)
+        st.error("❌ AI 모델 로딩 실패")
+        st.error(f"상세 오류: {error_str}")
         
-        # fallback 디렉터리 생성
-        os.makedirs(static_fallback, exist_ok=True)
-        os.chmod(static_fallback, 0o777)
+        if "403" in error_str or "Forbidden" in error_str:
+            st.error("🚫 **403 Forbidden - HF Spaces 네트워크 정책 제한**")
+            st.info("📋 **원인**: Hugging Face Spaces의 새로운 보안 정책")
+            st.info("🔒 **제한사항**: 대용량 AI 모델 다운로드 차단")
+            st.info("💡 **해결방안**: 로컬 환경에서 사용하거나 HF 지원팀 문의")
+            st.markdown("**📧 문의**: [website@huggingface.co](mailto:website@huggingface.co)")
+        else:
+            st.info("💡 첫 실행 시 모델 다운로드에 시간이 걸릴 수 있습니다. 잠시 후 다시 시도해주세요.")
+    
+    elif isinstance(e, ConversionCancelled):
+        st.warning(f"⏹️ {str(e)}")
+        st.info("💡 다시 변환하려면 아래 버튼을 눌러주세요.")
+    
+    elif isinstance(e, ConversionTimeout):
+        st.error(f"⏰ {str(e)}")
+        st.info("💡 파일이 복잡하거나 큽니다. 더 간단한 문서로 시도해보세요.")
+    
+    elif isinstance(e, ImportError):
+        st.error("❌ Marker 패키지를 찾을 수 없습니다.")
+        st.error(f"오류 상세: {str(e)}")
+        st.info("💡 로컬에서만 사용 가능한 기능입니다.")
+    
+    elif isinstance(e, PermissionError):
+        if "/usr/local" in str(e) or "Permission denied" in str(e):
+            st.error("❌ 변환 중 오류가 발생했습니다: 시스템 파일 접근 권한 문제")
+            st.error(f"상세 오류: {str(e)}")
+            st.info("💡 일시적 오류일 수 있습니다. 다시 시도해보세요.")
+        else:
+            st.error(f"❌ 권한 오류: {str(e)}")
+    
+    else:
+        error_msg = str(e)
+        st.error(f"❌ 변환 중 오류가 발생했습니다: {error_msg}")
         
-        # 심볼릭 링크가 없거나 잘못되었다면 재생성
-        if not os.path.islink(system_static) or not os.path.exists(system_static):
-            try:
-                if os.path.exists(system_static):
-                    os.remove(system_static)
-                os.symlink(static_fallback, system_static)
-            except:
-                pass  # 실패해도 monkey patch로 우회
-    except:
-        pass  # 모든 실패 무시하고 계속 진행
+        # 구체적인 에러 타입별 안내
+        if "403" in error_msg or "Forbidden" in error_msg:
+            st.error("🚫 403 Forbidden 오류 - Hugging Face Spaces 제한")
+            st.info("💡 이 오류는 HF Spaces의 네트워크 정책 또는 모델 다운로드 제한 때문일 수 있습니다.")
+            st.info("🔄 잠시 후 다시 시도하거나, 로컬 환경에서 사용해보세요.")
+        elif "Memory" in error_msg or "CUDA" in error_msg:
+            st.info("💡 메모리 부족 - 더 작은 파일로 시도해보세요.")
+        elif "timeout" in error_msg.lower():
+            st.info("💡 처리 시간 초과 - 더 단순한 문서로 시도해보세요.")
+        else:
+            st.info("💡 일시적 오류일 수 있습니다. 다시 시도해보세요.")
+
+def show_batch_status(run):
+    total = len(run.items)
+    col_done, col_docs, col_pages, col_elapsed = st.columns(4)
+    col_done.metric("완료", f"{run.done_count}/{total}")
+    col_docs.metric("문서/분", f"{run.docs_per_min:.1f}")
+    col_pages.metric("페이지/분", f"{run.pages_per_min:.1f}")
+    col_elapsed.metric("경과", f"{run.elapsed:.0f}초")
+    if total:
+        st.progress(run.done_count / total)
+    st.dataframe([item.as_row() for item in run.items], use_container_width=True)
+    if run.error:
+        st.error(f"❌ 배치 처리 중 오류가 발생했습니다: {run.error}")
+
+def show_batch_mode(options):
+    st.subheader("🗂️ 배치 변환")
+    run = get_batch(st.session_state.get("batch_id"))
+    
+    if run is not None and run.state != BATCH_FINISHED:
+        show_batch_status(run)
+        if run.cancel_requested:
+            st.warning("⏹️ 취소 요청됨 - 진행 중인 문서가 끝나면 중단됩니다")
+        elif st.button("⏹️ 배치 취소", key=f"cancel_batch_{run.id}"):
+            run.cancel()
+            st.rerun()
+        time.sleep(JOB_POLL_SECONDS)
+        st.rerun()
+        return
     
+    if run is not None:
+        st.success("🎉 배치 변환이 끝났습니다!")
+        show_batch_status(run)
+        if os.path.exists(run.output_path):
+            with open(run.output_path, "rb") as output_file:
+                st.download_button(
+                    label="📦 결과 ZIP 다운로드 (마크다운 + 이미지)",
+                    data=output_file,
+                    file_name="converted_batch.zip",
+                    mime="application/zip"
+                )
+        if st.button("🧹 새 배치 시작"):
+            discard_batch(run.id)
+            st.session_state.pop("batch_id", None)
+            st.rerun()
+        return
+    
+    uploaded_files = st.file_uploader(
+        "📁 문서 파일 여러 개 또는 ZIP 파일을 업로드하세요",
+        type=['pdf', 'docx', 'pptx', 'xlsx', 'html', 'epub', 'png', 'jpg', 'jpeg', 'zip'],
+        accept_multiple_files=True,
+        help=f"파일당 최대 {MAX_UPLOAD_MB}MB · ZIP 안의 지원 형식 파일은 모두 변환됩니다",
+        key="batch_uploader"
+    )
+    if uploaded_files and st.button("🔄 배치 변환 시작", type="primary"):
+        uploads = []
+        for uploaded in uploaded_files:
+            try:
+                uploads.append(spool_upload(uploaded, uploaded.name, max_bytes=MAX_UPLOAD_MB * 1024 * 1024))
+            except UploadTooLarge as e:
+                st.warning(f"⚠️ {uploaded.name} 건너뜀: {str(e)}")
+        run = start_batch(uploads, options)
+        if not run.items:
+            st.warning("⚠️ 변환할 수 있는 파일이 없습니다.")
+        st.session_state["batch_id"] = run.id
+        st.rerun()
+
+def main():
     # 디버그 정보
     st.sidebar.markdown("---")
     st.sidebar.subheader("🔧 디버그 정보")
     if st.sidebar.button("🔍 환경 정보 표시"):
         st.sidebar.write(f"Python: {sys.version}")
         st.sidebar.write(f"Streamlit: {st.__version__}")
+        st.sidebar.write(f"Marker static: {os.environ.get('MARKER_STATIC_DIR')}")
         try:
             import psutil
             memory = psutil.virtual_memory()
@@ -64,8 +398,74 @@ def main():
             st.sidebar.write(f"사용률: {memory.percent:.1f}%")
         except:
             st.sidebar.write("psutil 정보 없음")
+    
+    # 공유 모델 상태 (프로세스 전체에서 1회 로드)
+    registry = get_registry()
+    model_stats = registry.stats()
+    if model_stats["loaded"]:
+        resident = model_stats["resident_bytes"]
+        resident_text = f"{resident/1024/1024/1024:.2f}GB" if resident else "알 수 없음"
+        ready_note = f", 시작 후 {warmup.ready_seconds:.0f}초 만에 준비" if warmup.ready_seconds is not None else ""
+        st.sidebar.write(f"🟢 모델: 로드됨 ({model_stats['load_seconds']:.1f}초, 상주 메모리 {resident_text}{ready_note})")
+        st.sidebar.write(f"🎛️ 추론 프로필: {PROFILE_LABELS[model_stats['profile']]} · torch 스레드 {model_stats['torch_threads']}개/워커")
+        if model_stats["mapped"] and model_stats["mapped"]["total_bytes"]:
+            mapped = model_stats["mapped"]
+            st.sidebar.write(f"🗺️ 메모리 매핑 가중치: {mapped['mapped_bytes']/1024/1024:.0f}MB / {mapped['total_bytes']/1024/1024:.0f}MB (프로세스 간 공유)")
+        col_reload, col_unload = st.sidebar.columns(2)
+        if col_reload.button("♻️ 다시 로드"):
+            with st.spinner("💡 AI 모델 다시 로딩 중..."):
+                registry.reload()
+            st.rerun()
+        if col_unload.button("🧹 언로드"):
+            registry.unload()
+            st.rerun()
+    elif warmup.state in (WARMUP_IMPORTING, WARMUP_LOADING):
+        phase = "모듈 import" if warmup.state == WARMUP_IMPORTING else "가중치 로드"
+        st.sidebar.write(f"🟡 모델 준비 중: {phase} ({time.time() - warmup.started_at:.0f}초 경과)")
+    elif warmup.state == WARMUP_FAILED:
+        st.sidebar.write(f"🔴 모델 미리 준비 실패: {warmup.error} (첫 변환 시 다시 시도)")
+    else:
+        st.sidebar.write("🧠 모델: 아직 로드되지 않음 (첫 변환 시 로드)")
+    profile = st.sidebar.selectbox(
+        "🎛️ 추론 프로필",
+        PROFILES,
+        index=PROFILES.index(registry.profile),
+        format_func=PROFILE_LABELS.get,
+        help="모든 세션이 공유하는 설정입니다. 바꾸면 모델을 언로드하고 다음 변환 때 새 프로필로 다시 로드합니다. 결과는 프로필별로 따로 캐시됩니다."
+    )
+    if registry.set_profile(profile):
+        st.rerun()
+    verify = model_stats["verify"]
+    offline_note = "🔒 오프라인" if WEIGHTS_OFFLINE else "🌐 온라인"
+    if verify:
+        st.sidebar.write(f"{offline_note} · 가중치 {verify['files']}개 검증됨 ({verify['mode']}, {verify['seconds']:.1f}초)")
+    else:
+        st.sidebar.write(f"{offline_note} · 가중치 검증 전")
+    
+    if api_server is not None:
+        host, port = api_server.server_address[:2]
+        st.sidebar.write(f"🔌 변환 API: http://{host}:{port}/v1/convert")
+    elif api_error:
+        st.sidebar.write(f"🔌 변환 API 시작 실패: {api_error}")
+    
+    job_stats = get_job_manager().stats()
+    st.sidebar.write(f"🧵 작업: 실행 {job_stats['running']} / 대기 {job_stats['queued']} (워커 {job_stats['workers']}개)")
+    admission_stats = job_stats["admission"]
+    if admission_stats["headroom_bytes"] is not None:
+        st.sidebar.write(f"🧠 메모리 여유: {max(admission_stats['headroom_bytes'], 0)/1024/1024/1024:.1f}GB (예약 {admission_stats['reserved_bytes']/1024/1024/1024:.1f}GB · 거절 {admission_stats['rejected']} · 배치 축소 {admission_stats['shrunk']})")
+    
+    st.sidebar.write(f"📈 변환: 성공 {CONVERSIONS.value(state=DONE)} / 실패 {CONVERSIONS.value(state=FAILED)} / 취소 {CONVERSIONS.value(state=CANCELLED)} · {PAGES.value()}페이지")
+    
+    cache_stats = get_result_cache().stats()
+    st.sidebar.write(f"⚡ 결과 캐시: 적중 {cache_stats['hits']} / 미스 {cache_stats['misses']} (디스크 {cache_stats['disk_entries']}개, {cache_stats['disk_bytes']/1024/1024:.1f}MB)")
+    page_stats = get_page_cache().stats()
+    st.sidebar.write(f"📑 페이지 캐시: 재사용 {page_stats['hits']} / 새로 변환 {page_stats['misses']}페이지 (저장 {page_stats['stored']})")
+    asset_stats = get_asset_store().stats()
+    st.sidebar.write(f"🖼️ 이미지 저장소 ({asset_stats['format'].upper()}): 새로 저장 {asset_stats['stored']} / 중복 재사용 {asset_stats['deduplicated']}")
     st.title("📄 Marker Document to Markdown Converter")
-    st.markdown("""
+    if not registry.loaded and warmup.state in (WARMUP_IMPORTING, WARMUP_LOADING):
+        st.info("🟡 AI 모델을 준비하고 있습니다. 지금 변환을 시작해도 준비가 끝나는 대로 이어서 진행됩니다.")
+    st.markdown(f"""
     이 앱은 **Marker**를 사용하여 다양한 문서를 마크다운으로 변환합니다.
     
     **지원 형식:**
@@ -79,7 +479,7 @@ def main():
     
     **주의사항:**
     - 🚀 Hugging Face Spaces에서 16GB 메모리로 구동됩니다.
-    - 📦 파일 크기 제한: 10MB 이하만 업로드 가능합니다.
+    - 📦 파일 크기 제한: {MAX_UPLOAD_MB}MB 이하만 업로드 가능합니다.
     - 첫 실행 시 AI 모델 다운로드로 시간이 소요될 수 있습니다.
     """)
     
@@ -94,7 +494,7 @@ def main():
     
     output_format = st.sidebar.selectbox(
         "📝 출력 형식",
-        ["markdown", "json", "html"],
+        OUTPUT_FORMATS,
         index=0
     )
     
@@ -104,23 +504,40 @@ def main():
         help="PDF에서 이미지를 추출합니다"
     )
     
-    # 파일 업로드 (크기 제한 추가)
-    uploaded_file = st.file_uploader(
-        "📁 문서 파일을 업로드하세요",
-        type=['pdf', 'docx', 'pptx', 'xlsx', 'html', 'epub', 'png', 'jpg', 'jpeg'],
-        help="지원 형식: PDF, DOCX, PPTX, XLSX, HTML, EPUB, PNG, JPG (최대 10MB)",
-        key="file_uploader"
+    conversion_mode = st.sidebar.radio(
+        "🗂️ 변환 모드",
+        ["단일 파일", "배치 (여러 파일/ZIP)"],
+        index=0,
+        help="배치 모드는 여러 문서나 ZIP 파일을 한 번에 변환해 ZIP으로 내려받습니다"
     )
     
+    if conversion_mode != "단일 파일":
+        show_batch_mode(ConversionOptions(use_llm=use_llm, extract_images=extract_images))
+        uploaded_file = None
+    else:
+        # 파일 업로드 (크기 제한 추가)
+        uploaded_file = st.file_uploader(
+            "📁 문서 파일을 업로드하세요",
+            type=['pdf', 'docx', 'pptx', 'xlsx', 'html', 'epub', 'png', 'jpg', 'jpeg'],
+            help=f"지원 형식: PDF, DOCX, PPTX, XLSX, HTML, EPUB, PNG, JPG (최대 {MAX_UPLOAD_MB}MB)",
+            key="file_uploader"
+        )
+    
     if uploaded_file is not None:
-        # 파일 정보 표시
-        file_size = len(uploaded_file.getvalue())
+        # 업로드를 디스크에 한 번만 스풀 (크기/해시를 같은 패스에서 계산, rerun 시 재사용)
+        try:
+            upload = spool_session_upload(uploaded_file)
+        except UploadTooLarge as e:
+            upload = None
+            file_size = getattr(uploaded_file, "size", None) or e.size
+        else:
+            file_size = upload.size
         file_size_mb = file_size / 1024 / 1024
         
-        # 파일 크기 제한 체크 (10MB)
-        if file_size_mb > 10:
+        # 파일 크기 제한 체크
+        if upload is None:
             st.error(f"❌ 파일 크기가 너무 큽니다: {file_size_mb:.1f}MB")
-            st.error("🚫 Hugging Face Spaces는 10MB 이하의 파일만 지원합니다.")
+            st.error(f"🚫 현재 환경은 {MAX_UPLOAD_MB}MB 이하의 파일만 지원합니다.")
             st.info("💡 더 작은 파일로 시도해주시거나, 로컬 환경에서 사용해주세요.")
             return
         
@@ -135,393 +552,106 @@ def main():
             st.warning("⚠️ 지원되지 않는 파일 형식입니다.")
             return
         
-        # 변환 버튼
-        if st.button("🔄 변환 시작", type="primary"):
-            try:
-<<<<<<< HEAD
-                st.info(f"🔄 변환 시작: {uploaded_file.name} ({file_size_mb:.1f}MB)")
-                with st.spinner(f"🔄 {file_extension.upper()} 문서를 변환하는 중입니다... 잠시만 기다려주세요."):
-                    # 임시 파일로 저장 (확장자에 맞게)
-                    file_suffix = f'.{file_extension}'
-                    with tempfile.NamedTemporaryFile(delete=False, suffix=file_suffix) as tmp_file:
-=======
-                with st.spinner("🔄 PDF를 변환하는 중입니다... 잠시만 기다려주세요."):
-                    # 임시 파일을 /tmp 디렉토리에 생성 (권한 문제 해결)
-                    file_extension = uploaded_file.name.lower().split('.')[-1]
-                    with tempfile.NamedTemporaryFile(delete=False, suffix=f'.{file_extension}', dir='/tmp') as tmp_file:
->>>>>>> 361518c9f61cc826917df3f5e4b5170b5a2f68db
-                        tmp_file.write(uploaded_file.getvalue())
-                        tmp_path = tmp_file.name
+        # 결과 캐시 확인 (파일 해시 + 변환 설정 + Marker 버전)
+        # 같은 파일/설정은 세션당 한 번만 조회 (1초마다 도는 rerun이 적중/미스를 다시 세지 않도록)
+        result_key = cache_key(upload.digest, use_llm, extract_images)
+        lookup = st.session_state.get("cache_lookup")
+        if lookup is None or lookup[0] != result_key:
+            lookup = (result_key, get_result_cache().get(result_key))
+            st.session_state["cache_lookup"] = lookup
+        cached_result = lookup[1]
+        
+        # 이 세션에서 제출한 백그라운드 작업 (같은 파일/설정일 때만 표시)
+        job_manager = get_job_manager()
+        active_job = job_manager.get(st.session_state.get("job_id"))
+        if active_job is not None and active_job.cache_key != result_key:
+            active_job = None
+        
+        if cached_result is not None:
+            st.success("⚡ 캐시 적중: 이전 변환 결과를 재사용합니다 (AI 모델 사용 안 함)")
+            show_result(cached_result, output_format)
+        
+        elif active_job is not None and not active_job.finished:
+            # 작업 상태 폴링 (스크립트 스레드는 변환을 기다리며 막히지 않음)
+            show_job_status(active_job)
+            time.sleep(JOB_POLL_SECONDS)
+            st.rerun()
+        
+        elif active_job is not None and active_job.state == DONE:
+            st.success("🎉 변환이 완료되었습니다!")
+            show_result(active_job.result, output_format)
+        
+        else:
+            if active_job is not None and active_job.state in (FAILED, CANCELLED):
+                show_conversion_error(active_job.error)
+                if active_job.result is not None:
+                    # 실패 전까지 완료된 페이지는 보존해서 제공
+                    st.warning(f"⚠️ 부분 결과: {active_job.pages_done}/{active_job.page_count} 페이지까지 변환됨")
+                    show_result(active_job.result, output_format)
+            
+            # 변환 버튼
+            if st.button("🔄 변환 시작", type="primary"):
+                try:
+                    st.info("🆕 캐시 미스: 새로 변환합니다")
                     
+                    # 메모리 사용량 체크 (Hugging Face Spaces 16GB)
                     try:
-<<<<<<< HEAD
-                        # 메모리 사용량 체크 (Hugging Face Spaces 16GB)
-                        try:
-                            import psutil
-                            memory_usage = psutil.virtual_memory()
-                            st.info(f"📊 현재 메모리 사용률: {memory_usage.percent:.1f}% (사용가능: {memory_usage.available//1024//1024//1024:.1f}GB)")
-                        except:
-                            st.info("📊 Hugging Face Spaces 16GB 환경에서 실행 중")
-=======
-                        # 메모리 사용량 체크
                         import psutil
                         memory_usage = psutil.virtual_memory()
                         st.info(f"📊 현재 메모리 사용률: {memory_usage.percent:.1f}% (사용가능: {memory_usage.available/1024/1024/1024:.1f}GB)")
-                        
-                        # 캐시 디렉토리 확인 메시지
-                        st.info(f"📁 캐시 디렉토리: {os.environ.get('MARKER_CACHE_DIR', '/tmp/marker_cache')}")
->>>>>>> 361518c9f61cc826917df3f5e4b5170b5a2f68db
-                        
-                        # Static 디렉터리 monkey patch 적용
-                        # 임시 디렉터리를 static으로 사용
-                        temp_static = tempfile.mkdtemp(prefix="marker_static_")
-                        os.chmod(temp_static, 0o777)
-                        st.info(f"🗂️ 임시 static 디렉터리 생성: {temp_static}")
-                        
-<<<<<<< HEAD
-                        # 환경변수 강제 설정
-                        original_static = "/usr/local/lib/python3.10/site-packages/static"
-                        os.environ['MARKER_STATIC_OVERRIDE'] = temp_static
-                        
-                        # 더 포괄적인 파일 시스템 함수 monkey patch
-                        original_makedirs = os.makedirs
-                        original_open = open
-                        original_chmod = os.chmod
-                        
-                        def patched_makedirs(path, *args, **kwargs):
-                            path_str = str(path)
-                            if "static" in path_str and "site-packages" in path_str:
-                                # site-packages/static 경로를 임시 디렉터리로 변경
-                                path = temp_static
-                            elif "/usr/local/lib/python3.10/site-packages/static" in path_str:
-                                path = temp_static
-                            return original_makedirs(path, *args, **kwargs)
-                        
-                        def patched_open(file, *args, **kwargs):
-                            file_str = str(file) 
-                            if "static" in file_str and "site-packages" in file_str:
-                                # static 파일 경로를 임시 디렉터리로 변경
-                                file = file_str.replace("/usr/local/lib/python3.10/site-packages/static", temp_static)
-                            return original_open(file, *args, **kwargs)
-                        
-                        def patched_chmod(path, *args, **kwargs):
-                            path_str = str(path)
-                            if "static" in path_str and "site-packages" in path_str:
-                                # static 디렉터리 chmod를 임시 디렉터리로 변경
-                                path = temp_static
-                            try:
-                                return original_chmod(path, *args, **kwargs)
-                            except:
-                                pass  # 권한 설정 실패 무시
-                        
-                        # 함수들을 패치
-                        os.makedirs = patched_makedirs
-                        os.chmod = patched_chmod
-                        # open은 builtin이므로 특별히 처리
-                        import builtins
-                        builtins.open = patched_open
-                        
-                        try:
-                            # Marker 패키지 import
-                            from marker.converters.pdf import PdfConverter
-                            from marker.converters.extraction import ExtractionConverter
-                            from marker.models import create_model_dict
-                            from marker.output import text_from_rendered
-                        finally:
-                            # 원래 함수들 복원
-                            os.makedirs = original_makedirs
-                            os.chmod = original_chmod
-                            builtins.open = original_open
-=======
-                        # HF_TOKEN 환경변수 확인
-                        hf_token = os.environ.get("HF_TOKEN")
-                        if not hf_token:
-                            st.warning("⚠️ HF_TOKEN 환경변수가 설정되지 않았습니다.")
-                            st.info("💡 토큰 없이 모델 로딩을 시도합니다...")
-                        
-                        # Marker 패키지 import
-                        from marker.convert import convert_single_pdf
-                        from marker.models import load_all_models
->>>>>>> 361518c9f61cc826917df3f5e4b5170b5a2f68db
-                        
-                        st.success("✅ Marker 패키지 로드 완료!")
-                        
-                        st.info("🔄 PDF 문서 분석 중...")
-                        st.info(f"🔍 처리할 파일: {uploaded_file.name} ({uploaded_file.type.upper()})")
-                        
-                        # AI 모델 로딩 with progress spinner
-                        with st.spinner("💡 AI 모델 로딩 중..."):
-                            # 모델 로드 시 캐시 경로 명시적 지정
-                            model_lst = load_all_models()
-                            st.success("✅ AI 모델 로딩 완료!")
-                        
-<<<<<<< HEAD
-                        # 파일 확장자는 이미 위에서 확인했음
-                        st.info(f"🔍 처리할 파일: {uploaded_file.name} ({file_extension.upper()})")
-                        
-                        # AI 모델 로드 (Hugging Face Spaces 16GB 환경)
-                        try:
-                            # 캐시 디렉터리 환경변수 설정
-                            cache_dir = "/app/.cache"
-                            os.environ['XDG_CACHE_HOME'] = cache_dir
-                            os.environ['HUGGINGFACE_HUB_CACHE'] = f"{cache_dir}/huggingface"
-                            os.environ['TORCH_HOME'] = f"{cache_dir}/torch"
-                            os.environ['TRANSFORMERS_CACHE'] = f"{cache_dir}/transformers"
-                            os.environ['HF_HOME'] = f"{cache_dir}/huggingface"
-                            
-                            # Static 디렉터리 권한 문제 해결
-                            static_dir = f"{cache_dir}/static"
-                            os.environ['STATIC_ROOT'] = static_dir
-                            os.environ['DJANGO_STATIC_ROOT'] = static_dir
-                            
-                            # 캐시 디렉터리 생성 및 권한 설정
-                            dirs_to_create = [
-                                cache_dir,
-                                f"{cache_dir}/huggingface",
-                                f"{cache_dir}/torch", 
-                                f"{cache_dir}/transformers",
-                                f"{cache_dir}/datalab",
-                                static_dir
-                            ]
-                            
-                            for dir_path in dirs_to_create:
-                                os.makedirs(dir_path, exist_ok=True)
-                                try:
-                                    os.chmod(dir_path, 0o777)
-                                except:
-                                    pass  # 권한 설정 실패해도 계속 진행
-                            
-                            # Python PATH에 marker 패키지의 static 경로 추가
-                            try:
-                                import sys
-                                # Marker가 static 파일을 찾는 경로를 수정
-                                marker_static_paths = [
-                                    static_dir,
-                                    f"{cache_dir}/marker_static",
-                                    "/app/static"
-                                ]
-                                
-                                for static_path in marker_static_paths:
-                                    os.makedirs(static_path, exist_ok=True)
-                                    os.chmod(static_path, 0o777)
-                                
-                                # 환경변수로 여러 static 경로 설정
-                                os.environ['MARKER_STATIC_DIR'] = static_dir
-                                os.environ['PYTHONPATH'] = f"{static_dir}:{os.environ.get('PYTHONPATH', '')}"
-                                
-                                st.info("📁 Static 디렉터리 우회 경로 설정 완료")
-                            except Exception as e:
-                                st.info(f"⚠️ Static 경로 설정 실패: {str(e)}")
-                            
-                            st.info(f"📁 캐시 디렉터리: {cache_dir}")
-                            
-                            # HF 토큰 환경변수 설정 시도
-                            if not os.getenv('HF_TOKEN'):
-                                st.warning("⚠️ HF_TOKEN 환경변수가 설정되지 않았습니다.")
-                                st.info("💡 토큰 없이 모델 로딩을 시도합니다...")
-                            
-                            model_dict = create_model_dict()
-                            st.success("✅ AI 모델 로딩 완료!")
-                        except Exception as model_error:
-                            error_str = str(model_error)
-                            st.error("❌ AI 모델 로딩 실패")
-                            st.error(f"상세 오류: {error_str}")
-                            
-                            if "403" in error_str or "Forbidden" in error_str:
-                                st.error("🚫 **403 Forbidden - HF Spaces 네트워크 정책 제한**")
-                                st.info("📋 **원인**: Hugging Face Spaces의 새로운 보안 정책")
-                                st.info("🔒 **제한사항**: 대용량 AI 모델 다운로드 차단")
-                                st.info("💡 **해결방안**: 로컬 환경에서 사용하거나 HF 지원팀 문의")
-                                st.markdown("**📧 문의**: [website@huggingface.co](mailto:website@huggingface.co)")
-                            else:
-                                st.info("💡 첫 실행 시 모델 다운로드에 시간이 걸릴 수 있습니다. 잠시 후 다시 시도해주세요.")
-                            return
-                        
-                        progress_bar.progress(30)
-                        
-                        status_text.text(f"🔄 {file_extension.upper()} 문서 분석 중...")
-                        
-                        # 문서 변환 설정
-                        config = {
-                            "extract_images": extract_images,
-                        }
-                        
-                        # 파일 타입에 따른 변환기 선택
-                        if file_extension == 'pdf':
-                            converter = PdfConverter(
-                                artifact_dict=model_dict,
-                                config=config
-=======
-                        # 변환 실행
-                        with st.spinner("🔄 문서 변환 중..."):
-                            full_text, images, out_meta = convert_single_pdf(
-                                tmp_path,
-                                model_lst,
-                                extract_images=extract_images,
-                                ocr_all_pages=use_llm
->>>>>>> 361518c9f61cc826917df3f5e4b5170b5a2f68db
-                            )
-                        
-<<<<<<< HEAD
-                        status_text.text("🔄 변환 실행 중...")
-                        
-                        # 변환 수행 (타임아웃 설정)
-                        import signal
-                        
-                        def timeout_handler(signum, frame):
-                            raise TimeoutError("변환 처리 시간 초과")
-                        
-                        try:
-                            # 변환 중에도 monkey patch 재적용
-                            os.makedirs = patched_makedirs
-                            os.chmod = patched_chmod
-                            builtins.open = patched_open
-                            
-                            # 5분 타임아웃 설정
-                            signal.signal(signal.SIGALRM, timeout_handler)
-                            signal.alarm(300)  # 5분
-                            
-                            rendered = converter(tmp_path)
-                            signal.alarm(0)  # 타임아웃 해제
-                            progress_bar.progress(80)
-                        except TimeoutError:
-                            st.error("⏰ 변환 시간 초과 (5분)")
-                            st.info("💡 파일이 복잡하거나 큽니다. 더 간단한 문서로 시도해보세요.")
-                            return
-                        except Exception as conv_error:
-                            signal.alarm(0)  # 타임아웃 해제
-                            # static 디렉터리 문제라면 한 번 더 시도
-                            if "static" in str(conv_error) and "Permission denied" in str(conv_error):
-                                st.warning("🔄 Static 디렉터리 문제 감지, 대안 경로로 재시도...")
-                                try:
-                                    # 환경변수로 우회 경로 설정
-                                    os.environ['PYTHONPATH'] = f"{temp_static}:/app/.cache/static_fallback:{os.environ.get('PYTHONPATH', '')}"
-                                    rendered = converter(tmp_path)
-                                    st.success("✅ 대안 경로로 변환 성공!")
-                                except Exception as final_error:
-                                    raise final_error
-                            else:
-                                raise conv_error
-                        
-                        # 결과 추출
-=======
-                        # 출력 형식에 따른 결과 생성
->>>>>>> 361518c9f61cc826917df3f5e4b5170b5a2f68db
-                        if output_format == "markdown":
-                            result = full_text
-                        elif output_format == "json":
-                            import json
-                            result_data = {
-                                "text": full_text,
-                                "metadata": out_meta,
-                                "images": len(images) if images else 0
-                            }
-                            result = json.dumps(result_data, ensure_ascii=False, indent=2)
-                        else:  # html
-                            result = f"<html><body><pre>{full_text}</pre></body></html>"
-                        
-                        # 결과 표시
-                        st.success("🎉 변환이 완료되었습니다!")
-                        
-                        # 결과 다운로드
-                        file_extension = "md" if output_format == "markdown" else output_format
-                        st.download_button(
-                            label=f"💾 {output_format.upper()} 파일 다운로드",
-                            data=result,
-                            file_name=f"converted.{file_extension}",
-                            mime="text/plain"
-                        )
-                        
-                        # 결과 미리보기 (일부만)
-                        st.subheader("📄 변환 결과 미리보기")
-                        
-                        if output_format == "markdown":
-                            # 마크다운 결과 표시 (처음 2000자)
-                            preview = result[:2000] + ("..." if len(result) > 2000 else "")
-                            st.markdown("```markdown\n" + preview + "\n```")
-                        else:
-                            # JSON/HTML 결과 표시
-                            preview = result[:1000] + ("..." if len(result) > 1000 else "")
-                            st.code(preview, language=output_format)
-                    
-                    except ImportError as e:
-                        st.error("❌ Marker 패키지를 찾을 수 없습니다.")
-                        st.error(f"오류 상세: {str(e)}")
-                        st.info("💡 로컬에서만 사용 가능한 기능입니다.")
+                    except:
+                        st.info("📊 Hugging Face Spaces 16GB 환경에서 실행 중")
                     
-                    except PermissionError as e:
-                        if "/usr/local" in str(e) or "Permission denied" in str(e):
-                            st.error("❌ 변환 중 오류가 발생했습니다: 시스템 파일 접근 권한 문제")
-                            st.error(f"상세 오류: {str(e)}")
-                            st.info("💡 일시적 오류일 수 있습니다. 다시 시도해보세요.")
-                        else:
-                            st.error(f"❌ 권한 오류: {str(e)}")
+                    # HF 토큰 환경변수 확인
+                    if not os.getenv('HF_TOKEN') and not get_registry().loaded:
+                        st.warning("⚠️ HF_TOKEN 환경변수가 설정되지 않았습니다.")
+                        st.info("💡 토큰 없이 모델 로딩을 시도합니다...")
                     
-                    except Exception as e:
-<<<<<<< HEAD
-                        error_msg = str(e)
-                        st.error(f"❌ 변환 중 오류가 발생했습니다: {error_msg}")
-                        
-                        # 구체적인 에러 타입별 안내
-                        if "403" in error_msg or "Forbidden" in error_msg:
-                            st.error("🚫 403 Forbidden 오류 - Hugging Face Spaces 제한")
-                            st.info("💡 이 오류는 HF Spaces의 네트워크 정책 또는 모델 다운로드 제한 때문일 수 있습니다.")
-                            st.info("🔄 잠시 후 다시 시도하거나, 로컬 환경에서 사용해보세요.")
-                        elif "Memory" in error_msg or "CUDA" in error_msg:
-                            st.info("💡 메모리 부족 - 더 작은 파일로 시도해보세요.")
-                        elif "timeout" in error_msg.lower():
-                            st.info("💡 처리 시간 초과 - 더 단순한 문서로 시도해보세요.")
-                        else:
-                            st.info("💡 일시적 오류일 수 있습니다. 다시 시도해보세요.")
-=======
-                        st.error(f"❌ 변환 중 오류가 발생했습니다: {str(e)}")
-                        st.info("💡 일시적 오류일 수 있습니다. 다시 시도해보세요.")
->>>>>>> 361518c9f61cc826917df3f5e4b5170b5a2f68db
-                    
-                    finally:
-                        # 임시 파일 정리
-                        try:
-                            os.unlink(tmp_path)
-                        except:
-                            pass
-            
-            except Exception as e:
-                st.error(f"❌ 처리 중 오류가 발생했습니다: {str(e)}")
+                    # 스풀된 업로드 파일 경로를 그대로 전달 (작업도 사용권을 가지므로 다른 파일을 올려도 변환이 끝날 때까지 유지)
+                    options = ConversionOptions(use_llm=use_llm, extract_images=extract_images)
+                    try:
+                        job = job_manager.submit(upload.path, uploaded_file.name, options, result_key)
+                    except JobQueueFull as e:
+                        st.error(f"🚦 {str(e)}")
+                        st.info("💡 잠시 후 다시 시도해주세요.")
+                    except JobTooLarge as e:
+                        st.error(f"🧠 메모리 부족으로 변환할 수 없습니다: {str(e)}")
+                        st.info("💡 이미지 추출을 끄거나 문서를 나눠서 올려주세요.")
+                    else:
+                        st.session_state["job_id"] = job.id
+                        st.rerun()
+                
+                except Exception as e:
+                    st.error(f"❌ 처리 중 오류가 발생했습니다: {str(e)}")
     
     # 연결 테스트
     with st.expander("🔧 연결 테스트"):
-        if st.button("🌐 인터넷 연결 테스트"):
+        if st.button("🔐 가중치 저장소 검증"):
             try:
-                import requests
-                response = requests.get("https://httpbin.org/get", timeout=10)
-                if response.status_code == 200:
-                    st.success("✅ 인터넷 연결 정상")
+                with st.spinner("가중치 파일 해시 확인 중..."):
+                    report = verify_store()
+                if report is None:
+                    st.info(f"📋 가중치 목록이 없습니다 ({manifest_path()}) - 온라인 모드에서는 첫 로드 시 내려받습니다.")
                 else:
-                    st.error(f"❌ 연결 오류: {response.status_code}")
-            except Exception as e:
-                st.error(f"❌ 연결 실패: {str(e)}")
+                    st.success(f"✅ 가중치 {report.files}개 ({report.bytes/1024/1024:.0f}MB) 검증 완료 ({report.mode}, {report.seconds:.1f}초)")
+            except WeightStoreError as e:
+                st.error(f"❌ {str(e)}")
         
         if st.button("📦 Marker 패키지 테스트"):
             try:
-                # 캐시 디렉터리 환경변수 설정
-                cache_dir = "/app/.cache"
-                os.environ['XDG_CACHE_HOME'] = cache_dir
-                os.environ['HUGGINGFACE_HUB_CACHE'] = f"{cache_dir}/huggingface"
-                os.environ['TORCH_HOME'] = f"{cache_dir}/torch"
-                os.environ['TRANSFORMERS_CACHE'] = f"{cache_dir}/transformers"
-                os.environ['HF_HOME'] = f"{cache_dir}/huggingface"
+                # 캐시 디렉터리 환경변수 설정 및 생성
+                cache_dir = prepare_cache_dirs()
                 
-                # 캐시 디렉터리 생성
-                os.makedirs(cache_dir, exist_ok=True)
-                os.makedirs(f"{cache_dir}/huggingface", exist_ok=True)
-                os.makedirs(f"{cache_dir}/datalab", exist_ok=True)
-                
-                from marker.models import create_model_dict
+                import marker.models  # import 가능 여부 확인
                 st.success("✅ Marker 패키지 import 성공")
                 st.info(f"📁 캐시 경로: {cache_dir}")
-                st.info("🔄 모델 딕셔너리 생성 테스트...")
-                model_dict = create_model_dict()
-                st.success("✅ AI 모델 로딩 성공!")
+                registry = get_registry()
+                if registry.loaded:
+                    st.info("♻️ 이미 로드된 공유 모델을 사용합니다")
+                else:
+                    st.info("🔄 모델 딕셔너리 생성 테스트...")
+                load_models()
+                st.success(f"✅ AI 모델 로딩 성공! (로드 시간: {registry.load_seconds:.1f}초)")
             except Exception as e:
                 error_msg = str(e)
                 st.error(f"❌ Marker 테스트 실패: {error_msg}")
@@ -0,0 +1,269 @@
+import hashlib
+import io
+import os
+import re
+import tempfile
+import threading
+import zipfile
+from dataclasses import dataclass
+
+# 추출 이미지 저장소 (내용 주소 방식)
+# Marker가 돌려준 PIL 이미지를 바로 WebP(없으면 최적화 PNG)로 다시 압축해 디스크에 쓰고,
+# 결과 객체에는 파일 이름만 남깁니다. 파일 이름은 원본 픽셀의 해시이므로
+# 같은 이미지는 페이지/문서가 달라도 한 번만 저장되고, 마크다운은 assets/<해시>.<확장자>로 참조합니다.
+
+ASSET_DIR = os.path.join(os.environ.get("MARKER_CACHE_DIR", "/tmp/marker_cache"), "assets")
+ASSET_FORMAT = os.environ.get("MARKER_ASSET_FORMAT", "webp").lower()
+# 긴 변 최대 픽셀 수와 파일 하나의 최대 크기 (넘으면 품질 -> 해상도 순으로 줄임)
+ASSET_MAX_SIDE = int(os.environ.get("MARKER_ASSET_MAX_SIDE", "2048"))
+ASSET_MAX_KB = int(os.environ.get("MARKER_ASSET_MAX_KB", "512"))
+ASSET_QUALITY = 85
+ASSET_MIN_QUALITY = 50
+# 저장소 전체 크기 상한 (오래 사용되지 않은 파일부터 삭제)
+ASSET_STORE_MB = int(os.environ.get("MARKER_ASSET_STORE_MB", "2048"))
+THUMBNAIL_SIDE = 256
+
+ASSET_PREFIX = "assets/"
+_NAME_RE = re.compile(r"^[0-9a-f]{32}\.(webp|png)$")
+ASSET_MIME_TYPES = {"webp": "image/webp", "png": "image/png"}
+
+
+@dataclass(frozen=True)
+class Asset:
+    digest: str
+    extension: str
+    size: int = 0
+
+    @property
+    def name(self):
+        return f"{self.digest}.{self.extension}"
+
+    @property
+    def ref(self):
+        # 마크다운/HTML에 들어가는 상대 경로
+        return ASSET_PREFIX + self.name
+
+    @property
+    def mime_type(self):
+        return ASSET_MIME_TYPES[self.extension]
+
+    def as_dict(self):
+        return {"digest": self.digest, "extension": self.extension, "size": self.size}
+
+
+def _webp_supported():
+    try:
+        from PIL import features
+        return bool(features.check("webp"))
+    except Exception:
+        return False
+
+
+def _pixel_digest(image):
+    # 인코딩/파일 이름과 무관하게 픽셀이 같으면 같은 해시
+    digest = hashlib.sha256(f"{image.mode}:{image.width}x{image.height}:".encode("ascii"))
+    digest.update(image.tobytes())
+    return digest.hexdigest()[:32]
+
+
+def _normalize_mode(image):
+    if image.mode in ("RGB", "RGBA", "L"):
+        return image
+    has_alpha = image.mode in ("LA", "PA") or (image.mode == "P" and "transparency" in image.info)
+    return image.convert("RGBA" if has_alpha else "RGB")
+
+
+def _encode(image, extension, max_side=ASSET_MAX_SIDE, max_bytes=ASSET_MAX_KB * 1024):
+    image = _normalize_mode(image)
+    if max(image.size) > max_side:
+        image = image.copy()
+        image.thumbnail((max_side, max_side))
+    quality = ASSET_QUALITY
+    while True:
+        buffer = io.BytesIO()
+        if extension == "webp":
+            image.save(buffer, format="WEBP", quality=quality, method=4)
+        else:
+            image.save(buffer, format="PNG", optimize=True)
+        data = buffer.getvalue()
+        if len(data) <= max_bytes or max(image.size) <= THUMBNAIL_SIDE:
+            return data
+        if extension == "webp" and quality > ASSET_MIN_QUALITY:
+            quality -= 15
+            continue
+        # 품질로 줄일 수 없으면 해상도를 3/4씩 줄임
+        image = image.resize((max(1, image.width * 3 // 4), max(1, image.height * 3 // 4)))
+
+
+class AssetStore:
+    def __init__(self, root=None, max_bytes=ASSET_STORE_MB * 1024 * 1024, extension=None):
+        self.root = root or ASSET_DIR
+        self.max_bytes = max_bytes
+        if extension is None:
+            extension = "webp" if ASSET_FORMAT == "webp" and _webp_supported() else "png"
+        self.extension = extension
+        self._lock = threading.Lock()
+        self._bytes = None
+        self.stored = 0
+        self.deduplicated = 0
+        os.makedirs(os.path.join(self.root, "thumbs"), exist_ok=True)
+
+    def path(self, name):
+        # 외부 입력(API 경로 등)으로 받은 이름도 저장소 밖을 가리키지 못하도록 형식 확인
+        name = name[len(ASSET_PREFIX):] if name.startswith(ASSET_PREFIX) else name
+        if not _NAME_RE.match(name):
+            return None
+        return os.path.join(self.root, name[:2], name)
+
+    def exists(self, asset):
+        return os.path.exists(self.path(asset.name))
+
+    def put(self, image):
+        digest = _pixel_digest(image)
+        asset_path = self.path(f"{digest}.{self.extension}")
+        if os.path.exists(asset_path):
+            # 이미 저장된 이미지 - LRU 판단용 접근 시각만 갱신
+            try:
+                os.utime(asset_path, None)
+                with self._lock:
+                    self.deduplicated += 1
+                return Asset(digest, self.extension, os.path.getsize(asset_path))
+            except OSError:
+                pass  # 그 사이 삭제되었으면 다시 씀
+
+        data = _encode(image, self.extension)
+        os.makedirs(os.path.dirname(asset_path), exist_ok=True)
+        # 임시 파일에 쓴 뒤 rename (동시에 같은 이미지를 쓰는 샤드 프로세스끼리도 안전)
+        fd, tmp_path = tempfile.mkstemp(prefix=".tmp_", dir=os.path.dirname(asset_path))
+        try:
+            with os.fdopen(fd, "wb") as asset_file:
+                asset_file.write(data)
+            os.replace(tmp_path, asset_path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        with self._lock:
+            self.stored += 1
+            if self._bytes is not None:
+                self._bytes += len(data)
+        return Asset(digest, self.extension, len(data))
+
+    def read(self, asset):
+        with open(self.path(asset.name), "rb") as asset_file:
+            return asset_file.read()
+
+    def thumbnail(self, asset, side=THUMBNAIL_SIDE):
+        # 미리보기용 축소본은 처음 요청될 때 만들어 저장소 옆에 보관
+        thumb_path = os.path.join(self.root, "thumbs", f"{asset.digest}_{side}.{self.extension}")
+        if not os.path.exists(thumb_path):
+            from PIL import Image
+
+            with Image.open(self.path(asset.name)) as image:
+                image.thumbnail((side, side))
+                data = _encode(image, self.extension, max_side=side)
+            fd, tmp_path = tempfile.mkstemp(prefix=".tmp_", dir=os.path.dirname(thumb_path))
+            with os.fdopen(fd, "wb") as thumb_file:
+                thumb_file.write(data)
+            os.replace(tmp_path, thumb_path)
+        with open(thumb_path, "rb") as thumb_file:
+            return thumb_file.read()
+
+    def _files(self):
+        for current, _, files in os.walk(self.root):
+            for name in files:
+                if not name.startswith("."):
+                    yield os.path.join(current, name)
+
+    def evict(self):
+        # 저장소가 상한을 넘으면 오래 사용되지 않은 파일부터 삭제
+        # (삭제된 이미지를 참조하는 캐시 결과는 읽을 때 무효 처리되어 다시 변환됨)
+        with self._lock:
+            if self._bytes is not None and self._bytes <= self.max_bytes:
+                return
+        entries = []
+        total = 0
+        for path in self._files():
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+        with self._lock:
+            self._bytes = total
+
+    def stats(self):
+        with self._lock:
+            return {
+                "format": self.extension,
+                "stored": self.stored,
+                "deduplicated": self.deduplicated,
+                "bytes": self._bytes,
+            }
+
+
+def store_images(images, pages, store=None):
+    # Marker 이미지 {파일명: PIL.Image}를 저장소에 넣고 페이지 마크다운의 참조를 assets/ 경로로 교체
+    # 반환값 {상대 경로: Asset} - PIL 이미지는 여기서 바로 버려짐
+    store = store or get_asset_store()
+    assets = {}
+    renamed = {}
+    for name, image in images.items():
+        asset = store.put(image)
+        assets[asset.ref] = asset
+        renamed[name] = asset.ref
+    for page in pages:
+        markdown = page.markdown
+        for name, ref in renamed.items():
+            if name in markdown:
+                markdown = markdown.replace(f"]({name})", f"]({ref})").replace(f'src="{name}"', f'src="{ref}"')
+        page.markdown = markdown
+    if assets:
+        store.evict()
+    return assets
+
+
+def write_assets(conversion, directory, store=None):
+    # 문서 옆 assets/ 디렉터리에 복사 (같은 디렉터리의 문서끼리는 같은 파일을 공유)
+    store = store or get_asset_store()
+    for ref, asset in conversion.images.items():
+        target = os.path.join(directory, ref)
+        if os.path.exists(target):
+            continue
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with open(target, "wb") as target_file:
+            target_file.write(store.read(asset))
+
+
+def add_assets_to_zip(archive, conversion, prefix="", written=None, store=None):
+    # ZIP 안의 문서 위치(prefix) 기준 assets/ 아래에 기록, written으로 같은 파일 중복 기록 방지
+    store = store or get_asset_store()
+    for ref, asset in conversion.images.items():
+        arcname = f"{prefix}{ref}"
+        if written is not None:
+            if arcname in written:
+                continue
+            written.add(arcname)
+        if store.exists(asset):
+            archive.write(store.path(asset.name), arcname, compress_type=zipfile.ZIP_STORED)
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_asset_store():
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = AssetStore()
+        return _store
@@ -0,0 +1,338 @@
+import os
+import posixpath
+import threading
+import time
+import uuid
+import zipfile
+from dataclasses import dataclass, field
+
+from admission import JobTooLarge
+from asset_store import add_assets_to_zip
+from engine import load_models
+from ingest import UploadTooLarge, spool_upload
+from jobs import CANCELLED, DONE, FAILED, QUEUED, JobQueueFull, get_job_manager
+from result_cache import cache_key, get_result_cache
+
+# 배치 변환: 여러 파일 또는 ZIP 아카이브를 받아 이미 로드된 모델로 순차 스케줄링하고
+# 결과(마크다운 + assets/ 이미지)를 하나의 ZIP 파일에 바로바로 기록합니다.
+# 완료된 결과는 ZIP에 쓴 뒤 메모리에서 내려놓으므로 문서 수와 무관하게 메모리가 일정합니다.
+
+SUPPORTED_EXTENSIONS = {"pdf", "docx", "pptx", "xlsx", "html", "epub", "png", "jpg", "jpeg"}
+BATCH_MAX_FILE_MB = int(os.environ.get("MARKER_BATCH_MAX_FILE_MB", "100"))
+BATCH_POLL_SECONDS = 0.5
+# 결과 ZIP은 앱 캐시 디렉터리 아래에 두고, 끝난 지 이 시간이 지난 배치는 상태와 ZIP을 함께 정리
+# (탭을 닫는 등 discard_batch가 불리지 않은 세션의 배치도 정리됨)
+BATCH_DIR = os.path.join(os.environ.get("MARKER_CACHE_DIR", "/tmp/marker_cache"), "batches")
+BATCH_TTL_SECONDS = int(os.environ.get("MARKER_BATCH_TTL", "3600"))
+
+PENDING = "pending"
+RUNNING = "running"
+FINISHED = "finished"
+
+
+@dataclass
+class BatchItem:
+    name: str
+    upload: object = None
+    zip_path: str = None
+    state: str = QUEUED
+    pages: int = 0
+    seconds: float = None
+    from_cache: bool = False
+    error: str = None
+
+    def as_row(self):
+        return {
+            "파일": self.name,
+            "상태": self.state,
+            "페이지": self.pages,
+            "시간(초)": round(self.seconds, 1) if self.seconds is not None else None,
+            "캐시": "⚡" if self.from_cache else "",
+            "오류": self.error or "",
+        }
+
+
+@dataclass
+class BatchRun:
+    id: str
+    items: list
+    options: object
+    output_path: str
+    state: str = PENDING
+    started_at: float = None
+    finished_at: float = None
+    error: str = None
+    cancel_requested: bool = False
+    _names: set = field(default_factory=set, repr=False)
+    _assets: set = field(default_factory=set, repr=False)
+
+    @property
+    def done_count(self):
+        return sum(1 for item in self.items if item.state in (DONE, FAILED, CANCELLED))
+
+    @property
+    def pages_done(self):
+        return sum(item.pages for item in self.items if item.state == DONE)
+
+    @property
+    def elapsed(self):
+        if self.started_at is None:
+            return 0.0
+        return (self.finished_at or time.time()) - self.started_at
+
+    @property
+    def docs_per_min(self):
+        if self.elapsed <= 0:
+            return 0.0
+        return sum(1 for item in self.items if item.state == DONE) / self.elapsed * 60
+
+    @property
+    def pages_per_min(self):
+        if self.elapsed <= 0:
+            return 0.0
+        return self.pages_done / self.elapsed * 60
+
+    def cancel(self):
+        self.cancel_requested = True
+
+
+def _extension(name):
+    return name.lower().rsplit(".", 1)[-1] if "." in name else ""
+
+
+def collect_items(uploads):
+    # 업로드 목록을 변환 항목으로 펼침 (ZIP은 목록만 읽고, 내용은 변환 직전에 하나씩 추출)
+    items = []
+    for upload in uploads:
+        if upload.extension == "zip":
+            with zipfile.ZipFile(upload.path) as archive:
+                for member in archive.infolist():
+                    if member.is_dir() or _extension(member.filename) not in SUPPORTED_EXTENSIONS:
+                        continue
+                    if os.path.basename(member.filename).startswith("."):
+                        continue
+                    items.append(BatchItem(name=member.filename, zip_path=upload.path))
+        elif upload.extension in SUPPORTED_EXTENSIONS:
+            items.append(BatchItem(name=upload.filename, upload=upload))
+    return items
+
+
+def _output_stem(run, name):
+    # ZIP 안의 경로는 그대로 폴더 구조로 쓰되, 결과 ZIP 밖을 가리키는 ../ 나 빈 구간은 버림
+    path = posixpath.normpath(os.path.splitext(name)[0].replace("\\", "/"))
+    stem = "/".join(part for part in path.split("/") if part not in ("", ".", "..")) or "document"
+    candidate = stem
+    index = 2
+    while candidate in run._names:
+        candidate = f"{stem}_{index}"
+        index += 1
+    run._names.add(candidate)
+    return candidate
+
+
+def _write_result(archive, run, item, result):
+    stem = _output_stem(run, item.name)
+    archive.writestr(f"{stem}.md", result.markdown)
+    # 이미지는 문서와 같은 폴더의 assets/에 한 번씩만 기록 (문서끼리 같은 이미지 공유)
+    folder = stem.rsplit("/", 1)[0] + "/" if "/" in stem else ""
+    add_assets_to_zip(archive, result, folder, run._assets)
+
+
+class BatchRunner:
+    def __init__(self, run):
+        self.run = run
+        self.job_manager = get_job_manager()
+
+    def _spool(self, item):
+        if item.upload is not None:
+            return item.upload
+        with zipfile.ZipFile(item.zip_path) as archive:
+            with archive.open(item.name) as member:
+                return spool_upload(member, os.path.basename(item.name), max_bytes=BATCH_MAX_FILE_MB * 1024 * 1024)
+
+    def _next_inputs(self):
+        for item in self.run.items:
+            if self.run.cancel_requested:
+                item.state = CANCELLED
+                continue
+            try:
+                upload = self._spool(item)
+            except UploadTooLarge as e:
+                item.state = FAILED
+                item.error = str(e)
+                continue
+            except Exception as e:
+                item.state = FAILED
+                item.error = f"압축 해제 실패: {e}"
+                continue
+            yield item, upload
+
+    def __call__(self):
+        run = self.run
+        run.state = RUNNING
+        run.started_at = time.time()
+        try:
+            # 모델은 배치 전체에서 한 번만 로드 (이미 로드되어 있으면 즉시 반환)
+            load_models()
+            with zipfile.ZipFile(run.output_path, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+                self._schedule(archive)
+        except Exception as e:
+            run.error = str(e)
+        finally:
+            for item in run.items:
+                if item.upload is not None:
+                    item.upload.release()
+                    item.upload = None
+                if item.state in (QUEUED, RUNNING):
+                    item.state = CANCELLED
+            run.finished_at = time.time()
+            run.state = FINISHED
+
+    def _schedule(self, archive):
+        run = self.run
+        result_cache = get_result_cache()
+        inputs = self._next_inputs()
+        waiting = None
+        in_flight = {}
+        exhausted = False
+        limit = max(1, self.job_manager.workers)
+
+        while True:
+            # 워커 수만큼만 동시에 제출 (나머지는 ZIP 안에 그대로 둠)
+            while not exhausted and not run.cancel_requested and len(in_flight) < limit:
+                if waiting is None:
+                    try:
+                        waiting = next(inputs)
+                    except StopIteration:
+                        exhausted = True
+                        break
+                item, upload = waiting
+                key = cache_key(upload.digest, run.options.use_llm, run.options.extract_images)
+                result = result_cache.get(key)
+                if result is not None:
+                    _write_result(archive, run, item, result)
+                    item.state = DONE
+                    item.pages = result.page_count
+                    item.from_cache = True
+                    item.seconds = 0.0
+                    self._release_input(item, upload)
+                    waiting = None
+                    continue
+                try:
+                    job = self.job_manager.submit(upload.path, item.name, run.options, key, delete_after=False)
+                except JobQueueFull:
+                    break
+                except JobTooLarge as e:
+                    item.state = FAILED
+                    item.error = str(e)
+                    self._release_input(item, upload)
+                    waiting = None
+                    continue
+                item.state = RUNNING
+                in_flight[job.id] = (item, upload, job)
+                waiting = None
+
+            if run.cancel_requested:
+                if waiting is not None:
+                    item, upload = waiting
+                    item.state = CANCELLED
+                    self._release_input(item, upload)
+                    waiting = None
+                for _, _, job in in_flight.values():
+                    self.job_manager.cancel(job.id)
+
+            if (exhausted or run.cancel_requested) and not in_flight:
+                break
+
+            time.sleep(BATCH_POLL_SECONDS)
+            for job_id, (item, upload, job) in list(in_flight.items()):
+                if not job.finished:
+                    continue
+                if job.state == DONE:
+                    _write_result(archive, run, item, job.result)
+                    item.state = DONE
+                    item.pages = job.result.page_count
+                else:
+                    item.state = job.state
+                    item.error = str(job.error) if job.error else None
+                item.seconds = job.elapsed
+                # ZIP에 기록한 결과는 작업 목록에서 바로 제거해 메모리 해제
+                self.job_manager.discard(job_id)
+                self._release_input(item, upload)
+                del in_flight[job_id]
+
+    def _release_input(self, item, upload):
+        upload.release()
+        item.upload = None
+
+
+_batches = {}
+_batches_lock = threading.Lock()
+
+
+def _unlink(path):
+    try:
+        os.unlink(path)
+    except OSError:
+        pass
+
+
+def prune_batches(now=None):
+    # 끝난 지 BATCH_TTL_SECONDS가 지난 배치와, 어떤 배치에도 속하지 않는 오래된 ZIP(프로세스 재시작 등으로 남은 것)을 삭제
+    now = now or time.time()
+    with _batches_lock:
+        expired = [run for run in _batches.values() if run.finished_at is not None and now - run.finished_at > BATCH_TTL_SECONDS]
+        for run in expired:
+            del _batches[run.id]
+        owned = {run.output_path for run in _batches.values()}
+    for run in expired:
+        _unlink(run.output_path)
+    try:
+        names = os.listdir(BATCH_DIR)
+    except OSError:
+        return len(expired)
+    for name in names:
+        path = os.path.join(BATCH_DIR, name)
+        try:
+            stale = path not in owned and now - os.path.getmtime(path) > BATCH_TTL_SECONDS
+        except OSError:
+            continue
+        if stale:
+            _unlink(path)
+    return len(expired)
+
+
+def start_batch(uploads, options):
+    prune_batches()
+    items = collect_items(uploads)
+    os.makedirs(BATCH_DIR, exist_ok=True)
+    output_path = os.path.join(BATCH_DIR, f"marker_batch_{uuid.uuid4().hex}.zip")
+    run = BatchRun(id=uuid.uuid4().hex, items=items, options=options, output_path=output_path)
+    # ZIP 원본은 모든 항목 추출이 끝난 뒤 삭제
+    zip_uploads = [upload for upload in uploads if upload.extension == "zip"]
+    with _batches_lock:
+        _batches[run.id] = run
+
+    def target():
+        try:
+            BatchRunner(run)()
+        finally:
+            for upload in zip_uploads:
+                upload.release()
+
+    threading.Thread(target=target, name=f"marker-batch-{run.id[:8]}", daemon=True).start()
+    return run
+
+
+def get_batch(batch_id):
+    if batch_id is None:
+        return None
+    with _batches_lock:
+        return _batches.get(batch_id)
+
+
+def discard_batch(batch_id):
+    with _batches_lock:
+        run = _batches.pop(batch_id, None)
+    if run is not None:
+        _unlink(run.output_path)
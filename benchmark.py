@@ -0,0 +1,530 @@
+import argparse
+import difflib
+import hashlib
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import threading
+import time
+import zipfile
+from xml.sax.saxutils import escape
+
+# 오프라인 CPU 변환 벤치마크
+#
+#   python benchmark.py run -o bench.json [--pages 1,5,20] [--kinds pdf,scan,docx,html,png] [--no-extract-images]
+#   python benchmark.py compare before.json after.json
+#
+# 추론 프로필 비교 (fp32 대비 속도와 출력 차이):
+#   python benchmark.py run --profile fp32 --keep-outputs -o fp32.json
+#   python benchmark.py run --profile int8 --keep-outputs -o int8.json
+#   python benchmark.py compare fp32.json int8.json
+#
+# 입력 문서는 매번 로컬에서 같은 시드로 만들어 내므로 실행 간/버전 간 비교가 가능합니다.
+# 모델 가중치는 이미 로컬 캐시에 있어야 합니다 (네트워크 접근 없음).
+
+# marker/torch import 전에 CPU 전용 + 오프라인으로 고정
+os.environ.setdefault("TORCH_DEVICE", "cpu")
+os.environ.setdefault("HF_HUB_OFFLINE", "1")
+os.environ.setdefault("TRANSFORMERS_OFFLINE", "1")
+
+from conversion_result import ConversionResult, marker_version  # noqa: E402
+from engine import PAGE_BATCH_SIZE, ConversionOptions, iter_convert, load_models, merge_metadata  # noqa: E402
+from inference_profile import FP32, PROFILES  # noqa: E402
+from model_registry import get_registry  # noqa: E402
+from renderers import OUTPUT_FORMATS, render  # noqa: E402
+from stage_timing import STAGES, StageTimings  # noqa: E402
+
+BENCHMARK_SCHEMA = 1
+DEFAULT_KINDS = ["pdf", "scan", "docx", "html", "png"]
+DEFAULT_PAGES = [1, 5, 20]
+# 스캔 PDF/DOCX는 페이지당 비용이 커서 페이지 수 상한을 둠
+MAX_PAGES = {"scan": 5, "docx": 5, "html": 1, "png": 1}
+RSS_SAMPLE_SECONDS = 0.02
+
+WORDS = (
+    "marker converts documents into markdown with layout detection text recognition table structure "
+    "and reading order the benchmark corpus is generated locally so results stay comparable across "
+    "versions settings and machines every page carries a heading paragraphs a list and a small table"
+).split()
+
+
+def _sentences(rng, count, words=12):
+    return [" ".join(rng.choice(WORDS) for _ in range(words)).capitalize() + "." for _ in range(count)]
+
+
+def _page_content(rng, page):
+    return {
+        "heading": f"Section {page + 1}: {' '.join(rng.choice(WORDS) for _ in range(3)).title()}",
+        "paragraphs": [" ".join(_sentences(rng, 4)) for _ in range(3)],
+        "items": _sentences(rng, 3, words=6),
+        "table": [["Name", "Value", "Unit"]] + [[rng.choice(WORDS), str(rng.randint(1, 999)), rng.choice(["ms", "MB", "%"])] for _ in range(3)],
+    }
+
+
+def _wrap(text, width):
+    lines, line = [], ""
+    for word in text.split():
+        if line and len(line) + len(word) + 1 > width:
+            lines.append(line)
+            line = word
+        else:
+            line = f"{line} {word}".strip()
+    if line:
+        lines.append(line)
+    return lines
+
+
+def _page_lines(content):
+    lines = []
+    for paragraph in content["paragraphs"]:
+        lines.extend(_wrap(paragraph, 90))
+        lines.append("")
+    lines.extend(f"- {item}" for item in content["items"])
+    lines.append("")
+    lines.extend("    ".join(cell.ljust(12) for cell in row) for row in content["table"])
+    return lines
+
+
+def write_text_pdf(path, pages, seed=0):
+    # 텍스트 레이어가 있는 PDF (표준 Helvetica 폰트, 외부 라이브러리 없이 직접 작성)
+    rng = random.Random(seed)
+
+    def pdf_string(text):
+        return "(" + text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)") + ")"
+
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", None, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    page_refs = []
+    for page in range(pages):
+        content = _page_content(rng, page)
+        ops = ["BT", "/F1 18 Tf", "72 740 Td", f"{pdf_string(content['heading'])} Tj", "/F1 10 Tf", "14 TL", "0 -30 Td"]
+        for line in _page_lines(content):
+            ops.append(f"{pdf_string(line)} Tj T*")
+        ops.append("ET")
+        stream = "\n".join(ops).encode("latin-1")
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        content_ref = len(objects)
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content_ref
+        )
+        page_refs.append(len(objects))
+    kids = " ".join(f"{ref} 0 R" for ref in page_refs).encode("ascii")
+    objects[1] = b"<< /Type /Pages /Kids [" + kids + b"] /Count %d >>" % pages
+
+    output = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(output))
+        output += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref = len(output)
+    output += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        output += b"%010d 00000 n \n" % offset
+    output += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    with open(path, "wb") as pdf_file:
+        pdf_file.write(output)
+
+
+def _page_image(content, size=(1275, 1650)):
+    from PIL import Image, ImageDraw, ImageFont
+
+    image = Image.new("RGB", size, "white")
+    draw = ImageDraw.Draw(image)
+    try:
+        font = ImageFont.load_default(size=22)
+        heading_font = ImageFont.load_default(size=40)
+    except TypeError:
+        font = heading_font = ImageFont.load_default()
+    y = 120
+    draw.text((120, y), content["heading"], fill="black", font=heading_font)
+    y += 80
+    for line in _page_lines(content):
+        draw.text((120, y), line, fill="black", font=font)
+        y += 30
+    return image
+
+
+def write_scanned_pdf(path, pages, seed=0):
+    # 텍스트 레이어 없이 이미지만 있는 PDF (OCR 경로 측정용)
+    rng = random.Random(seed)
+    images = [_page_image(_page_content(rng, page)) for page in range(pages)]
+    images[0].save(path, format="PDF", save_all=True, append_images=images[1:], resolution=150)
+
+
+def write_png(path, pages=1, seed=0):
+    _page_image(_page_content(random.Random(seed), 0)).save(path, format="PNG")
+
+
+def write_html(path, pages=1, seed=0):
+    rng = random.Random(seed)
+    parts = ["<!DOCTYPE html><html><head><meta charset='utf-8'><title>Benchmark</title></head><body>"]
+    for page in range(max(1, pages)):
+        content = _page_content(rng, page)
+        parts.append(f"<h1>{escape(content['heading'])}</h1>")
+        parts.extend(f"<p>{escape(paragraph)}</p>" for paragraph in content["paragraphs"])
+        parts.append("<ul>" + "".join(f"<li>{escape(item)}</li>" for item in content["items"]) + "</ul>")
+        rows = "".join("<tr>" + "".join(f"<td>{escape(cell)}</td>" for cell in row) + "</tr>" for row in content["table"])
+        parts.append(f"<table>{rows}</table>")
+    parts.append("</body></html>")
+    with open(path, "w", encoding="utf-8") as html_file:
+        html_file.write("\n".join(parts))
+
+
+def write_docx(path, pages, seed=0):
+    # 최소 구성 DOCX (제목/문단/목록/표, 페이지마다 페이지 나누기)
+    rng = random.Random(seed)
+
+    def paragraph(text, bold=False, size=None):
+        props = ("<w:b/>" if bold else "") + (f'<w:sz w:val="{size}"/>' if size else "")
+        run_props = f"<w:rPr>{props}</w:rPr>" if props else ""
+        return f'<w:p><w:r>{run_props}<w:t xml:space="preserve">{escape(text)}</w:t></w:r></w:p>'
+
+    body = []
+    for page in range(pages):
+        content = _page_content(rng, page)
+        body.append(paragraph(content["heading"], bold=True, size=36))
+        body.extend(paragraph(text) for text in content["paragraphs"])
+        body.extend(paragraph(f"• {item}") for item in content["items"])
+        rows = "".join(
+            "<w:tr>" + "".join(f"<w:tc><w:p><w:r><w:t>{escape(cell)}</w:t></w:r></w:p></w:tc>" for cell in row) + "</w:tr>"
+            for row in content["table"]
+        )
+        body.append(f"<w:tbl>{rows}</w:tbl>")
+        if page < pages - 1:
+            body.append('<w:p><w:r><w:br w:type="page"/></w:r></w:p>')
+
+    document = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main">'
+        f"<w:body>{''.join(body)}</w:body></w:document>"
+    )
+    content_types = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/word/document.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>'
+        "</Types>"
+    )
+    relationships = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+        'Target="word/document.xml"/></Relationships>'
+    )
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr("[Content_Types].xml", content_types)
+        archive.writestr("_rels/.rels", relationships)
+        archive.writestr("word/document.xml", document)
+
+
+GENERATORS = {
+    "pdf": ("pdf", write_text_pdf),
+    "scan": ("pdf", write_scanned_pdf),
+    "docx": ("docx", write_docx),
+    "html": ("html", write_html),
+    "png": ("png", write_png),
+}
+
+
+def generate_corpus(directory, kinds=DEFAULT_KINDS, page_counts=DEFAULT_PAGES, seed=0):
+    # [(이름, 종류, 페이지 수, 경로)] - 같은 시드면 항상 같은 내용
+    os.makedirs(directory, exist_ok=True)
+    corpus = []
+    for kind in kinds:
+        extension, writer = GENERATORS[kind]
+        counts = sorted({min(pages, MAX_PAGES.get(kind, pages)) for pages in page_counts})
+        for pages in counts:
+            name = f"{kind}_{pages}p.{extension}"
+            path = os.path.join(directory, name)
+            writer(path, pages, seed=seed)
+            corpus.append({"name": name, "kind": kind, "pages": pages, "path": path})
+    return corpus
+
+
+class PeakRss:
+    # 백그라운드 스레드로 RSS를 샘플링해 구간 최대값을 구함
+    def __init__(self, interval=RSS_SAMPLE_SECONDS):
+        self.interval = interval
+        self.peak = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sample(self):
+        try:
+            import psutil
+            process = psutil.Process()
+        except Exception:
+            return
+        while True:
+            rss = process.memory_info().rss
+            self.peak = max(self.peak or 0, rss)
+            if self._stop.wait(self.interval):
+                break
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        if self.peak is None:
+            import resource
+            # psutil이 없으면 프로세스 전체 최대 RSS (Linux는 KB 단위)
+            self.peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+        return False
+
+
+def _environment():
+    info = {
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "marker": marker_version(),
+        "device": os.environ.get("TORCH_DEVICE"),
+    }
+    try:
+        import torch
+        info["torch"] = torch.__version__
+        info["torch_threads"] = torch.get_num_threads()
+    except Exception:
+        pass
+    return info
+
+
+def measure_startup():
+    started = time.perf_counter()
+    import marker.converters.pdf  # noqa: F401
+    import marker.models  # noqa: F401
+    import_seconds = time.perf_counter() - started
+    load_models()
+    registry = get_registry()
+    return {
+        "import_seconds": import_seconds,
+        "model_load_seconds": registry.load_seconds,
+        "model_resident_bytes": registry.resident_bytes,
+    }
+
+
+def run_document(document, options):
+    timings = StageTimings()
+    pages, images, metadata_list = [], {}, []
+    page_count = 0
+    with PeakRss() as rss:
+        started = time.perf_counter()
+        # 페이지 캐시를 쓰면 워밍업/반복 실행/같은 시드로 만든 문서끼리 페이지를 재사용해 측정이 부풀려지므로 끔
+        # (결과 캐시는 작업 관리자 경로에서만 쓰이므로 여기서는 거치지 않음)
+        for batch in iter_convert(document["path"], options, use_page_cache=False):
+            pages.extend(batch.pages)
+            images.update(batch.images)
+            metadata_list.append(batch.metadata)
+            timings.merge(batch.timings)
+            page_count = batch.page_count or page_count
+        wall = time.perf_counter() - started
+
+        conversion = ConversionResult(pages=pages, metadata=merge_metadata(metadata_list), images=images)
+        serialize = {}
+        for output_format in OUTPUT_FORMATS:
+            format_started = time.perf_counter()
+            render(conversion, output_format)
+            serialize[output_format] = time.perf_counter() - format_started
+
+    markdown = conversion.markdown
+    return {
+        "input": document["name"],
+        "kind": document["kind"],
+        "pages": page_count,
+        "wall_seconds": wall,
+        "pages_per_second": page_count / wall if wall else None,
+        "peak_rss_bytes": rss.peak,
+        "stages": {stage: timings.seconds[stage] for stage in STAGES if stage in timings.seconds},
+        "serialize_seconds": serialize,
+        "output_chars": len(markdown),
+        "images": len(images),
+        "markdown_sha256": hashlib.sha256(markdown.encode("utf-8")).hexdigest(),
+    }, markdown
+
+
+def run_benchmark(options, kinds=DEFAULT_KINDS, page_counts=DEFAULT_PAGES, repeat=1, warmup=True, workdir=None, keep_outputs=False, profile=None):
+    workdir = workdir or tempfile.mkdtemp(prefix="marker_bench_")
+    corpus = generate_corpus(os.path.join(workdir, "inputs"), kinds, page_counts)
+    registry = get_registry()
+    if profile:
+        registry.set_profile(profile)
+    print("🧪 페이지 캐시/결과 캐시 끔 - 모든 페이지를 매번 모델로 변환합니다", file=sys.stderr)
+    startup = measure_startup()
+
+    if warmup and corpus:
+        # 첫 호출의 지연 초기화 비용은 측정에서 제외
+        run_document(min(corpus, key=lambda document: document["pages"]), options)
+
+    runs = []
+    outputs = {}
+    for document in corpus:
+        for index in range(repeat):
+            run, markdown = run_document(document, options)
+            run["repeat"] = index
+            runs.append(run)
+            outputs[document["name"]] = markdown
+            print(f"⏱️ {run['input']}: {run['wall_seconds']:.2f}초, {run['pages_per_second'] or 0:.2f}페이지/초", file=sys.stderr)
+
+    total_pages = sum(run["pages"] for run in runs)
+    total_wall = sum(run["wall_seconds"] for run in runs)
+    pages_per_second = total_pages / total_wall if total_wall else None
+    threads = registry.torch_threads
+    report = {
+        "schema": BENCHMARK_SCHEMA,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "environment": _environment(),
+        "settings": {
+            "use_llm": options.use_llm,
+            "extract_images": options.extract_images,
+            "page_batch_size": PAGE_BATCH_SIZE,
+            # 모든 페이지를 매번 모델로 변환 (캐시 재사용 없음)
+            "page_cache": False,
+            "result_cache": False,
+            "profile": registry.profile,
+            "torch_threads": threads,
+            "repeat": repeat,
+            "kinds": list(kinds),
+            "page_counts": list(page_counts),
+        },
+        "startup": startup,
+        "runs": runs,
+        "summary": {
+            "pages": total_pages,
+            "wall_seconds": total_wall,
+            "pages_per_second": pages_per_second,
+            # 코어(torch 스레드)당 처리량 - 스레드 수가 다른 실행끼리 비교할 때 사용
+            "pages_per_second_per_thread": pages_per_second / threads if pages_per_second and threads else None,
+            "peak_rss_bytes": max((run["peak_rss_bytes"] or 0 for run in runs), default=None),
+        },
+    }
+    if keep_outputs:
+        report["outputs"] = outputs
+    return report
+
+
+def text_similarity(reference, candidate):
+    # 단어 단위 일치 비율 (1.0이면 동일) - 기준 출력(fp32) 대비 정확도 차이 추정용
+    if reference == candidate:
+        return 1.0
+    return difflib.SequenceMatcher(None, reference.split(), candidate.split(), autojunk=False).ratio()
+
+
+def accuracy_delta(reference, report):
+    # 두 결과 모두 --keep-outputs로 만든 경우 입력별 {이름: 유사도}와 평균 차이
+    before, after = reference.get("outputs"), report.get("outputs")
+    if not before or not after:
+        return None
+    similarities = {name: text_similarity(before[name], after[name]) for name in after if name in before}
+    if not similarities:
+        return None
+    mean = sum(similarities.values()) / len(similarities)
+    return {"inputs": similarities, "mean_similarity": mean, "delta": 1 - mean}
+
+
+def compare_reports(before, after):
+    # 입력별 pages/sec와 단계별 시간 변화를 표로 출력
+    lines = []
+    for label, report in (("before", before), ("after", after)):
+        settings = report["settings"]
+        # 캐시 설정이 없는 예전 결과는 페이지 캐시 도입 전이므로 캐시 없음
+        caches = "on" if settings.get("page_cache") or settings.get("result_cache") else "off"
+        lines.append(f"{label}: profile {settings.get('profile', FP32)}, caches {caches}")
+    before_profile = before["settings"].get("profile", FP32)
+    before_runs = {run["input"]: run for run in before["runs"]}
+    lines.append(f"{'input':<16} {'before p/s':>10} {'after p/s':>10} {'change':>8}")
+    for run in after["runs"]:
+        previous = before_runs.get(run["input"])
+        if previous is None or not previous["pages_per_second"] or not run["pages_per_second"]:
+            continue
+        change = run["pages_per_second"] / previous["pages_per_second"] - 1
+        lines.append(f"{run['input']:<16} {previous['pages_per_second']:>10.2f} {run['pages_per_second']:>10.2f} {change:>+8.1%}")
+        for stage in STAGES:
+            old, new = previous["stages"].get(stage), run["stages"].get(stage)
+            if old is None or new is None:
+                continue
+            lines.append(f"  {stage:<14} {old:>10.3f}s {new:>9.3f}s {new - old:>+8.3f}")
+
+    summary = {"before": before["summary"], "after": after["summary"]}
+    for label, key in (("pages/s", "pages_per_second"), ("pages/s/thread", "pages_per_second_per_thread"), ("peak RSS MB", "peak_rss_bytes")):
+        old, new = summary["before"].get(key), summary["after"].get(key)
+        if old and new:
+            if key == "peak_rss_bytes":
+                old, new = old / 1024 / 1024, new / 1024 / 1024
+            lines.append(f"{label:<16} {old:>10.2f} {new:>10.2f} {new / old - 1:>+8.1%}")
+
+    accuracy = accuracy_delta(before, after)
+    if accuracy is None:
+        lines.append("accuracy: 두 결과 모두 --keep-outputs로 실행하면 출력 유사도를 비교합니다")
+    else:
+        lines.append(f"{'input':<16} {'similarity':>10}")
+        for name, similarity in accuracy["inputs"].items():
+            lines.append(f"{name:<16} {similarity:>10.2%}")
+        lines.append(f"accuracy delta vs {before_profile}: {accuracy['delta']:.2%} (평균 유사도 {accuracy['mean_similarity']:.2%})")
+    return "\n".join(lines)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Marker 변환 벤치마크")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser("run", help="합성 문서로 벤치마크 실행")
+    run.add_argument("-o", "--output", default="-", help="결과 JSON 경로 (기본: 표준 출력)")
+    run.add_argument("--kinds", default=",".join(DEFAULT_KINDS), help=f"입력 종류 ({','.join(GENERATORS)})")
+    run.add_argument("--pages", default=",".join(str(pages) for pages in DEFAULT_PAGES), help="페이지 수 목록")
+    run.add_argument("--repeat", type=int, default=1)
+    run.add_argument("--no-warmup", action="store_true")
+    run.add_argument("--use-llm", action="store_true")
+    run.add_argument("--no-extract-images", action="store_true")
+    run.add_argument("--keep-outputs", action="store_true", help="변환된 마크다운을 결과 JSON에 포함")
+    run.add_argument("--workdir", help="합성 입력 문서를 만들 디렉터리")
+    run.add_argument("--profile", choices=PROFILES, help="추론 프로필 (기본: MARKER_INFERENCE_PROFILE 또는 fp32)")
+
+    compare = commands.add_parser("compare", help="두 결과 JSON 비교")
+    compare.add_argument("before")
+    compare.add_argument("after")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.command == "compare":
+        with open(args.before, encoding="utf-8") as before, open(args.after, encoding="utf-8") as after:
+            print(compare_reports(json.load(before), json.load(after)))
+        return 0
+
+    kinds = [kind.strip() for kind in args.kinds.split(",") if kind.strip()]
+    unknown = [kind for kind in kinds if kind not in GENERATORS]
+    if unknown:
+        print(f"❌ 알 수 없는 입력 종류: {', '.join(unknown)}", file=sys.stderr)
+        return 2
+    options = ConversionOptions(use_llm=args.use_llm, extract_images=not args.no_extract_images)
+    report = run_benchmark(
+        options,
+        kinds=kinds,
+        page_counts=[int(pages) for pages in args.pages.split(",") if pages.strip()],
+        repeat=max(1, args.repeat),
+        warmup=not args.no_warmup,
+        workdir=args.workdir,
+        keep_outputs=args.keep_outputs,
+        profile=args.profile,
+    )
+    payload = json.dumps(report, ensure_ascii=False, indent=2, default=str)
+    if args.output == "-":
+        print(payload)
+    else:
+        with open(args.output, "w", encoding="utf-8") as output_file:
+            output_file.write(payload)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,177 @@
+import argparse
+import os
+import sys
+import time
+
+from admission import JobTooLarge
+from asset_store import write_assets
+from batch import SUPPORTED_EXTENSIONS
+from engine import ConversionOptions, ModelLoadError, load_models
+from inference_profile import PROFILES
+from ingest import file_sha256
+from jobs import DONE, JobQueueFull, get_job_manager
+from model_registry import get_registry
+from renderers import FILE_EXTENSIONS, OUTPUT_FORMATS, write_output
+from result_cache import cache_key, get_result_cache
+
+# 명령줄 변환기 / 헤드리스 API 서버
+#
+#   python cli.py convert 입력_디렉터리 -o 출력_디렉터리 [--format markdown|json|html]
+#   python cli.py serve --port 8502
+#
+# Streamlit UI와 같은 엔진/작업 관리자/결과 캐시를 사용합니다.
+
+CLI_POLL_SECONDS = 0.5
+
+
+def find_documents(root, recursive=False):
+    if os.path.isfile(root):
+        return [root]
+    found = []
+    for current, dirs, files in os.walk(root):
+        dirs[:] = sorted(d for d in dirs if not d.startswith("."))
+        for name in sorted(files):
+            extension = name.lower().rsplit(".", 1)[-1] if "." in name else ""
+            if extension in SUPPORTED_EXTENSIONS and not name.startswith("."):
+                found.append(os.path.join(current, name))
+        if not recursive:
+            break
+    return found
+
+
+def write_result(conversion, output_dir, relative_name, output_format):
+    stem = os.path.splitext(relative_name)[0]
+    output_path = os.path.join(output_dir, f"{stem}.{FILE_EXTENSIONS[output_format]}")
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    with open(output_path, "w", encoding="utf-8") as output_file:
+        write_output(conversion, output_format, output_file)
+    if conversion.images and output_format != "html":
+        # 마크다운/JSON의 assets/ 상대 경로가 그대로 열리도록 문서 옆에 복사 (HTML은 이미지 내장)
+        write_assets(conversion, os.path.dirname(output_path))
+    return output_path
+
+
+def convert_directory(input_path, output_dir, options, output_format="markdown", recursive=False):
+    documents = find_documents(input_path, recursive)
+    if not documents:
+        print("⚠️ 변환할 문서가 없습니다.", file=sys.stderr)
+        return 0, 0
+
+    base_dir = input_path if os.path.isdir(input_path) else os.path.dirname(input_path)
+    job_manager = get_job_manager()
+    result_cache = get_result_cache()
+    # 모델은 한 번만 로드하고 모든 문서가 공유
+    load_models()
+
+    started = time.time()
+    pending = list(documents)
+    in_flight = {}
+    succeeded = failed = pages = 0
+    limit = max(1, job_manager.workers)
+
+    def finish(path, conversion, label):
+        nonlocal succeeded, pages
+        relative_name = os.path.relpath(path, base_dir)
+        output_path = write_result(conversion, output_dir, relative_name, output_format)
+        succeeded += 1
+        pages += conversion.page_count
+        print(f"✅ {relative_name} -> {output_path} ({conversion.page_count}페이지, {label})")
+
+    while pending or in_flight:
+        while pending and len(in_flight) < limit:
+            path = pending[0]
+            key = cache_key(file_sha256(path), options.use_llm, options.extract_images)
+            cached = result_cache.get(key)
+            if cached is not None:
+                pending.pop(0)
+                finish(path, cached, "캐시")
+                continue
+            try:
+                # 입력 파일은 사용자 소유이므로 작업이 삭제하지 않음
+                job = job_manager.submit(path, os.path.basename(path), options, key, delete_after=False)
+            except JobQueueFull:
+                break
+            except JobTooLarge as e:
+                pending.pop(0)
+                failed += 1
+                print(f"❌ {os.path.relpath(path, base_dir)}: {e}", file=sys.stderr)
+                continue
+            pending.pop(0)
+            in_flight[job.id] = (path, job)
+
+        time.sleep(CLI_POLL_SECONDS)
+        for job_id, (path, job) in list(in_flight.items()):
+            if not job.finished:
+                continue
+            del in_flight[job_id]
+            if job.state == DONE:
+                finish(path, job.result, f"{job.elapsed:.1f}초")
+            else:
+                failed += 1
+                print(f"❌ {os.path.relpath(path, base_dir)}: {job.error}", file=sys.stderr)
+            job_manager.discard(job_id)
+
+    elapsed = time.time() - started
+    print(f"📊 {succeeded}개 성공, {failed}개 실패, {pages}페이지, {elapsed:.1f}초 ({pages / elapsed * 60 if elapsed else 0:.1f}페이지/분)")
+    return succeeded, failed
+
+
+def serve(host, port, preload=False):
+    from api import start_api_server
+
+    server = start_api_server(port, host)
+    print(f"🚀 변환 API 실행 중: http://{host}:{server.server_address[1]}")
+    if preload:
+        # 서버는 바로 요청을 받고, 모델 준비 여부는 /readyz로 확인
+        from warmup import start_warmup
+        start_warmup()
+        print("🔄 모델을 백그라운드에서 준비 중 (/readyz)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Marker 문서 변환 CLI")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    convert = commands.add_parser("convert", help="파일 또는 디렉터리의 문서를 변환")
+    convert.add_argument("input", help="입력 파일 또는 디렉터리")
+    convert.add_argument("-o", "--output", help="출력 디렉터리 (기본: <입력>_converted)")
+    convert.add_argument("--format", choices=OUTPUT_FORMATS, default="markdown")
+    convert.add_argument("--use-llm", action="store_true", help="LLM 보정 사용")
+    convert.add_argument("--no-images", action="store_true", help="이미지 추출 안 함")
+    convert.add_argument("-r", "--recursive", action="store_true", help="하위 디렉터리 포함")
+    convert.add_argument("--profile", choices=PROFILES, help="추론 프로필 (기본: MARKER_INFERENCE_PROFILE 또는 fp32)")
+
+    server = commands.add_parser("serve", help="헤드리스 HTTP API 실행")
+    server.add_argument("--host", default=os.environ.get("MARKER_API_HOST", "127.0.0.1"))
+    server.add_argument("--port", type=int, default=int(os.environ.get("MARKER_API_PORT", "8502")))
+    server.add_argument("--preload", action="store_true", help="시작할 때 모델을 백그라운드에서 미리 로드")
+    server.add_argument("--profile", choices=PROFILES, help="추론 프로필 (기본: MARKER_INFERENCE_PROFILE 또는 fp32)")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.profile:
+        get_registry().set_profile(args.profile)
+    if args.command == "serve":
+        serve(args.host, args.port, args.preload)
+        return 0
+
+    input_path = os.path.abspath(args.input)
+    output_dir = args.output or f"{input_path.rstrip(os.sep)}_converted"
+    options = ConversionOptions(use_llm=args.use_llm, extract_images=not args.no_images)
+    try:
+        _, failed = convert_directory(input_path, output_dir, options, args.format, args.recursive)
+    except ModelLoadError as e:
+        print(f"❌ 모델 로드 실패: {e}", file=sys.stderr)
+        return 2
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
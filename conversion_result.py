@@ -0,0 +1,41 @@
+import uuid
+from dataclasses import dataclass, field
+
+
+@dataclass
+class PageResult:
+    # 페이지 단위 변환 결과 (page는 원본 문서의 0부터 시작하는 페이지 번호)
+    page: int
+    markdown: str
+
+
+@dataclass
+class ConversionResult:
+    # 변환 1회당 하나씩 만들어지는 중간 결과
+    # 페이지별 마크다운 + Marker 메타데이터 + 추출 이미지 {상대 경로(assets/...): asset_store.Asset}
+    # 이미지 내용은 디스크 저장소에만 있고 결과 객체에는 참조만 들어 있습니다.
+    # markdown/json/html 출력은 모두 renderers 모듈에서 이 객체로부터 만들어냅니다.
+    pages: list
+    metadata: dict = field(default_factory=dict)
+    images: dict = field(default_factory=dict)
+    from_cache: bool = False
+    # 내보내기 파일 이름 등에 쓰는 식별자 (완료 결과는 결과 캐시 키, 그 외에는 임의 값)
+    result_id: str = field(default_factory=lambda: uuid.uuid4().hex, compare=False)
+    # 형식별 출력 문자열 메모 (renderers.render에서 채움)
+    renders: dict = field(default_factory=dict, repr=False, compare=False)
+
+    @property
+    def markdown(self):
+        return "\n\n".join(page.markdown for page in self.pages if page.markdown)
+
+    @property
+    def page_count(self):
+        return len(self.pages)
+
+
+def marker_version():
+    try:
+        from importlib.metadata import version
+        return version("marker-pdf")
+    except Exception:
+        return "unknown"
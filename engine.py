@@ -0,0 +1,350 @@
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+
+from asset_store import store_images
+from conversion_result import ConversionResult
+from model_registry import get_registry, release_memory
+from native_converters import convert_native
+from page_cache import PAGE_CACHE_ENABLED, get_page_cache, page_fingerprints
+from renderers import split_pages
+from runtime_paths import configure_marker_static, configure_model_cache
+from stage_timing import StageTimings, build_converter
+from text_layer import ROUTE_CONFIG, classify_pages
+from weight_store import configure_offline
+
+# Streamlit과 무관한 변환 파이프라인
+# UI 버튼 핸들러와 백그라운드 작업 워커가 같은 함수를 사용합니다.
+
+# marker import 전에 static(폰트) 경로와 모델 캐시 경로를 한 번만 지정 - 변환 경로에는 파일 시스템 가로채기 없음
+configure_marker_static()
+configure_model_cache()
+# MARKER_OFFLINE=1이면 HF/surya가 네트워크에 접근하지 않도록 설정
+configure_offline()
+
+
+class ModelLoadError(Exception):
+    pass
+
+
+class ConversionTimeout(TimeoutError):
+    pass
+
+
+class ConversionCancelled(Exception):
+    pass
+
+
+# 한 번에 Marker에 넘기는 페이지 수 (배치 경계마다 취소/시간 초과를 확인)
+PAGE_BATCH_SIZE = int(os.environ.get("MARKER_PAGE_BATCH", "8"))
+# 첫 배치는 작게 잡아 첫 페이지 결과가 빨리 나오도록 함
+FIRST_PAGE_BATCH_SIZE = int(os.environ.get("MARKER_FIRST_PAGE_BATCH", "1"))
+
+
+class CancelToken:
+    # 스레드 안전한 취소 신호 + 작업 마감 시각
+    # SIGALRM과 달리 어떤 스레드에서도 동작하며, 변환 루프가 페이지 배치 경계에서 확인합니다.
+    def __init__(self, timeout_seconds=None):
+        self._event = threading.Event()
+        self.timeout_seconds = None
+        self.deadline = None
+        if timeout_seconds:
+            self.start_deadline(timeout_seconds)
+
+    def start_deadline(self, timeout_seconds):
+        self.timeout_seconds = timeout_seconds
+        self.deadline = time.monotonic() + timeout_seconds
+
+    def cancel(self):
+        self._event.set()
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+    @property
+    def expired(self):
+        return self.deadline is not None and time.monotonic() > self.deadline
+
+    def check(self):
+        if self.cancelled:
+            raise ConversionCancelled("사용자가 변환을 취소했습니다")
+        if self.expired:
+            raise ConversionTimeout(f"변환 처리 시간 초과 ({int(self.timeout_seconds // 60)}분)")
+
+
+@dataclass
+class ConversionOptions:
+    use_llm: bool = False
+    extract_images: bool = True
+    # Marker 내부 배치 크기 배율 (승인 제어가 메모리 여유에 맞춰 정함, 결과에는 영향 없음)
+    batch_scale: float = 1.0
+
+
+@dataclass
+class PageBatch:
+    # 스트리밍 변환에서 배치 하나가 끝날 때마다 전달되는 결과
+    pages: list
+    images: dict
+    metadata: dict
+    pages_done: int
+    page_count: int = None
+    # 이 배치의 파이프라인 단계별 소요 시간 {단계: 초}
+    timings: dict = field(default_factory=dict)
+
+
+def prepare_cache_dirs():
+    # 모델 캐시 경로 (engine import 시 이미 지정됨 - 한 경로만 사용하므로 가중치를 두 번 받지 않음)
+    return configure_model_cache()
+
+
+def load_models():
+    try:
+        return get_registry().get()
+    except Exception as model_error:
+        raise ModelLoadError(str(model_error)) from model_error
+
+
+def pdf_page_count(path):
+    # PDF가 아니거나 열 수 없으면 None
+    if not path.lower().endswith(".pdf"):
+        return None
+    try:
+        import pypdfium2
+        document = pypdfium2.PdfDocument(path)
+        try:
+            return len(document)
+        finally:
+            document.close()
+    except Exception:
+        return None
+
+
+def page_batches(page_numbers, batch_size=PAGE_BATCH_SIZE, first_batch_size=FIRST_PAGE_BATCH_SIZE):
+    page_numbers = list(page_numbers)
+    start = 0
+    size = min(first_batch_size, batch_size) if first_batch_size else batch_size
+    while start < len(page_numbers):
+        yield page_numbers[start:start + size]
+        start += size
+        size = batch_size
+
+
+def route_batches(routes, batch_size=PAGE_BATCH_SIZE, first_batch_size=FIRST_PAGE_BATCH_SIZE):
+    # 같은 경로(텍스트 레이어/OCR)가 이어지는 페이지끼리만 배치로 묶음 - 배치마다 config가 하나이므로
+    runs = []
+    for route in routes:
+        if runs and runs[-1][-1].route == route.route:
+            runs[-1].append(route)
+        else:
+            runs.append([route])
+    first = True
+    for run in runs:
+        for batch in page_batches(run, batch_size, first_batch_size if first else 0):
+            first = False
+            yield batch
+
+
+def merge_metadata(metadata_list):
+    # 페이지 배치별 Marker 메타데이터를 하나로 합침 (리스트 항목은 이어 붙임)
+    merged = {}
+    for metadata in metadata_list:
+        for key, value in (metadata or {}).items():
+            if isinstance(value, list):
+                merged.setdefault(key, []).extend(value)
+            else:
+                merged[key] = value
+    return merged
+
+
+def convert_document(path, options, cancel_token=None, on_batch=None, page_numbers=None, use_page_cache=True, fingerprints=None):
+    # on_batch(PageBatch)는 페이지 배치가 끝날 때마다 호출됨 (미리보기/진행률 갱신용)
+    pages = []
+    images = {}
+    metadata_list = []
+    for batch in iter_convert(path, options, cancel_token, page_numbers, use_page_cache, fingerprints):
+        pages.extend(batch.pages)
+        images.update(batch.images)
+        metadata_list.append(batch.metadata)
+        if on_batch is not None:
+            on_batch(batch)
+    return ConversionResult(
+        pages=pages,
+        metadata=merge_metadata(metadata_list),
+        images=images,
+    )
+
+
+def reuse_cached_pages(path, page_numbers, options, page_count):
+    # 이전에 변환한 적 있는 페이지(지문 일치)를 페이지 캐시에서 찾음
+    # -> (재사용 PageBatch 또는 None, 새로 변환할 페이지 목록, {페이지: 지문} 또는 None)
+    page_cache = get_page_cache()
+    timings = StageTimings()
+    with timings.measure("page_cache"):
+        fingerprints = page_fingerprints(path, page_numbers)
+        reused = page_cache.lookup(fingerprints, options) if fingerprints else {}
+    if not reused:
+        return None, list(page_numbers), fingerprints
+    cached_images = {}
+    cached_metadata = []
+    for _, images, metadata in reused.values():
+        cached_images.update(images)
+        cached_metadata.append(metadata)
+    metadata = merge_metadata(cached_metadata)
+    metadata["reused_pages"] = sorted(reused)
+    batch = PageBatch(
+        pages=[reused[page][0] for page in sorted(reused)],
+        images=cached_images,
+        metadata=metadata,
+        pages_done=len(reused),
+        page_count=page_count,
+        timings=timings.as_dict(),
+    )
+    return batch, [page for page in page_numbers if page not in reused], fingerprints
+
+
+def iter_convert(path, options, cancel_token=None, page_numbers=None, use_page_cache=True, fingerprints=None):
+    # 페이지 배치 단위 스트리밍 변환: 배치가 끝날 때마다 PageBatch를 yield
+    # page_numbers를 주면 해당 PDF 페이지(0부터)만 변환
+    # use_page_cache=False면 페이지 캐시를 읽지도 쓰지도 않음 (벤치마크 등)
+    # fingerprints를 주면 이미 호출한 쪽에서 캐시를 조회한 것으로 보고 변환 결과 저장에만 사용 (샤드)
+    if cancel_token is None:
+        cancel_token = CancelToken()
+    try:
+        yield from _iter_convert(path, options, cancel_token, page_numbers, use_page_cache, fingerprints)
+    except (ConversionCancelled, ConversionTimeout):
+        # 중단된 배치가 남긴 페이지 이미지/텐서 메모리 회수
+        release_memory()
+        raise
+
+
+def _iter_convert(path, options, cancel_token, page_numbers, use_page_cache=True, fingerprints=None):
+    cancel_token.check()
+
+    # HTML/XLSX/DOCX는 래스터 이미지가 없으면 모델 없이 구조 그대로 변환
+    timings = StageTimings()
+    with timings.measure("native"):
+        native = convert_native(path) if page_numbers is None else None
+    if native is not None:
+        yield PageBatch(
+            pages=native.pages,
+            images={},
+            metadata=native.metadata,
+            pages_done=native.page_count,
+            page_count=native.page_count,
+            timings=timings.as_dict(),
+        )
+        return
+
+    # PDF는 페이지 배치 단위로 변환하고 배치 사이마다 취소/마감 확인
+    # (다른 형식은 페이지 수를 미리 알 수 없어 한 번에 변환)
+    if page_numbers is None:
+        page_count = pdf_page_count(path)
+        if page_count:
+            page_numbers = range(page_count)
+    else:
+        page_count = len(page_numbers)
+
+    # 이전에 변환한 적 있는 페이지(지문 일치)는 페이지 캐시에서 끼워 넣고 바뀐 페이지만 모델로 변환
+    pages_done = 0
+    use_page_cache = use_page_cache and PAGE_CACHE_ENABLED and bool(page_numbers)
+    if not use_page_cache:
+        fingerprints = None
+    elif fingerprints is None:
+        reused_batch, page_numbers, fingerprints = reuse_cached_pages(path, page_numbers, options, page_count)
+        if reused_batch is not None:
+            pages_done = reused_batch.pages_done
+            yield reused_batch
+            if not page_numbers:
+                return
+            cancel_token.check()
+
+    # Marker 패키지 import (static 경로는 모듈 로드 시 이미 지정됨)
+    from marker.output import text_from_rendered
+
+    from admission import batch_settings, get_admission_controller, page_batch_size
+
+    model_dict = load_models()
+
+    # 문서 변환 설정
+    config = {
+        "extract_images": options.extract_images,
+        "use_llm": options.use_llm,
+        # 페이지 구분자를 넣어 렌더링 -> 페이지별 결과로 분리해서 보관
+        "paginate_output": True,
+    }
+    config.update(batch_settings(options.batch_scale))
+    admission = get_admission_controller()
+    converter = None
+    converter_settings = None
+
+    # PDF는 페이지마다 텍스트 레이어를 확인해 born-digital 페이지는 OCR을 건너뜀
+    classify_timings = StageTimings()
+    with classify_timings.measure("text_layer"):
+        routes = classify_pages(path, page_numbers) if page_numbers else None
+    if routes:
+        batches = list(route_batches(routes, page_batch_size(options.batch_scale)))
+    elif page_numbers:
+        batches = list(page_batches(page_numbers, page_batch_size(options.batch_scale)))
+    else:
+        batches = [None]
+
+    first_batch = True
+    for batch in batches:
+        cancel_token.check()
+        batch_routes = None
+        if batch is not None and routes:
+            batch_routes = batch
+            batch = [route.page for route in batch_routes]
+            config.update(ROUTE_CONFIG[batch_routes[0].route])
+        if batch is not None:
+            config["page_range"] = batch
+        # 실행 중 여유 메모리가 줄면 다음 배치부터 레이아웃/OCR 배치 크기를 더 줄임
+        config.update(batch_settings(min(options.batch_scale, admission.pressure_scale())))
+        # 프로세서(표 인식 배치 크기 등)는 converter를 만들 때 config를 읽으므로
+        # 경로/배치 크기 설정이 바뀌면 converter를 다시 만듦 (빌더는 배치마다 새로 만들어져 그대로 반영됨)
+        settings = {key: value for key, value in config.items() if key != "page_range"}
+        if settings != converter_settings:
+            # PdfConverter는 확장자에 맞는 provider를 자동 선택 (DOCX/PPTX/XLSX/HTML/EPUB/이미지)
+            # PdfConverter가 artifact_dict에 llm_service를 기록하므로 공유 모델 dict는 복사해서 전달
+            converter = build_converter(dict(model_dict), config, StageTimings())
+            converter_settings = settings
+            converter.cancel_token = cancel_token
+        timings = converter.timings = StageTimings()
+        if first_batch:
+            timings.merge(classify_timings.as_dict())
+            first_batch = False
+        with get_registry().inference_lock:
+            rendered = converter(path)
+        # 마지막 단계가 끝난 뒤 마감이 지났으면 완료가 아니라 취소/시간 초과로 보고
+        cancel_token.check()
+
+        # 결과 추출
+        with timings.measure("output"):
+            full_text, _, batch_images = text_from_rendered(rendered)
+            batch_pages = split_pages(full_text)
+        # 추출 이미지는 바로 압축해 저장소에 쓰고 마크다운 참조를 assets/ 경로로 교체
+        with timings.measure("assets"):
+            batch_assets = store_images(batch_images, batch_pages) if batch_images else {}
+        pages_done += len(batch) if batch is not None else len(batch_pages)
+        metadata = rendered.metadata
+        if batch_routes is not None:
+            # 페이지별 경로 결정을 결과 메타데이터에 남김 (merge_metadata가 배치별 목록을 이어 붙임)
+            metadata = dict(metadata or {})
+            metadata["page_routes"] = [route.as_dict() for route in batch_routes]
+        if fingerprints:
+            # 다음 업로드 때 재사용하도록 페이지별로 저장하고 증분 변환 기록을 남김
+            with timings.measure("page_cache"):
+                get_page_cache().store_batch(batch_pages, batch_assets, metadata, fingerprints, options)
+            metadata = dict(metadata or {})
+            metadata["reconverted_pages"] = [page.page for page in batch_pages]
+        del rendered, batch_images
+        yield PageBatch(
+            pages=batch_pages,
+            images=batch_assets,
+            metadata=metadata,
+            pages_done=pages_done,
+            page_count=page_count or pages_done,
+            timings=timings.as_dict(),
+        )
@@ -0,0 +1,69 @@
+import os
+import tempfile
+import threading
+import time
+import zipfile
+
+from asset_store import add_assets_to_zip
+from renderers import FILE_EXTENSIONS, write_output
+
+# 변환 결과 내보내기 파일
+# 다운로드/API 응답용 출력은 메모리 문자열이 아니라 디스크 파일로 페이지 단위로 한 번만 쓰고,
+# 그 파일을 그대로 스트리밍합니다. 같은 결과(result_id)와 형식은 파일을 재사용하고,
+# 오래 쓰이지 않은 파일은 새 파일을 쓸 때 정리합니다.
+
+EXPORT_DIR = os.path.join(os.environ.get("MARKER_CACHE_DIR", "/tmp/marker_cache"), "exports")
+EXPORT_TTL_SECONDS = int(os.environ.get("MARKER_EXPORT_TTL", "3600"))
+
+_prune_lock = threading.Lock()
+
+
+def export_name(output_format, bundle=False):
+    # 다운로드 파일 이름 (번들 ZIP 안의 문서 이름도 같음)
+    return "converted.zip" if bundle else f"converted.{FILE_EXTENSIONS[output_format]}"
+
+
+def _prune(export_dir):
+    cutoff = time.time() - EXPORT_TTL_SECONDS
+    with _prune_lock:
+        for name in os.listdir(export_dir):
+            path = os.path.join(export_dir, name)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+            except OSError:
+                pass
+
+
+def export_path(conversion, output_format, bundle=False, export_dir=None):
+    # bundle=True면 문서 + assets/ 이미지를 묶은 ZIP
+    export_dir = export_dir or EXPORT_DIR
+    suffix = f"{FILE_EXTENSIONS[output_format]}.zip" if bundle else FILE_EXTENSIONS[output_format]
+    path = os.path.join(export_dir, f"{conversion.result_id}.{suffix}")
+    if os.path.exists(path):
+        try:
+            os.utime(path, None)
+            return path
+        except OSError:
+            pass  # 그 사이 정리되었으면 다시 씀
+
+    os.makedirs(export_dir, exist_ok=True)
+    # 임시 파일에 다 쓴 뒤 rename 하여 다른 요청이 반쯤 쓰인 파일을 보내지 않도록 함
+    fd, tmp_path = tempfile.mkstemp(prefix=".tmp_", dir=export_dir)
+    try:
+        if bundle:
+            os.close(fd)
+            document_path = export_path(conversion, output_format, export_dir=export_dir)
+            with zipfile.ZipFile(tmp_path, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+                archive.write(document_path, export_name(output_format))
+                add_assets_to_zip(archive, conversion)
+        else:
+            with open(fd, "w", encoding="utf-8") as export_file:
+                write_output(conversion, output_format, export_file)
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    _prune(export_dir)
+    return path
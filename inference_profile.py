@@ -0,0 +1,110 @@
+import os
+import sys
+
+# CPU 추론 프로필
+# fp32: 기본 정밀도 (기준), bf16: 가중치/연산을 bfloat16으로 로드 (메모리 절반),
+# int8: Linear 층을 동적 int8 양자화 (가중치 int8, 활성값은 실행 시 양자화 - 재학습/보정 데이터 불필요)
+# 프로필은 공유 모델 딕셔너리를 만들 때 한 번 적용되며, 결과 캐시 키에도 포함됩니다.
+
+FP32 = "fp32"
+BF16 = "bf16"
+INT8 = "int8"
+PROFILES = (FP32, BF16, INT8)
+PROFILE_LABELS = {
+    FP32: "fp32 (기본 정밀도)",
+    BF16: "bf16 (메모리 절반)",
+    INT8: "int8 동적 양자화 (가장 빠름)",
+}
+
+INFERENCE_PROFILE = os.environ.get("MARKER_INFERENCE_PROFILE", FP32).lower()
+# 작업 워커 하나가 쓰는 torch 스레드 수 (0이면 코어 수 / 워커 수)
+TORCH_THREADS = int(os.environ.get("MARKER_TORCH_THREADS", "0"))
+# 변환 작업 하나가 쓰는 메모리 (동시 작업 수 계산용)
+JOB_MEMORY_GB = float(os.environ.get("MARKER_JOB_MEMORY_GB", "3"))
+
+# 작업 관리자가 만들어질 때 정해짐 (그 전에는 작업 관리자와 같은 설정으로 계산)
+_worker_count = None
+
+
+def validate_profile(profile):
+    profile = (profile or FP32).lower()
+    if profile not in PROFILES:
+        raise ValueError(f"알 수 없는 추론 프로필: {profile} (가능: {', '.join(PROFILES)})")
+    return profile
+
+
+def set_worker_count(workers):
+    # 작업 관리자가 동시에 돌리는 변환 수 - 워커마다 torch 스레드를 나눠 코어 과다 할당 방지
+    global _worker_count
+    _worker_count = max(1, int(workers))
+    # 워밍업/--preload로 모델이 먼저 로드된 경우에도 실제 워커 수에 맞춰 다시 지정
+    if "torch" in sys.modules:
+        apply_torch_threads()
+
+
+def default_worker_count():
+    # 메모리에 들어가는 만큼만 병렬 실행 (모델 상주분으로 1개 몫은 남겨 둠)
+    configured = os.environ.get("MARKER_WORKERS")
+    if configured:
+        return max(1, int(configured))
+    try:
+        import psutil
+        total_gb = psutil.virtual_memory().total / 1024 / 1024 / 1024
+    except Exception:
+        return 1
+    by_memory = int(total_gb // JOB_MEMORY_GB) - 1
+    return max(1, min(os.cpu_count() or 1, by_memory))
+
+
+def worker_count():
+    if _worker_count is not None:
+        return _worker_count
+    return default_worker_count()
+
+
+def threads_per_worker():
+    if TORCH_THREADS > 0:
+        return TORCH_THREADS
+    return max(1, (os.cpu_count() or 1) // worker_count())
+
+
+def apply_torch_threads():
+    # 스레드 워커끼리는 같은 프로세스의 torch 설정을 공유하므로 모델 로드 전에 한 번 지정
+    import torch
+    threads = threads_per_worker()
+    torch.set_num_threads(threads)
+    return threads
+
+
+def model_dtype(profile):
+    # create_model_dict(dtype=...)로 넘길 값 (None이면 surya 기본값)
+    if profile == BF16:
+        import torch
+        return torch.bfloat16
+    if profile == INT8:
+        # 동적 양자화는 fp32 Linear에만 적용되므로 fp32로 로드
+        import torch
+        return torch.float32
+    return None
+
+
+def _quantize(model):
+    import torch
+    from torch.ao.quantization import quantize_dynamic
+
+    # inplace로 교체해야 predictor가 들고 있는 모델 객체(.config/.dtype 등)가 그대로 유지됨
+    quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+
+
+def apply_profile(model_dict, profile):
+    # create_model_dict 결과에 프로필 적용 -> 양자화한 모델 이름 목록
+    applied = []
+    if profile != INT8:
+        return applied
+    for name, predictor in model_dict.items():
+        model = getattr(predictor, "model", None)
+        if model is None or not hasattr(model, "named_modules"):
+            continue
+        _quantize(model)
+        applied.append(name)
+    return applied
@@ -0,0 +1,190 @@
+import atexit
+import hashlib
+import os
+import tempfile
+import threading
+import time
+import uuid
+import weakref
+from dataclasses import dataclass, field
+
+# 업로드 파일 수집: 한 번만 디스크에 스풀하면서 같은 패스에서 크기와 SHA-256을 계산
+# Streamlit UploadedFile(BytesIO)은 getbuffer()로 복사 없이 읽고,
+# 그 외 파일 객체는 청크 단위로 읽습니다.
+
+UPLOAD_DIR = os.path.join(tempfile.gettempdir(), "marker_uploads")
+CHUNK_SIZE = 1024 * 1024
+# 이 시간보다 오래된 업로드 파일은 (프로세스 비정상 종료로 남은 것 포함) 정리
+UPLOAD_TTL_SECONDS = int(os.environ.get("MARKER_UPLOAD_TTL", "3600"))
+CLEANUP_INTERVAL_SECONDS = 600
+
+
+class UploadTooLarge(Exception):
+    def __init__(self, size, max_bytes):
+        super().__init__(f"파일 크기 초과: {size / 1024 / 1024:.1f}MB > {max_bytes / 1024 / 1024:.0f}MB")
+        self.size = size
+        self.max_bytes = max_bytes
+
+
+@dataclass
+class SpooledUpload:
+    path: str
+    filename: str
+    size: int
+    digest: str
+    source_id: str = None
+    _finalizer: object = field(default=None, init=False, repr=False, compare=False)
+
+    @property
+    def extension(self):
+        return self.filename.lower().rsplit(".", 1)[-1] if "." in self.filename else ""
+
+    def release(self):
+        # 이 객체가 가진 사용권을 반납 (여러 번 불러도 한 번만 반납)
+        if self._finalizer is not None:
+            self._finalizer()
+        else:
+            release_upload(self.path)
+
+
+# {경로: 사용권 수} - 업로드를 받은 쪽(세션, 요청 처리 등)과 그 파일로 변환하는 작업이 각각 하나씩 가지며
+# 마지막 사용권이 반납될 때 파일을 삭제
+_live_paths = {}
+# 세션 객체가 GC될 때 finalize가 다른 코드 실행 도중 불릴 수 있으므로 재진입 가능한 락
+_lock = threading.RLock()
+_last_cleanup = 0.0
+
+
+def _iter_chunks(fileobj):
+    getbuffer = getattr(fileobj, "getbuffer", None)
+    if getbuffer is not None:
+        # BytesIO 내부 버퍼를 memoryview로 잘라 씀 (전체 bytes 복사 없음)
+        view = getbuffer()
+        try:
+            for start in range(0, view.nbytes, CHUNK_SIZE):
+                yield view[start:start + CHUNK_SIZE]
+        finally:
+            view.release()
+        return
+
+    if hasattr(fileobj, "seek"):
+        fileobj.seek(0)
+    while True:
+        chunk = fileobj.read(CHUNK_SIZE)
+        if not chunk:
+            break
+        yield chunk
+
+
+def spool_upload(fileobj, filename, max_bytes=None, source_id=None):
+    cleanup_stale_uploads()
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+
+    extension = os.path.splitext(filename)[1].lower()
+    # 파일 이름에 pid를 넣어 어느 프로세스 소유인지 알 수 있게 함
+    path = os.path.join(UPLOAD_DIR, f"{os.getpid()}_{uuid.uuid4().hex}{extension}")
+    hasher = hashlib.sha256()
+    size = 0
+    with _lock:
+        _live_paths[path] = 1
+    try:
+        with open(path, "wb") as out:
+            for chunk in _iter_chunks(fileobj):
+                size += len(chunk)
+                if max_bytes is not None and size > max_bytes:
+                    raise UploadTooLarge(size, max_bytes)
+                hasher.update(chunk)
+                out.write(chunk)
+    except BaseException:
+        release_upload(path)
+        raise
+    upload = SpooledUpload(path=path, filename=filename, size=size, digest=hasher.hexdigest(), source_id=source_id)
+    # 명시적으로 반납하지 않고 버려진 업로드(브라우저 탭을 닫은 세션 등)도 객체가 사라지면 사용권 반납
+    upload._finalizer = weakref.finalize(upload, release_upload, path)
+    return upload
+
+
+def file_sha256(path):
+    # 이미 디스크에 있는 파일(CLI 입력 등)을 복사 없이 청크 단위로 해시
+    hasher = hashlib.sha256()
+    with open(path, "rb") as source:
+        for chunk in _iter_chunks(source):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def retain_upload(path):
+    # 등록된 업로드에 사용권 하나 추가 (변환 작업이 입력 파일을 넘겨받을 때) - 등록되지 않은 경로면 False
+    with _lock:
+        if path not in _live_paths:
+            return False
+        _live_paths[path] += 1
+        return True
+
+
+def release_upload(path):
+    # 사용권 하나 반납 - 남은 사용권이 없거나 등록되지 않은 경로면 파일 삭제
+    with _lock:
+        claims = _live_paths.pop(path, 0) - 1
+        if claims > 0:
+            _live_paths[path] = claims
+            return
+    try:
+        os.unlink(path)
+    except OSError:
+        pass
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def cleanup_stale_uploads(force=False):
+    # 죽은 프로세스가 남긴 파일과, 등록되지 않은 채 TTL이 지난 파일을 삭제
+    global _last_cleanup
+    now = time.time()
+    if not force and now - _last_cleanup < CLEANUP_INTERVAL_SECONDS:
+        return 0
+    _last_cleanup = now
+
+    removed = 0
+    try:
+        names = os.listdir(UPLOAD_DIR)
+    except OSError:
+        return 0
+    with _lock:
+        live = set(_live_paths)
+    for name in names:
+        path = os.path.join(UPLOAD_DIR, name)
+        if path in live:
+            # 사용권이 남은 파일 (오래 걸리는 배치의 ZIP 원본, 대기 중인 작업의 입력 등)은 나이와 무관하게 유지
+            # - 버려진 세션의 업로드는 finalize로 사용권이 반납되면 그때 삭제됨
+            continue
+        try:
+            owner_pid = int(name.split("_", 1)[0])
+        except ValueError:
+            owner_pid = None
+        try:
+            expired = now - os.path.getmtime(path) > UPLOAD_TTL_SECONDS
+        except OSError:
+            continue
+        orphaned = owner_pid is not None and owner_pid != os.getpid() and not _pid_alive(owner_pid)
+        if expired or orphaned:
+            release_upload(path)
+            removed += 1
+    return removed
+
+
+@atexit.register
+def _release_all():
+    with _lock:
+        paths = list(_live_paths)
+        _live_paths.clear()
+    for path in paths:
+        release_upload(path)
@@ -0,0 +1,304 @@
+import os
+import queue
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field, replace
+
+from admission import ADMIT, REJECT, JobTooLarge, estimate_footprint, get_admission_controller
+from conversion_result import ConversionResult
+from engine import CancelToken, ConversionCancelled, iter_convert, merge_metadata, pdf_page_count
+from inference_profile import default_worker_count, set_worker_count
+from ingest import release_upload, retain_upload
+from metrics import observe_batch, observe_job
+from result_cache import get_result_cache
+from sharding import SHARD_WORKERS, iter_convert_sharded, should_shard
+
+# 백그라운드 변환 작업 큐 + 워커 풀
+# Streamlit 스크립트 스레드는 작업을 제출하고 상태만 조회하며,
+# 실제 Marker 변환은 프로세스 공유 워커 스레드에서 실행됩니다.
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+MAX_QUEUE = int(os.environ.get("MARKER_JOB_QUEUE_SIZE", "32"))
+JOB_TIMEOUT_SECONDS = int(os.environ.get("MARKER_JOB_TIMEOUT", "300"))
+JOB_TTL_SECONDS = int(os.environ.get("MARKER_JOB_TTL", "3600"))
+
+
+class JobQueueFull(Exception):
+    pass
+
+
+@dataclass
+class Job:
+    id: str
+    filename: str
+    path: str
+    options: object
+    cache_key: str
+    owns_path: bool = True
+    state: str = QUEUED
+    submitted_at: float = field(default_factory=time.time)
+    started_at: float = None
+    finished_at: float = None
+    timeout_seconds: int = JOB_TIMEOUT_SECONDS
+    result: object = None
+    error: Exception = None
+    cancel_token: CancelToken = field(default_factory=CancelToken)
+    # 스트리밍 진행 상황 (페이지 배치가 끝날 때마다 워커가 갱신)
+    pages: list = field(default_factory=list)
+    images: dict = field(default_factory=dict)
+    metadata_list: list = field(default_factory=list)
+    pages_done: int = 0
+    page_count: int = None
+    sharded: bool = False
+    # 파이프라인 단계별 누적 소요 시간 {단계: 초}
+    timings: dict = field(default_factory=dict)
+    # 페이지 배치별 타임라인 (트레이스 덤프용)
+    trace: list = field(default_factory=list)
+    # 승인 제어: 예상 메모리와 실제 적용한 Marker 배치 크기 배율
+    estimate: object = None
+    batch_scale: float = 1.0
+
+    @property
+    def finished(self):
+        return self.state in (DONE, FAILED, CANCELLED)
+
+    @property
+    def elapsed(self):
+        if self.started_at is None:
+            return 0.0
+        return (self.finished_at or time.time()) - self.started_at
+
+    @property
+    def queue_wait(self):
+        return (self.started_at or time.time()) - self.submitted_at
+
+    @property
+    def progress(self):
+        if not self.page_count:
+            return None
+        return min(self.pages_done / self.page_count, 1.0)
+
+    def add_batch(self, batch):
+        # 샤드는 끝나는 순서가 제각각이므로 항상 페이지 순서로 유지
+        self.pages = sorted(self.pages + batch.pages, key=lambda page: page.page)
+        self.images.update(batch.images)
+        self.metadata_list.append(batch.metadata)
+        self.page_count = batch.page_count
+        self.pages_done = batch.pages_done
+        for stage, seconds in batch.timings.items():
+            self.timings[stage] = self.timings.get(stage, 0.0) + seconds
+        self.trace.append({
+            "at": round(self.elapsed, 3),
+            "pages": [page.page for page in batch.pages],
+            "pages_done": batch.pages_done,
+            "timings": batch.timings,
+        })
+
+    def build_result(self, partial=False):
+        metadata = merge_metadata(self.metadata_list)
+        result = ConversionResult(pages=list(self.pages), metadata=metadata, images=dict(self.images))
+        if partial:
+            # 뒤쪽 페이지 실패/취소 시에도 완료된 앞쪽 페이지는 보존
+            metadata["partial"] = True
+            metadata["pages_done"] = self.pages_done
+            metadata["page_count"] = self.page_count
+        else:
+            result.result_id = self.cache_key
+        return result
+
+
+class JobManager:
+    def __init__(self, workers=None, max_queue=MAX_QUEUE, admission=None):
+        self.workers = workers or default_worker_count()
+        set_worker_count(self.workers)
+        self.admission = admission or get_admission_controller()
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._slots = threading.Condition()
+        self._running = 0
+        self._threads = []
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._worker, name=f"marker-worker-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, path, filename, options, cache_key, delete_after=True):
+        # delete_after=True면 작업이 입력 파일 사용권을 하나 가짐 (호출한 쪽이 먼저 반납해도 변환이 끝날 때까지 유지)
+        # delete_after=False면 입력 파일 수명은 호출한 쪽이 관리
+        job = Job(id=uuid.uuid4().hex, filename=filename, path=path, options=options, cache_key=cache_key, owns_path=delete_after)
+        # 가장 작은 배치 크기로도 메모리에 들어가지 않는 작업은 대기열에 넣지 않고 바로 거절
+        page_count = pdf_page_count(path)
+        shards = SHARD_WORKERS if should_shard(path, page_count) else 1
+        job.estimate = estimate_footprint(path, options, page_count, shards)
+        self.admission.check(job.estimate)
+        retained = delete_after and retain_upload(path)
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full:
+            if retained:
+                release_upload(path)
+            raise JobQueueFull(f"대기열이 가득 찼습니다 ({self._queue.maxsize}개)")
+        with self._lock:
+            self._jobs[job.id] = job
+        return job
+
+    def get(self, job_id):
+        if job_id is None:
+            return None
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id):
+        job = self.get(job_id)
+        if job is None or job.finished:
+            return False
+        # 실행 중이면 다음 페이지 배치 경계에서 변환이 중단됨
+        job.cancel_token.cancel()
+        if job.state == QUEUED:
+            # 아직 시작 전이면 바로 취소 (워커가 꺼낼 때 건너뜀)
+            job.state = CANCELLED
+            job.error = ConversionCancelled("사용자가 변환을 취소했습니다")
+            job.finished_at = time.time()
+        return True
+
+    def discard(self, job_id):
+        # 결과를 다른 곳(배치 ZIP 등)에 옮긴 완료 작업을 바로 제거
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None and job.finished:
+                del self._jobs[job_id]
+
+    def stats(self):
+        with self._lock:
+            jobs = list(self._jobs.values())
+        counts = {QUEUED: 0, RUNNING: 0, DONE: 0, FAILED: 0, CANCELLED: 0}
+        for job in jobs:
+            counts[job.state] += 1
+        return {
+            "workers": self.workers,
+            "running": self._running,
+            "queued": self._queue.qsize(),
+            "states": counts,
+            "admission": self.admission.stats(),
+        }
+
+    def _acquire_slot(self, job):
+        # 예상 메모리가 현재 여유에 들어갈 때만 시작 (필요하면 배치 크기를 줄여서)
+        # 실행 중인 작업이 없으면 가장 작은 배치로 항상 허용
+        with self._slots:
+            while not job.cancel_token.cancelled:
+                decision, scale = self.admission.decide(job.estimate, self._running)
+                if decision == REJECT:
+                    raise JobTooLarge(job.estimate.minimum, self.admission.capacity())
+                if decision == ADMIT:
+                    self._running += 1
+                    self.admission.reserve(job.id, job.estimate, scale)
+                    job.batch_scale = scale
+                    return True
+                self._slots.wait(timeout=1.0)
+            return False
+
+    def _release_slot(self, job):
+        self.admission.release(job.id)
+        with self._slots:
+            self._running -= 1
+            self._slots.notify_all()
+
+    def _worker(self):
+        while True:
+            job = self._queue.get()
+            if job.cancel_token.cancelled:
+                observe_job(job)
+                self._cleanup(job)
+                self._queue.task_done()
+                continue
+            try:
+                admitted = self._acquire_slot(job)
+            except JobTooLarge as error:
+                # 제출 이후 모델 로드 등으로 최대치가 줄어든 경우
+                admitted = False
+                job.error = error
+                job.state = FAILED
+            if not admitted:
+                if not job.finished:
+                    job.state = CANCELLED
+                    job.error = ConversionCancelled("사용자가 변환을 취소했습니다")
+                job.finished_at = time.time()
+                observe_job(job)
+                self._cleanup(job)
+                self._queue.task_done()
+                continue
+            try:
+                self._run(job)
+            finally:
+                self._release_slot(job)
+                self._queue.task_done()
+                self._prune()
+
+    def _run(self, job):
+        # 마감 시각은 대기열이 아니라 실제 실행 시작 시점부터 계산
+        job.cancel_token.start_deadline(job.timeout_seconds)
+        job.state = RUNNING
+        job.started_at = time.time()
+        try:
+            page_count = pdf_page_count(job.path)
+            # 승인 시 정한 배치 크기 배율 적용 (같은 options를 공유하는 다른 작업에는 영향 없음)
+            options = replace(job.options, batch_scale=job.batch_scale)
+            if should_shard(job.path, page_count):
+                # 큰 PDF는 페이지 구간별로 여러 프로세스에서 병렬 변환
+                job.sharded = True
+                batches = iter_convert_sharded(job.path, options, job.cancel_token, page_count=page_count)
+            else:
+                batches = iter_convert(job.path, options, cancel_token=job.cancel_token)
+            for batch in batches:
+                job.add_batch(batch)
+                observe_batch(batch)
+            result = job.build_result()
+            get_result_cache().put(job.cache_key, result)
+            job.result = result
+            job.state = DONE
+        except ConversionCancelled as error:
+            job.error = error
+            job.state = CANCELLED
+        except Exception as error:
+            job.error = error
+            job.state = FAILED
+        finally:
+            # 부분 결과는 캐시에 넣지 않고 작업에만 보관
+            if job.state != DONE and job.pages:
+                job.result = job.build_result(partial=True)
+            job.finished_at = time.time()
+            observe_job(job)
+            self._cleanup(job)
+
+    def _cleanup(self, job):
+        # 임시 파일 정리
+        if job.owns_path:
+            release_upload(job.path)
+
+    def _prune(self):
+        # 오래된 완료 작업 정리
+        cutoff = time.time() - JOB_TTL_SECONDS
+        with self._lock:
+            expired = [job_id for job_id, job in self._jobs.items() if job.finished and job.finished_at < cutoff]
+            for job_id in expired:
+                del self._jobs[job_id]
+
+
+_manager = None
+_manager_lock = threading.Lock()
+
+
+def get_job_manager():
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            _manager = JobManager()
+        return _manager
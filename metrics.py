@@ -0,0 +1,319 @@
+import json
+import os
+import threading
+import time
+
+# 변환 경로 계측: 카운터/히스토그램/게이지를 모아 Prometheus 텍스트 형식으로 내보냄
+# 외부 라이브러리 없이 동작하며, 갱신은 락 하나로 보호되는 dict 연산뿐이라 핫패스 비용이 작습니다.
+# MARKER_TRACE_DIR을 지정하면 작업마다 단계별 타임라인을 JSON으로 남깁니다.
+
+TRACE_DIR = os.environ.get("MARKER_TRACE_DIR")
+
+# 초 단위 버킷 (큐 대기/작업 시간은 분 단위까지, 페이지 지연은 초 단위 위주)
+DURATION_BUCKETS = (0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800)
+PAGE_BUCKETS = (0.1, 0.25, 0.5, 1, 2, 4, 8, 16, 32, 64)
+
+
+def _label_key(labelnames, labels):
+    return tuple(str(labels.get(name, "")) for name in labelnames)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labelnames, values, extra=None):
+    pairs = list(zip(labelnames, values)) + list(extra or [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(_label_key(self.labelnames, labels), 0)
+
+    @property
+    def family(self):
+        # 텍스트 형식(0.0.4)에서는 HELP/TYPE도 실제 샘플 이름(_total)으로 써야 counter로 인식됨
+        return f"{self.name}_total"
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        return [(self.family, _format_labels(self.labelnames, key), value) for key, value in items]
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, help_text, buckets=DURATION_BUCKETS, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        # {라벨: [버킷별 개수..., 합계, 개수]}
+        self._values = {}
+        self._lock = threading.Lock()
+
+    @property
+    def family(self):
+        return self.name
+
+    def observe(self, value, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [0] * len(self.buckets) + [0.0, 0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[index] += 1
+                    break
+            state[-2] += value
+            state[-1] += 1
+
+    def samples(self):
+        with self._lock:
+            items = [(key, list(state)) for key, state in self._values.items()]
+        samples = []
+        for key, state in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, state):
+                cumulative += count
+                samples.append((f"{self.name}_bucket", _format_labels(self.labelnames, key, [("le", _format_value(float(bound)))]), cumulative))
+            samples.append((f"{self.name}_sum", _format_labels(self.labelnames, key), state[-2]))
+            samples.append((f"{self.name}_count", _format_labels(self.labelnames, key), state[-1]))
+        return samples
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = []
+        # 수집 시점에 값을 읽어 오는 게이지 [(이름, 설명, 종류, 콜백)] - 콜백은 [(라벨 dict, 값)] 반환
+        self._collectors = []
+
+    def counter(self, name, help_text, labelnames=()):
+        metric = Counter(name, help_text, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name, help_text, buckets=DURATION_BUCKETS, labelnames=()):
+        metric = Histogram(name, help_text, buckets, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def collector(self, name, help_text, callback, kind="gauge"):
+        self._collectors.append((name, help_text, kind, callback))
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.family} {metric.help}")
+            lines.append(f"# TYPE {metric.family} {metric.kind}")
+            for sample_name, labels, value in metric.samples():
+                lines.append(f"{sample_name}{labels} {_format_value(value)}")
+        for name, help_text, kind, callback in self._collectors:
+            try:
+                values = callback()
+            except Exception:
+                continue
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in values:
+                if value is None:
+                    continue
+                labelnames = tuple(labels)
+                lines.append(f"{name}{_format_labels(labelnames, [labels[label] for label in labelnames])} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+CONVERSIONS = REGISTRY.counter("marker_conversions", "완료된 변환 작업 수 (상태별)", ["state"])
+FAILURES = REGISTRY.counter("marker_conversion_failures", "실패/취소된 변환 작업 수 (원인별)", ["reason"])
+PAGES = REGISTRY.counter("marker_pages_converted", "변환된 페이지 수")
+STAGE_SECONDS = REGISTRY.counter("marker_stage_seconds", "파이프라인 단계별 누적 소요 시간(초)", ["stage"])
+QUEUE_WAIT = REGISTRY.histogram("marker_job_queue_wait_seconds", "작업 대기열 대기 시간(초)")
+JOB_DURATION = REGISTRY.histogram("marker_job_duration_seconds", "작업 실행 시간(초)", labelnames=["state"])
+PAGE_LATENCY = REGISTRY.histogram("marker_page_seconds", "페이지당 변환 시간(초)", buckets=PAGE_BUCKETS)
+MODEL_LOAD = REGISTRY.histogram("marker_model_load_seconds", "모델 로드 시간(초)")
+
+
+def classify_error(error):
+    # UI의 오류 안내 분기(403/메모리/시간 초과 등)와 같은 기준으로 실패 원인을 분류
+    from engine import ConversionCancelled, ConversionTimeout, ModelLoadError
+
+    message = str(error)
+    if isinstance(error, ConversionCancelled):
+        return "cancelled"
+    if isinstance(error, ConversionTimeout) or "timeout" in message.lower():
+        return "timeout"
+    if "403" in message or "Forbidden" in message:
+        return "forbidden"
+    if isinstance(error, ModelLoadError):
+        from weight_store import WeightStoreError
+        if isinstance(error.__cause__, WeightStoreError):
+            return "weights"
+        return "model_load"
+    if isinstance(error, MemoryError) or "Memory" in message or "CUDA" in message:
+        return "memory"
+    if isinstance(error, ImportError):
+        return "import"
+    if isinstance(error, PermissionError):
+        return "permission"
+    return "other"
+
+
+def observe_batch(batch):
+    # 페이지 배치 하나가 끝날 때마다 호출 (작업 워커 스레드)
+    pages = len(batch.pages)
+    # 페이지 캐시에서 가져온 배치는 변환한 페이지가 아님 (재사용 수는 marker_page_cache_pages_total에 집계)
+    # - 조회 시간만 걸려 페이지당 지연 분포를 낮추므로 페이지 수/지연에서 제외하고 단계 시간만 기록
+    if (batch.metadata or {}).get("reused_pages"):
+        pages = 0
+    if pages:
+        PAGES.inc(pages)
+        per_page = sum(batch.timings.values()) / pages
+        for _ in range(pages):
+            PAGE_LATENCY.observe(per_page)
+    for stage, seconds in batch.timings.items():
+        STAGE_SECONDS.inc(seconds, stage=stage)
+
+
+def observe_job(job):
+    # 작업이 끝난 직후 호출 (상태/시간/실패 원인 기록 + 선택적 트레이스 덤프)
+    CONVERSIONS.inc(state=job.state)
+    JOB_DURATION.observe(job.elapsed, state=job.state)
+    if job.started_at is not None:
+        QUEUE_WAIT.observe(job.queue_wait)
+    if job.error is not None:
+        FAILURES.inc(reason=classify_error(job.error))
+    if TRACE_DIR:
+        write_trace(job)
+
+
+def job_trace(job):
+    return {
+        "job_id": job.id,
+        "filename": job.filename,
+        "state": job.state,
+        "submitted_at": job.submitted_at,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at,
+        "queue_wait": job.queue_wait,
+        "elapsed": job.elapsed,
+        "sharded": job.sharded,
+        "pages_done": job.pages_done,
+        "page_count": job.page_count,
+        "timings": job.timings,
+        "batches": job.trace,
+        "error": f"{type(job.error).__name__}: {job.error}" if job.error else None,
+        "error_class": classify_error(job.error) if job.error else None,
+    }
+
+
+def write_trace(job, directory=None):
+    directory = directory or TRACE_DIR
+    try:
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{time.strftime('%Y%m%d-%H%M%S')}_{job.id}.json")
+        with open(path, "w", encoding="utf-8") as trace_file:
+            json.dump(job_trace(job), trace_file, ensure_ascii=False, indent=2, default=str)
+        return path
+    except OSError:
+        return None
+
+
+def _process_gauges():
+    import psutil
+
+    process = psutil.Process()
+    memory = psutil.virtual_memory()
+    return [
+        ({"resource": "process_rss_bytes"}, process.memory_info().rss),
+        ({"resource": "process_cpu_percent"}, process.cpu_percent(interval=None)),
+        ({"resource": "process_threads"}, process.num_threads()),
+        ({"resource": "system_memory_available_bytes"}, memory.available),
+        ({"resource": "system_memory_percent"}, memory.percent),
+        ({"resource": "system_cpu_percent"}, psutil.cpu_percent(interval=None)),
+    ]
+
+
+def _job_gauges():
+    from jobs import get_job_manager
+
+    stats = get_job_manager().stats()
+    return [
+        ({"state": "running"}, stats["running"]),
+        ({"state": "queued"}, stats["queued"]),
+        ({"state": "workers"}, stats["workers"]),
+    ]
+
+
+def _model_gauges():
+    from model_registry import get_registry
+
+    stats = get_registry().stats()
+    return [
+        ({"field": "loaded"}, int(stats["loaded"])),
+        ({"field": "resident_bytes"}, stats["resident_bytes"]),
+        ({"field": "load_count"}, stats["load_count"]),
+    ]
+
+
+def _cache_counters():
+    from result_cache import get_result_cache
+
+    stats = get_result_cache().stats()
+    return [({"result": "hit"}, stats["hits"]), ({"result": "miss"}, stats["misses"])]
+
+
+def _page_cache_counters():
+    from page_cache import get_page_cache
+
+    stats = get_page_cache().stats()
+    return [({"result": "hit"}, stats["hits"]), ({"result": "miss"}, stats["misses"])]
+
+
+def _startup_gauges():
+    from warmup import get_warmup
+
+    stats = get_warmup().stats()
+    values = [({"phase": phase}, seconds) for phase, seconds in stats["phases"].items()]
+    values.append(({"phase": "ready"}, stats["ready_seconds"]))
+    return values
+
+
+REGISTRY.collector("marker_resource", "프로세스/시스템 자원 사용량 (psutil)", _process_gauges)
+REGISTRY.collector("marker_jobs", "작업 큐 상태", _job_gauges)
+REGISTRY.collector("marker_model", "공유 모델 레지스트리 상태", _model_gauges)
+REGISTRY.collector("marker_result_cache_requests_total", "결과 캐시 조회 수", _cache_counters, kind="counter")
+REGISTRY.collector("marker_page_cache_pages_total", "페이지 캐시 조회 페이지 수 (hit는 재변환 없이 재사용)", _page_cache_counters, kind="counter")
+REGISTRY.collector("marker_startup_seconds", "시작 준비 단계별 소요 시간(초), ready는 프로세스 시작부터 준비 완료까지", _startup_gauges)
+
+
+def render_prometheus():
+    return REGISTRY.render()
@@ -0,0 +1,172 @@
+import threading
+import time
+
+from inference_profile import INFERENCE_PROFILE, apply_profile, apply_torch_threads, model_dtype, threads_per_worker, validate_profile
+from metrics import MODEL_LOAD
+from weight_store import WEIGHTS_MMAP, ensure_verified, map_model_weights, verify_stats
+
+# 프로세스 전체에서 공유하는 Marker 모델 레지스트리
+# Streamlit은 rerun 시 app.py만 다시 실행하고 import된 모듈은 그대로 유지하므로
+# 이 모듈의 전역 인스턴스는 모든 세션/rerun 사이에서 공유됩니다.
+
+
+def _rss_bytes():
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except Exception:
+        return None
+
+
+def _parameter_bytes(model_dict):
+    # 각 predictor의 torch 모델 가중치 크기 합계
+    # (state_dict 기준 - int8 양자화된 Linear의 packed 가중치는 parameters()에 나오지 않음)
+    total = 0
+    for predictor in model_dict.values():
+        model = getattr(predictor, "model", None)
+        if model is None or not hasattr(model, "state_dict"):
+            continue
+        for value in model.state_dict().values():
+            for tensor in value if isinstance(value, tuple) else (value,):
+                if hasattr(tensor, "element_size"):
+                    total += tensor.numel() * tensor.element_size()
+    return total
+
+
+class ModelRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        # surya predictor는 호출 중 상태(KV 캐시, 프롬프트 큐 등)를 객체에 두므로
+        # 공유 모델 딕셔너리로 하는 추론은 한 번에 하나씩 (병렬 처리는 프로세스 샤드가 담당)
+        self.inference_lock = threading.Lock()
+        self._models = None
+        self.load_seconds = None
+        self.loaded_at = None
+        self.param_bytes = None
+        self.rss_delta_bytes = None
+        self.load_count = 0
+        # safetensors 메모리 매핑 결과 {"mapped_bytes": .., "total_bytes": ..}
+        self.mapped = None
+        self.profile = validate_profile(INFERENCE_PROFILE)
+        self.quantized = []
+
+    @property
+    def loaded(self):
+        return self._models is not None
+
+    def get(self):
+        # 이미 로드된 경우 락 없이 바로 반환
+        models = self._models
+        if models is not None:
+            return models
+
+        with self._lock:
+            # 동시에 들어온 첫 요청들이 중복 로드하지 않도록 락 안에서 다시 확인
+            if self._models is None:
+                self._load()
+            return self._models
+
+    def _load(self):
+        from marker.models import create_model_dict
+
+        # 로컬 가중치 목록 검증 (프로세스당 한 번, 실패하면 다운로드 대신 WeightStoreError)
+        ensure_verified()
+        apply_torch_threads()
+        rss_before = _rss_bytes()
+        started = time.perf_counter()
+        models = create_model_dict(dtype=model_dtype(self.profile))
+        self.quantized = apply_profile(models, self.profile)
+        if WEIGHTS_MMAP:
+            try:
+                self.mapped = map_model_weights(models)
+            except Exception:
+                self.mapped = None
+        self.load_seconds = time.perf_counter() - started
+        MODEL_LOAD.observe(self.load_seconds)
+        rss_after = _rss_bytes()
+
+        self.loaded_at = time.time()
+        self.load_count += 1
+        if rss_before is not None and rss_after is not None:
+            self.rss_delta_bytes = max(rss_after - rss_before, 0)
+        try:
+            self.param_bytes = _parameter_bytes(models)
+        except Exception:
+            self.param_bytes = None
+        self._models = models
+
+    def unload(self):
+        with self._lock:
+            if self._models is None:
+                return False
+            self._models = None
+            self.param_bytes = None
+            self.rss_delta_bytes = None
+            self.mapped = None
+        release_memory()
+        return True
+
+    def reload(self):
+        self.unload()
+        return self.get()
+
+    def set_profile(self, profile):
+        # 프로필이 바뀌면 이미 로드된 모델은 버리고 다음 사용 시 새 프로필로 다시 로드
+        profile = validate_profile(profile)
+        if profile == self.profile:
+            return False
+        with self._lock:
+            self.profile = profile
+        self.unload()
+        return True
+
+    @property
+    def torch_threads(self):
+        # 작업 관리자가 만들어지면서 워커 수가 바뀌면 다시 지정되므로 현재 값을 계산
+        return threads_per_worker() if self.loaded else None
+
+    @property
+    def resident_bytes(self):
+        # 파라미터 크기를 알 수 있으면 그것을, 아니면 로드 전후 RSS 차이를 사용
+        if self.param_bytes:
+            return self.param_bytes
+        return self.rss_delta_bytes
+
+    def stats(self):
+        return {
+            "loaded": self.loaded,
+            "load_seconds": self.load_seconds,
+            "loaded_at": self.loaded_at,
+            "load_count": self.load_count,
+            "resident_bytes": self.resident_bytes,
+            "param_bytes": self.param_bytes,
+            "rss_delta_bytes": self.rss_delta_bytes,
+            "profile": self.profile,
+            "quantized": list(self.quantized),
+            "torch_threads": self.torch_threads,
+            "mapped": self.mapped,
+            "verify": verify_stats(),
+        }
+
+
+def release_memory():
+    # 취소/언로드 후 파이썬 객체와 CUDA 캐시 메모리 회수
+    import gc
+    gc.collect()
+    try:
+        import torch
+        if torch.cuda.is_available():
+            torch.cuda.empty_cache()
+    except Exception:
+        pass
+
+
+_registry = ModelRegistry()
+
+
+def get_registry():
+    return _registry
+
+
+def get_models():
+    return _registry.get()
@@ -0,0 +1,153 @@
+import datetime
+import os
+import re
+import zipfile
+
+from conversion_result import ConversionResult, PageResult
+
+# 구조가 파일에 이미 들어 있는 형식(HTML/XLSX/DOCX)을 모델 없이 바로 마크다운으로 변환
+# 제목/표/목록/시트를 그대로 옮기므로 수 ms 안에 끝나고 모델 로드도 필요 없습니다.
+# 래스터 이미지가 들어 있는 문서만 기존 Marker 파이프라인(레이아웃/OCR)으로 보냅니다.
+
+NATIVE_CONVERTERS_ENABLED = os.environ.get("MARKER_NATIVE_CONVERTERS", "1") != "0"
+NATIVE_EXTENSIONS = ("html", "htm", "xlsx", "docx")
+
+_IMG_TAG_RE = re.compile(r"<(img|picture|canvas)\b", re.IGNORECASE)
+_DROP_TAGS_RE = re.compile(r"<(script|style|noscript|template)\b.*?</\1\s*>", re.IGNORECASE | re.DOTALL)
+_META_CHARSET_RE = re.compile(rb"<meta[^>]+charset=[\"']?([\w-]+)", re.IGNORECASE)
+_BLANK_LINES_RE = re.compile(r"\n{3,}")
+# Office 패키지 안의 이미지 파트 (xl/media, word/media)
+_MEDIA_RE = re.compile(r"^(word|xl)/media/.+\.(png|jpe?g|gif|bmp|tiff?|emf|wmf|webp)$", re.IGNORECASE)
+
+
+def _extension(path):
+    return path.lower().rsplit(".", 1)[-1] if "." in path else ""
+
+
+def _has_office_media(path):
+    try:
+        with zipfile.ZipFile(path) as archive:
+            return any(_MEDIA_RE.match(name) for name in archive.namelist())
+    except zipfile.BadZipFile:
+        # 깨진 패키지는 Marker 쪽에서 오류를 내도록 넘김
+        return True
+
+
+def _read_html(path):
+    with open(path, "rb") as html_file:
+        raw = html_file.read()
+    match = _META_CHARSET_RE.search(raw[:4096])
+    for encoding in ("utf-8-sig", match.group(1).decode("ascii", "ignore") if match else None, "cp1252"):
+        if not encoding:
+            continue
+        try:
+            return raw.decode(encoding)
+        except (LookupError, UnicodeDecodeError):
+            continue
+    return raw.decode("utf-8", errors="replace")
+
+
+def _html_to_markdown(html):
+    from markdownify import markdownify
+
+    html = _DROP_TAGS_RE.sub("", html)
+    markdown = markdownify(html, heading_style="ATX", bullets="-")
+    return _BLANK_LINES_RE.sub("\n\n", markdown).strip()
+
+
+def native_route(path):
+    # 네이티브 변환 대상이면 형식 이름, 아니면 None (래스터 이미지가 있으면 None)
+    if not NATIVE_CONVERTERS_ENABLED:
+        return None
+    extension = _extension(path)
+    if extension not in NATIVE_EXTENSIONS:
+        return None
+    if extension in ("html", "htm"):
+        try:
+            html = _read_html(path)
+        except OSError:
+            return None
+        return None if _IMG_TAG_RE.search(html) else "html"
+    if _has_office_media(path):
+        return None
+    return extension
+
+
+def convert_html(path):
+    return [PageResult(page=0, markdown=_html_to_markdown(_read_html(path)))], {}
+
+
+def _cell_text(value):
+    if value is None:
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    elif isinstance(value, datetime.datetime) and value.time() == datetime.time():
+        # 날짜만 입력된 셀도 openpyxl은 자정 datetime으로 돌려줌
+        value = value.date().isoformat()
+    elif isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+        value = value.isoformat()
+    return str(value).replace("|", "\\|").replace("\r\n", "\n").replace("\n", "<br>").strip()
+
+
+def _markdown_table(rows):
+    width = max(len(row) for row in rows)
+    rows = [row + [""] * (width - len(row)) for row in rows]
+    lines = ["| " + " | ".join(rows[0]) + " |", "|" + "|".join(["---"] * width) + "|"]
+    lines.extend("| " + " | ".join(row) + " |" for row in rows[1:])
+    return "\n".join(lines)
+
+
+def convert_xlsx(path):
+    # 시트 하나 = 페이지 하나, 첫 번째 비어 있지 않은 행을 표 머리글로 사용
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    pages = []
+    sheets = []
+    try:
+        for index, sheet in enumerate(workbook.worksheets):
+            rows = []
+            for values in sheet.iter_rows(values_only=True):
+                row = [_cell_text(value) for value in values]
+                while row and not row[-1]:
+                    row.pop()
+                if row:
+                    rows.append(row)
+            sheets.append({"sheet": sheet.title, "rows": len(rows)})
+            body = _markdown_table(rows) if rows else "_(빈 시트)_"
+            pages.append(PageResult(page=index, markdown=f"## {sheet.title}\n\n{body}"))
+    finally:
+        workbook.close()
+    return pages, {"sheets": sheets}
+
+
+def convert_docx(path):
+    import mammoth
+
+    with open(path, "rb") as docx_file:
+        converted = mammoth.convert_to_html(docx_file)
+    warnings = [message.message for message in converted.messages]
+    return [PageResult(page=0, markdown=_html_to_markdown(converted.value))], {"warnings": warnings}
+
+
+_CONVERTERS = {
+    "html": convert_html,
+    "htm": convert_html,
+    "xlsx": convert_xlsx,
+    "docx": convert_docx,
+}
+
+
+def convert_native(path, route=None):
+    # 네이티브로 처리할 수 없으면 None (호출한 쪽이 Marker 파이프라인으로 변환)
+    route = route or native_route(path)
+    if route is None:
+        return None
+    try:
+        pages, details = _CONVERTERS[route](path)
+    except Exception:
+        # 라이브러리가 없거나 파일을 읽지 못하면 기존 파이프라인에 맡김
+        return None
+    metadata = {"converter": f"native_{route}", **details}
+    return ConversionResult(pages=pages, metadata=metadata)
@@ -0,0 +1,278 @@
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from dataclasses import dataclass, field
+
+from asset_store import Asset, get_asset_store
+from conversion_result import PageResult, marker_version
+from model_registry import get_registry
+from text_layer import TEXT_LAYER_FAST_PATH
+
+# 페이지 단위 결과 캐시 (증분 재변환)
+# PDF 페이지마다 렌더링한 화면 + 텍스트 레이어의 해시(지문)를 만들고, 변환한 페이지 결과를 지문 기준으로 저장합니다.
+# 몇 페이지만 고친 문서를 다시 올리면 지문이 같은 페이지는 캐시에서 가져와 끼워 넣고
+# 바뀐 페이지만 모델로 변환하므로, 재변환 시간이 문서 크기가 아니라 수정한 페이지 수에 비례합니다.
+# 지문은 페이지 번호와 무관하므로 앞에 페이지를 넣거나 빼도 나머지 페이지는 재사용됩니다.
+
+PAGE_CACHE_ENABLED = os.environ.get("MARKER_PAGE_CACHE", "1") != "0"
+PAGE_CACHE_DIR = os.path.join(os.environ.get("MARKER_CACHE_DIR", "/tmp/marker_cache"), "pages")
+PAGE_CACHE_MB = int(os.environ.get("MARKER_PAGE_CACHE_MB", "512"))
+# 지문용 렌더링 배율 (1.0 = 72 DPI 회색조, 모델 입력보다 훨씬 작아 페이지당 수 ms)
+FINGERPRINT_SCALE = float(os.environ.get("MARKER_FINGERPRINT_SCALE", "1.0"))
+PAGE_CACHE_FORMAT_VERSION = 1
+
+# Marker가 마크다운에 넣는 페이지 앵커 (<span id="page-3-0">, (#page-3-0))
+_ANCHOR_RE = r'(id="|#)page-{page}-'
+
+
+def page_fingerprints(path, page_numbers):
+    # {페이지 번호: 지문} - PDF가 아니거나 열 수 없으면 None (페이지 캐시 사용 안 함)
+    if not path.lower().endswith(".pdf"):
+        return None
+    try:
+        import pypdfium2
+    except ImportError:
+        return None
+    try:
+        document = pypdfium2.PdfDocument(path)
+    except Exception:
+        return None
+    try:
+        fingerprints = {}
+        for page_number in page_numbers:
+            page = document[page_number]
+            try:
+                width, height = page.get_size()
+                textpage = page.get_textpage()
+                try:
+                    text = textpage.get_text_range()
+                finally:
+                    textpage.close()
+                bitmap = page.render(scale=FINGERPRINT_SCALE, grayscale=True)
+                digest = hashlib.sha256(f"{width:.2f}x{height:.2f}:{page.get_rotation()}:".encode("ascii"))
+                digest.update(text.encode("utf-8", "surrogatepass"))
+                digest.update(bytes(bitmap.buffer))
+                fingerprints[page_number] = digest.hexdigest()
+            finally:
+                page.close()
+        return fingerprints
+    except Exception:
+        return None
+    finally:
+        document.close()
+
+
+def page_key(fingerprint, options, version=None, profile=None):
+    # 같은 페이지라도 변환 설정/Marker 버전/추론 프로필이 다르면 별도 항목
+    settings = {
+        "fingerprint": fingerprint,
+        "use_llm": bool(options.use_llm),
+        "extract_images": bool(options.extract_images),
+        "text_layer_fast_path": TEXT_LAYER_FAST_PATH,
+        "marker": version or marker_version(),
+        "profile": profile or get_registry().profile,
+        "format": PAGE_CACHE_FORMAT_VERSION,
+    }
+    raw = json.dumps(settings, sort_keys=True).encode("utf-8")
+    return hashlib.sha256(raw).hexdigest()
+
+
+def _entry_page(entry):
+    # 메타데이터 목록 항목의 페이지 번호 (Marker는 page_id, page_routes는 page)
+    if not isinstance(entry, dict):
+        return None
+    return entry.get("page_id", entry.get("page"))
+
+
+def slice_metadata(metadata, page):
+    # 배치 메타데이터에서 한 페이지에 해당하는 목록 항목만 골라냄 (table_of_contents, page_stats, page_routes 등)
+    sliced = {}
+    for key, value in (metadata or {}).items():
+        if isinstance(value, list):
+            entries = [entry for entry in value if _entry_page(entry) == page]
+            if entries:
+                sliced[key] = entries
+    return sliced
+
+
+def _renumber_entry(entry, page):
+    entry = dict(entry)
+    if "page_id" in entry:
+        entry["page_id"] = page
+    elif "page" in entry:
+        entry["page"] = page
+    return entry
+
+
+@dataclass
+class CachedPage:
+    page: int  # 저장할 때의 페이지 번호
+    markdown: str
+    images: dict = field(default_factory=dict)  # {상대 경로: Asset}
+    metadata: dict = field(default_factory=dict)
+
+    def placed_at(self, page):
+        # 새 문서에서의 페이지 번호로 앵커/메타데이터를 고쳐 (PageResult, images, metadata)로 반환
+        markdown = self.markdown
+        metadata = self.metadata
+        if page != self.page:
+            markdown = re.sub(_ANCHOR_RE.format(page=self.page), lambda match: f"{match.group(1)}page-{page}-", markdown)
+            metadata = {key: [_renumber_entry(entry, page) for entry in entries] for key, entries in metadata.items()}
+        return PageResult(page=page, markdown=markdown), dict(self.images), metadata
+
+
+class PageCache:
+    def __init__(self, cache_dir=None, disk_bytes=PAGE_CACHE_MB * 1024 * 1024):
+        self.cache_dir = cache_dir or PAGE_CACHE_DIR
+        self.disk_bytes = disk_bytes
+        self._lock = threading.Lock()
+        self._bytes = None
+        self.hits = 0
+        self.misses = 0
+        self.stored = 0
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as entry_file:
+                payload = json.load(entry_file)
+            images = {}
+            store = get_asset_store()
+            for ref, asset in payload["images"].items():
+                asset = Asset(**asset)
+                # 이미지 저장소에서 지워졌으면 이 페이지는 다시 변환 (있으면 LRU 접근 시각 갱신)
+                os.utime(store.path(asset.name), None)
+                images[ref] = asset
+            os.utime(path, None)
+        except FileNotFoundError:
+            return None
+        except Exception:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+        return CachedPage(page=payload["page"], markdown=payload["markdown"], images=images, metadata=payload["metadata"])
+
+    def lookup(self, fingerprints, options):
+        # 캐시에 있는 페이지 {페이지 번호: (PageResult, images, metadata)}
+        found = {}
+        for page_number, fingerprint in fingerprints.items():
+            cached = self.get(page_key(fingerprint, options))
+            if cached is not None:
+                found[page_number] = cached.placed_at(page_number)
+        with self._lock:
+            self.hits += len(found)
+            self.misses += len(fingerprints) - len(found)
+        return found
+
+    def put(self, key, cached):
+        path = self._path(key)
+        if os.path.exists(path):
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        payload = {
+            "page": cached.page,
+            "markdown": cached.markdown,
+            # 이미지 파일은 공유 저장소에 있으므로 참조만 기록
+            "images": {ref: asset.as_dict() for ref, asset in cached.images.items()},
+            "metadata": cached.metadata,
+            "created_at": time.time(),
+        }
+        fd, tmp_path = tempfile.mkstemp(prefix=".tmp_", dir=os.path.dirname(path))
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as entry_file:
+                json.dump(payload, entry_file, ensure_ascii=False, default=str)
+            size = os.path.getsize(tmp_path)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        with self._lock:
+            self.stored += 1
+            if self._bytes is not None:
+                self._bytes += size
+
+    def store_batch(self, pages, images, metadata, fingerprints, options):
+        # 변환이 끝난 배치의 페이지를 하나씩 저장 (지문이 없는 페이지는 건너뜀)
+        for page in pages:
+            fingerprint = fingerprints.get(page.page)
+            if fingerprint is None:
+                continue
+            page_images = {ref: asset for ref, asset in images.items() if ref in page.markdown}
+            cached = CachedPage(page=page.page, markdown=page.markdown, images=page_images, metadata=slice_metadata(metadata, page.page))
+            try:
+                self.put(page_key(fingerprint, options), cached)
+            except Exception:
+                pass  # 페이지 캐시 실패는 변환 결과에 영향 없음
+        self.evict()
+
+    def _files(self):
+        for current, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if not name.startswith("."):
+                    yield os.path.join(current, name)
+
+    def evict(self):
+        # 상한을 넘으면 오래 사용되지 않은 페이지부터 삭제
+        with self._lock:
+            if self._bytes is not None and self._bytes <= self.disk_bytes:
+                return
+        entries = []
+        total = 0
+        for path in self._files():
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+        for _, size, path in sorted(entries):
+            if total <= self.disk_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+        with self._lock:
+            self._bytes = total
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "stored": self.stored,
+                "bytes": self._bytes,
+            }
+
+
+def incremental_report(metadata):
+    # 변환 메타데이터의 증분 변환 기록 -> {"reused": [...], "reconverted": [...]} (페이지 캐시를 안 썼으면 None)
+    reused = (metadata or {}).get("reused_pages")
+    reconverted = (metadata or {}).get("reconverted_pages")
+    if reused is None and reconverted is None:
+        return None
+    return {"reused": sorted(reused or []), "reconverted": sorted(reconverted or [])}
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_page_cache():
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = PageCache()
+        return _cache
@@ -0,0 +1,65 @@
+import os
+import re
+from dataclasses import dataclass
+
+# 큰 결과용 미리보기 도우미 (Streamlit 무관)
+# 결과 전체가 아니라 선택한 페이지/구간만 화면으로 보내고, 검색은 서버에서 페이지 단위로 처리합니다.
+
+# 한 번에 화면으로 보내는 최대 글자 수 (넘는 페이지는 문단 경계에서 구간으로 나눔)
+PREVIEW_CHUNK_CHARS = int(os.environ.get("MARKER_PREVIEW_CHUNK_CHARS", "20000"))
+# 검색 결과로 모으는 최대 페이지 수와 발췌문 앞뒤 글자 수
+SEARCH_MAX_PAGES = 500
+SNIPPET_CHARS = 60
+
+
+@dataclass
+class SearchHit:
+    index: int  # conversion.pages 안의 위치
+    page: int  # 원본 문서의 페이지 번호 (0부터)
+    count: int
+    snippet: str
+
+
+def search_pages(conversion, query, max_pages=SEARCH_MAX_PAGES):
+    # (페이지별 결과, 전체 일치 수) - 대소문자 구분 없이 그대로 일치하는 문자열 검색
+    pattern = re.compile(re.escape(query), re.IGNORECASE)
+    hits = []
+    total = 0
+    for index, page in enumerate(conversion.pages):
+        first = None
+        count = 0
+        for match in pattern.finditer(page.markdown):
+            if first is None:
+                first = match
+            count += 1
+        if not count:
+            continue
+        total += count
+        if len(hits) < max_pages:
+            start = max(0, first.start() - SNIPPET_CHARS)
+            end = min(len(page.markdown), first.end() + SNIPPET_CHARS)
+            snippet = " ".join(page.markdown[start:end].split())
+            hits.append(SearchHit(index=index, page=page.page, count=count, snippet=snippet))
+    return hits, total
+
+
+def split_chunks(text, max_chars=PREVIEW_CHUNK_CHARS):
+    # 문단(빈 줄) 경계에서 max_chars 이하 구간으로 나눔, 문단 하나가 더 길면 그 문단만 잘라서 나눔
+    if len(text) <= max_chars:
+        return [text]
+    chunks = []
+    current = ""
+    for paragraph in text.split("\n\n"):
+        candidate = f"{current}\n\n{paragraph}" if current else paragraph
+        if len(candidate) <= max_chars:
+            current = candidate
+            continue
+        if current:
+            chunks.append(current)
+        while len(paragraph) > max_chars:
+            chunks.append(paragraph[:max_chars])
+            paragraph = paragraph[max_chars:]
+        current = paragraph
+    if current:
+        chunks.append(current)
+    return chunks
@@ -0,0 +1,182 @@
+import base64
+import html
+import io
+import json
+import re
+
+from conversion_result import PageResult
+
+# ConversionResult 하나로부터 markdown/json/html 출력을 만드는 렌더러
+# 모델을 다시 돌리지 않고 문자열 변환만 하므로 형식 전환/다중 다운로드 비용이 작습니다.
+
+OUTPUT_FORMATS = ["markdown", "json", "html"]
+FILE_EXTENSIONS = {"markdown": "md", "json": "json", "html": "html"}
+MIME_TYPES = {"markdown": "text/markdown", "json": "application/json", "html": "text/html"}
+
+# Marker MarkdownRenderer의 paginate_output 구분자: "\n\n{페이지번호}" + "-" * 48 + "\n\n"
+PAGE_SEPARATOR_RE = re.compile(r"\n*\{(\d+)\}-{48}\n*")
+
+
+def split_pages(markdown):
+    parts = PAGE_SEPARATOR_RE.split(markdown)
+    if len(parts) == 1:
+        return [PageResult(page=0, markdown=markdown.strip())]
+
+    pages = []
+    # parts = [구분자 앞 텍스트, 페이지번호, 본문, 페이지번호, 본문, ...]
+    for index in range(1, len(parts), 2):
+        pages.append(PageResult(page=int(parts[index]), markdown=parts[index + 1].strip()))
+    return pages
+
+
+def write_markdown(conversion, out):
+    # conversion.markdown과 같은 내용을 페이지 단위로 기록 (전체 문자열을 만들지 않음)
+    first = True
+    for page in conversion.pages:
+        if not page.markdown:
+            continue
+        if not first:
+            out.write("\n\n")
+        out.write(page.markdown)
+        first = False
+
+
+def to_markdown(conversion):
+    return conversion.markdown
+
+
+def _json_block(value, level):
+    # indent=2 JSON 조각을 level 단계 들여쓰기 위치에 맞춤
+    return json.dumps(value, ensure_ascii=False, indent=2, default=str).replace("\n", "\n" + "  " * level)
+
+
+def write_json(conversion, out):
+    # json.dumps(payload, indent=2)와 같은 출력을 페이지 단위로 기록
+    # (JSON 문자열 이스케이프는 글자 단위이므로 페이지별로 이스케이프해 이어 붙여도 결과가 같음)
+    out.write('{\n  "markdown": "')
+    first = True
+    for page in conversion.pages:
+        if not page.markdown:
+            continue
+        if not first:
+            out.write("\\n\\n")
+        out.write(json.dumps(page.markdown, ensure_ascii=False)[1:-1])
+        first = False
+    out.write('",\n  "pages": ')
+    if conversion.pages:
+        out.write("[")
+        for index, page in enumerate(conversion.pages):
+            out.write(",\n    " if index else "\n    ")
+            out.write(_json_block({"page": page.page, "markdown": page.markdown}, 2))
+        out.write("\n  ]")
+    else:
+        out.write("[]")
+    out.write(',\n  "metadata": ' + _json_block(conversion.metadata, 1))
+    out.write(',\n  "images": ' + _json_block(sorted(conversion.images) if conversion.images else [], 1))
+    out.write("\n}")
+
+
+def to_json(conversion):
+    buffer = io.StringIO()
+    write_json(conversion, buffer)
+    return buffer.getvalue()
+
+
+def _markdown_to_html(markdown):
+    try:
+        import markdown2
+    except ImportError:
+        return f"<pre>{html.escape(markdown)}</pre>"
+    return markdown2.markdown(
+        markdown,
+        extras=["tables", "fenced-code-blocks", "strike", "header-ids", "cuddled-lists"],
+    )
+
+
+def _image_data_uri(asset):
+    from asset_store import get_asset_store
+
+    encoded = base64.b64encode(get_asset_store().read(asset)).decode("ascii")
+    return f"data:{asset.mime_type};base64,{encoded}"
+
+
+def _embed_images(body, images):
+    # 마크다운의 상대 경로 이미지 참조를 data URI로 바꿔 단일 HTML 파일로 열람 가능하게 함
+    for ref, asset in images.items():
+        pattern = f'src="{html.escape(ref)}"'
+        if pattern in body:
+            try:
+                body = body.replace(pattern, f'src="{_image_data_uri(asset)}"')
+            except OSError:
+                pass  # 저장소에서 지워진 이미지는 상대 경로 그대로 둠
+    return body
+
+
+def _html_section(conversion, page, embed_images=True):
+    body = _markdown_to_html(page.markdown)
+    if embed_images and conversion.images:
+        body = _embed_images(body, conversion.images)
+    return f'<section class="page" data-page="{page.page}">\n{body}\n</section>'
+
+
+def write_html(conversion, out, title="Converted document", embed_images=True):
+    out.write(
+        "<!DOCTYPE html>\n"
+        '<html lang="ko">\n<head>\n<meta charset="utf-8">\n'
+        f"<title>{html.escape(title)}</title>\n"
+        "<style>\n"
+        "body { max-width: 900px; margin: 2rem auto; padding: 0 1rem; font-family: sans-serif; line-height: 1.6; }\n"
+        "section.page + section.page { border-top: 1px dashed #ccc; margin-top: 2rem; padding-top: 2rem; }\n"
+        "table { border-collapse: collapse; } th, td { border: 1px solid #ccc; padding: 0.25rem 0.5rem; }\n"
+        "img { max-width: 100%; } pre { overflow-x: auto; background: #f6f8fa; padding: 0.75rem; }\n"
+        "</style>\n</head>\n<body>\n"
+    )
+    for index, page in enumerate(conversion.pages):
+        if index:
+            out.write("\n")
+        out.write(_html_section(conversion, page, embed_images))
+    out.write("\n</body>\n</html>\n")
+
+
+def to_html(conversion, title="Converted document", embed_images=True):
+    buffer = io.StringIO()
+    write_html(conversion, buffer, title, embed_images)
+    return buffer.getvalue()
+
+
+_RENDERERS = {
+    "markdown": to_markdown,
+    "json": to_json,
+    "html": to_html,
+}
+
+
+def render(conversion, output_format):
+    # 같은 결과에 대한 같은 형식 요청은 메모된 문자열을 그대로 반환
+    cached = conversion.renders.get(output_format)
+    if cached is None:
+        cached = _RENDERERS[output_format](conversion)
+        conversion.renders[output_format] = cached
+    return cached
+
+
+_WRITERS = {
+    "markdown": write_markdown,
+    "json": write_json,
+    "html": write_html,
+}
+
+
+def write_output(conversion, output_format, out):
+    # 큰 결과를 파일로 내보낼 때 사용 (메모 없이 페이지 단위로 기록)
+    _WRITERS[output_format](conversion, out)
+
+
+def render_page(conversion, index, output_format):
+    # 미리보기용 페이지 하나의 출력 (HTML은 이미지를 내장하지 않음)
+    page = conversion.pages[index]
+    if output_format == "json":
+        return _json_block({"page": page.page, "markdown": page.markdown}, 0)
+    if output_format == "html":
+        return _html_section(conversion, page, embed_images=False)
+    return page.markdown
@@ -0,0 +1,206 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+from asset_store import Asset, get_asset_store
+from conversion_result import ConversionResult, PageResult, marker_version
+from model_registry import get_registry
+
+# 변환 결과 캐시 (파일 내용 해시 + 변환 설정 기준)
+# 1단계: 프로세스 메모리 LRU, 2단계: MARKER_CACHE_DIR 아래 디스크 저장소
+
+CACHE_FORMAT_VERSION = 5
+DEFAULT_MEMORY_ITEMS = int(os.environ.get("MARKER_RESULT_CACHE_ITEMS", "16"))
+DEFAULT_DISK_MB = int(os.environ.get("MARKER_RESULT_CACHE_MB", "1024"))
+
+
+def file_digest(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def cache_key(digest, use_llm, extract_images, version=None, profile=None):
+    # 추론 프로필(fp32/bf16/int8)마다 출력이 조금씩 다르므로 별도 항목으로 저장
+    settings = {
+        "digest": digest,
+        "use_llm": bool(use_llm),
+        "extract_images": bool(extract_images),
+        "marker": version or marker_version(),
+        "profile": profile or get_registry().profile,
+        "format": CACHE_FORMAT_VERSION,
+    }
+    raw = json.dumps(settings, sort_keys=True).encode("utf-8")
+    return hashlib.sha256(raw).hexdigest()
+
+
+def _dir_size(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+class ResultCache:
+    def __init__(self, cache_dir=None, memory_items=DEFAULT_MEMORY_ITEMS, disk_bytes=DEFAULT_DISK_MB * 1024 * 1024):
+        if cache_dir is None:
+            cache_dir = os.path.join(os.environ.get("MARKER_CACHE_DIR", "/tmp/marker_cache"), "results")
+        self.cache_dir = cache_dir
+        self.memory_items = memory_items
+        self.disk_bytes = disk_bytes
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def _entry_dir(self, key):
+        return os.path.join(self.cache_dir, key)
+
+    def get(self, key, count=True):
+        # 변환 전 캐시 조회는 이 메서드 한 번으로 (적중/미스를 정확히 한 번 셈, 미스면 None)
+        # count=False는 조회 통계와 무관한 읽기 (결과 ID로 내려받기 등)
+        with self._lock:
+            result = self._memory.get(key)
+            if result is not None:
+                self._memory.move_to_end(key)
+                if count:
+                    self.hits += 1
+                return result
+
+        result = self._read_disk(key)
+        with self._lock:
+            if result is None:
+                if count:
+                    self.misses += 1
+                return None
+            if count:
+                self.hits += 1
+            self._remember(key, result)
+        return result
+
+    def contains(self, key):
+        # 통계에 넣지 않는 존재 확인 (변환 여부 판단에는 get을 사용)
+        with self._lock:
+            if key in self._memory:
+                return True
+        return os.path.exists(os.path.join(self._entry_dir(key), "result.json"))
+
+    def put(self, key, result):
+        with self._lock:
+            self._remember(key, result)
+        try:
+            self._write_disk(key, result)
+            self._evict_disk()
+        except Exception:
+            pass  # 디스크 캐시 실패는 메모리 캐시만으로 계속 진행
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def stats(self):
+        with self._lock:
+            memory_entries = len(self._memory)
+        entries = [name for name in os.listdir(self.cache_dir) if not name.startswith(".")]
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "memory_entries": memory_entries,
+            "disk_entries": len(entries),
+            "disk_bytes": _dir_size(self.cache_dir),
+        }
+
+    def _remember(self, key, result):
+        self._memory[key] = result
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_items:
+            self._memory.popitem(last=False)
+
+    def _read_disk(self, key):
+        entry_dir = self._entry_dir(key)
+        meta_path = os.path.join(entry_dir, "result.json")
+        if not os.path.exists(meta_path):
+            return None
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                payload = json.load(f)
+            images = {}
+            store = get_asset_store()
+            for ref, asset in (payload.get("images") or {}).items():
+                asset = Asset(**asset)
+                # 이미지 저장소에서 지워졌으면 결과 전체를 다시 변환 (있으면 LRU 접근 시각 갱신)
+                os.utime(store.path(asset.name), None)
+                images[ref] = asset
+            # LRU 판단용 접근 시각 갱신
+            os.utime(entry_dir, None)
+        except Exception:
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            return None
+        return ConversionResult(
+            pages=[PageResult(page=page["page"], markdown=page["markdown"]) for page in payload["pages"]],
+            metadata=payload.get("metadata", {}),
+            images=images,
+            from_cache=True,
+            result_id=key,
+        )
+
+    def _write_disk(self, key, result):
+        entry_dir = self._entry_dir(key)
+        if os.path.exists(entry_dir):
+            os.utime(entry_dir, None)
+            return
+        # 임시 디렉터리에 쓴 뒤 rename 하여 반쯤 쓰인 항목이 보이지 않도록 함
+        tmp_dir = tempfile.mkdtemp(prefix=".tmp_", dir=self.cache_dir)
+        try:
+            payload = {
+                "pages": [{"page": page.page, "markdown": page.markdown} for page in result.pages],
+                "metadata": result.metadata,
+                # 이미지 파일은 공유 저장소에 있으므로 참조만 기록
+                "images": {ref: asset.as_dict() for ref, asset in result.images.items()},
+                "created_at": time.time(),
+            }
+            with open(os.path.join(tmp_dir, "result.json"), "w", encoding="utf-8") as f:
+                json.dump(payload, f, ensure_ascii=False, default=str)
+            os.rename(tmp_dir, entry_dir)
+        except Exception:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            raise
+
+    def _evict_disk(self):
+        entries = []
+        total = 0
+        for name in os.listdir(self.cache_dir):
+            if name.startswith("."):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            size = _dir_size(path)
+            entries.append((os.path.getmtime(path), size, path))
+            total += size
+        # 가장 오래 사용되지 않은 항목부터 삭제
+        for _, size, path in sorted(entries):
+            if total <= self.disk_bytes:
+                break
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_result_cache():
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ResultCache()
+        return _cache
@@ -0,0 +1,76 @@
+import os
+import tempfile
+import threading
+
+# Marker static(폰트) 경로를 프로세스 시작 시 한 번만 쓰기 가능한 위치로 지정
+# Marker 설정(pydantic BaseSettings)은 import 시점에 환경변수를 읽으므로
+# marker 패키지를 import 하기 전에 호출되어야 합니다.
+
+DEFAULT_STATIC_DIR = os.path.join(os.environ.get("MARKER_CACHE_DIR", "/tmp/marker_cache"), "static")
+FONT_NAME = "GoNotoCurrent-Regular.ttf"
+
+# 모델 가중치 캐시는 한 경로로 통일 (Docker 이미지 빌드 시 이 경로에 미리 받아 둠)
+# surya 가중치(MODEL_CACHE_DIR), Hugging Face/torch 캐시가 모두 이 아래에 위치합니다.
+DEFAULT_MODEL_CACHE = "/app/.cache"
+
+_configured = None
+_model_cache = None
+_lock = threading.Lock()
+
+
+def _writable_dir(path):
+    try:
+        os.makedirs(path, exist_ok=True)
+        return os.access(path, os.W_OK)
+    except OSError:
+        return False
+
+
+def configure_marker_static():
+    global _configured
+    with _lock:
+        if _configured is not None:
+            return _configured
+
+        static_dir = os.environ.get("MARKER_STATIC_DIR", DEFAULT_STATIC_DIR)
+        if not _writable_dir(os.path.join(static_dir, "fonts")):
+            # 지정 위치에 쓸 수 없으면 프로세스 전용 임시 디렉터리 사용
+            static_dir = tempfile.mkdtemp(prefix="marker_static_")
+            os.makedirs(os.path.join(static_dir, "fonts"), exist_ok=True)
+
+        font_dir = os.path.join(static_dir, "fonts")
+        # 기본값은 site-packages/static 아래라 컨테이너에서 권한 오류가 나므로 모두 덮어씀
+        os.environ.setdefault("FONT_DIR", font_dir)
+        os.environ.setdefault("FONT_PATH", os.path.join(font_dir, FONT_NAME))
+        os.environ.setdefault("OUTPUT_DIR", os.path.join(static_dir, "conversion_results"))
+        os.environ.setdefault("DEBUG_DATA_FOLDER", os.path.join(static_dir, "debug_data"))
+        os.environ["MARKER_STATIC_DIR"] = static_dir
+
+        _configured = static_dir
+        return static_dir
+
+
+def configure_model_cache():
+    # 모델 관련 캐시 환경변수를 MARKER_MODEL_CACHE 한 곳 기준으로 지정
+    # surya/transformers 설정은 import 시점에 환경변수를 읽으므로 marker import 전에 호출되어야 하고,
+    # 이미 지정된 환경변수(Dockerfile ENV 등)는 덮어쓰지 않습니다.
+    global _model_cache
+    with _lock:
+        if _model_cache is not None:
+            return _model_cache
+
+        cache_dir = os.environ.get("MARKER_MODEL_CACHE", DEFAULT_MODEL_CACHE)
+        if not os.path.isdir(os.path.join(cache_dir, "datalab", "models")) and not _writable_dir(cache_dir):
+            # 미리 받아 둔 가중치도 없고 쓸 수도 없으면 임시 디렉터리 아래에 받음
+            cache_dir = os.path.join(tempfile.gettempdir(), "marker_model_cache")
+            os.makedirs(cache_dir, exist_ok=True)
+
+        os.environ.setdefault("XDG_CACHE_HOME", cache_dir)
+        os.environ.setdefault("MODEL_CACHE_DIR", os.path.join(cache_dir, "datalab", "models"))
+        os.environ.setdefault("HF_HOME", os.path.join(cache_dir, "huggingface"))
+        os.environ.setdefault("HUGGINGFACE_HUB_CACHE", os.path.join(cache_dir, "huggingface", "hub"))
+        os.environ.setdefault("TORCH_HOME", os.path.join(cache_dir, "torch"))
+        os.environ["MARKER_MODEL_CACHE"] = cache_dir
+
+        _model_cache = cache_dir
+        return cache_dir
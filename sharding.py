@@ -0,0 +1,137 @@
+import multiprocessing
+import os
+import threading
+import time
+
+from engine import PageBatch, load_models, convert_document, pdf_page_count, reuse_cached_pages
+from inference_profile import threads_per_worker
+from model_registry import get_registry
+from page_cache import PAGE_CACHE_ENABLED
+from stage_timing import StageTimings
+
+# 큰 PDF를 페이지 구간(shard)으로 나눠 여러 프로세스에서 병렬 변환
+# fork로 만든 자식 프로세스는 부모가 이미 로드한 모델 가중치를 copy-on-write로 공유하므로
+# 프로세스마다 가중치를 다시 읽거나 복사본을 따로 들고 있지 않습니다.
+
+
+def default_shard_workers():
+    configured = os.environ.get("MARKER_SHARD_WORKERS")
+    if configured:
+        return max(1, int(configured))
+    cpu_count = os.cpu_count() or 1
+    return max(1, min(4, cpu_count // 2))
+
+
+SHARD_WORKERS = default_shard_workers()
+# 이 페이지 수 이상일 때만 샤딩 (작은 문서는 프로세스 생성 비용이 더 큼)
+SHARD_MIN_PAGES = int(os.environ.get("MARKER_SHARD_MIN_PAGES", "24"))
+SHARD_POLL_SECONDS = 0.5
+
+
+def sharding_available():
+    return SHARD_WORKERS > 1 and "fork" in multiprocessing.get_all_start_methods()
+
+
+def should_shard(path, page_count=None):
+    if not sharding_available():
+        return False
+    if page_count is None:
+        page_count = pdf_page_count(path)
+    return bool(page_count) and page_count >= SHARD_MIN_PAGES
+
+
+def shard_ranges(page_count, shards):
+    # 연속된 페이지 구간으로 최대한 균등하게 분할
+    shards = max(1, min(shards, page_count))
+    base, extra = divmod(page_count, shards)
+    ranges = []
+    start = 0
+    for index in range(shards):
+        size = base + (1 if index < extra else 0)
+        ranges.append(list(range(start, start + size)))
+        start += size
+    return ranges
+
+
+def _init_shard_worker(torch_threads):
+    # 프로세스마다 torch 스레드 수를 나눠 코어 과다 할당 방지
+    # fork 시점에 다른 작업 스레드가 잡고 있던 추론 락이 그대로 복사되므로 자식에서는 새로 만듦
+    get_registry().inference_lock = threading.Lock()
+    try:
+        import torch
+        torch.set_num_threads(torch_threads)
+    except Exception:
+        pass
+
+
+def _convert_shard(path, options, page_numbers, fingerprints):
+    # 페이지 캐시 조회는 부모가 이미 했으므로 자식은 변환 결과 저장에만 지문을 사용
+    timings = StageTimings()
+    result = convert_document(
+        path,
+        options,
+        page_numbers=page_numbers,
+        on_batch=lambda batch: timings.merge(batch.timings),
+        use_page_cache=fingerprints is not None,
+        fingerprints=fingerprints,
+    )
+    return result, timings.as_dict()
+
+
+def iter_convert_sharded(path, options, cancel_token, workers=None, page_count=None):
+    # 샤드가 끝나는 순서대로 PageBatch를 yield (페이지 순서 정렬은 받는 쪽에서 처리)
+    workers = workers or SHARD_WORKERS
+    if page_count is None:
+        page_count = pdf_page_count(path)
+    page_numbers = list(range(page_count))
+
+    # 페이지 캐시 조회는 부모에서 한 번만 (적중/미스 통계가 부모 프로세스에 남도록) - 바뀐 페이지만 샤드로 나눔
+    pages_done = 0
+    fingerprints = None
+    if PAGE_CACHE_ENABLED:
+        reused_batch, page_numbers, fingerprints = reuse_cached_pages(path, page_numbers, options, page_count)
+        if reused_batch is not None:
+            pages_done = reused_batch.pages_done
+            yield reused_batch
+        if not page_numbers:
+            # 모든 페이지를 재사용 - 모델 로드/프로세스 생성 없이 끝
+            return
+        cancel_token.check()
+    ranges = [[page_numbers[index] for index in shard] for shard in shard_ranges(len(page_numbers), workers)]
+
+    # fork 전에 부모에서 모델을 로드해 두어야 자식이 가중치를 공유함
+    load_models()
+
+    # 작업 워커 하나에 배정된 torch 스레드를 샤드끼리 나눔
+    torch_threads = max(1, threads_per_worker() // len(ranges))
+    context = multiprocessing.get_context("fork")
+    pool = context.Pool(processes=len(ranges), initializer=_init_shard_worker, initargs=(torch_threads,))
+    try:
+        pending = []
+        for pages in ranges:
+            shard_fingerprints = {page: fingerprints[page] for page in pages if page in fingerprints} if fingerprints else None
+            pending.append((pool.apply_async(_convert_shard, (path, options, pages, shard_fingerprints)), pages))
+        while pending:
+            cancel_token.check()
+            finished = [item for item in pending if item[0].ready()]
+            if not finished:
+                time.sleep(SHARD_POLL_SECONDS)
+                continue
+            for item in finished:
+                pending.remove(item)
+                task, pages = item
+                result, timings = task.get()
+                pages_done += len(pages)
+                yield PageBatch(
+                    pages=result.pages,
+                    images=result.images,
+                    metadata=result.metadata,
+                    pages_done=pages_done,
+                    page_count=page_count,
+                    timings=timings,
+                )
+        pool.close()
+    finally:
+        # 취소/시간 초과/오류 시 남은 샤드 프로세스를 즉시 종료
+        pool.terminate()
+        pool.join()
@@ -0,0 +1,113 @@
+import threading
+import time
+from contextlib import contextmanager
+
+# Marker 파이프라인 단계별 소요 시간 측정
+# PdfConverter의 변환 과정은 그대로 두고 빌더/프로세서/렌더러 객체만 시간 측정 래퍼로 감싸
+# 배치마다 {단계: 초} 를 남깁니다. 측정 자체는 perf_counter 호출뿐이라 항상 켜 둡니다.
+
+# 벤치마크/지표에서 쓰는 단계 이름 (실행 순서)
+STAGES = ["native", "page_cache", "text_layer", "page_images", "layout", "lines", "ocr", "structure", "processors", "render", "output", "assets"]
+
+
+class StageTimings:
+    def __init__(self):
+        self.seconds = {}
+
+    @contextmanager
+    def measure(self, stage):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(stage, time.perf_counter() - started)
+
+    def add(self, stage, seconds):
+        self.seconds[stage] = self.seconds.get(stage, 0.0) + seconds
+
+    def merge(self, other):
+        for stage, seconds in (other or {}).items():
+            self.add(stage, seconds)
+
+    def as_dict(self):
+        return dict(self.seconds)
+
+
+class _TimedStep:
+    # 빌더/프로세서/렌더러 호출을 감싸 소요 시간을 기록
+    # (프로세서는 converter와 함께 재사용되므로 배치마다 바뀌는 converter.timings를 호출 시점에 읽음)
+    def __init__(self, step, stage, owner):
+        self._step = step
+        self._stage = stage
+        self._owner = owner
+
+    def __call__(self, *args, **kwargs):
+        # 단계 경계마다 취소/마감 확인 (페이지 배치로 나눌 수 없는 DOCX/PPTX/EPUB/이미지도 단계 사이에서 중단)
+        if self._owner.cancel_token is not None:
+            self._owner.cancel_token.check()
+        with self._owner.timings.measure(self._stage):
+            return self._step(*args, **kwargs)
+
+
+# 래퍼로 직접 재는 단계 - build_document 전체 시간에서 이것들을 뺀 나머지가 page_images
+_MEASURED_STAGES = ("layout", "lines", "ocr", "structure", "processors")
+
+_converter_class = None
+_converter_class_lock = threading.Lock()
+
+
+def _timed_converter_class():
+    # marker import를 실제 변환 시점까지 미루기 위해 클래스를 처음 필요할 때 만듦
+    global _converter_class
+    with _converter_class_lock:
+        if _converter_class is not None:
+            return _converter_class
+
+        from marker.builders.line import LineBuilder
+        from marker.builders.ocr import OcrBuilder
+        from marker.builders.structure import StructureBuilder
+        from marker.converters.pdf import PdfConverter
+
+        class TimedPdfConverter(PdfConverter):
+            # 변환 순서는 PdfConverter.build_document/__call__ 그대로 두고,
+            # resolve_dependencies가 만드는 빌더/렌더러와 프로세서 목록만 시간 측정 래퍼로 감쌈
+            timings = None
+            cancel_token = None
+
+            def __init__(self, *args, **kwargs):
+                super().__init__(*args, **kwargs)
+                self.processor_list = [_TimedStep(processor, "processors", self) for processor in self.processor_list]
+
+            def resolve_dependencies(self, cls):
+                resolved = super().resolve_dependencies(cls)
+                stages = {
+                    getattr(self, "layout_builder_class", None): "layout",
+                    LineBuilder: "lines",
+                    OcrBuilder: "ocr",
+                    StructureBuilder: "structure",
+                    getattr(self, "renderer", None): "render",
+                }
+                stage = stages.get(cls)
+                if stage is None or self.timings is None:
+                    return resolved
+                return _TimedStep(resolved, stage, self)
+
+            def build_document(self, filepath):
+                timings = self.timings
+                started = time.perf_counter()
+                before = sum(timings.seconds.get(stage, 0.0) for stage in _MEASURED_STAGES)
+                document = super().build_document(filepath)
+                # 나머지는 provider 열기(DOCX/PPTX/HTML 등은 PDF 변환 포함)와 페이지 이미지 렌더링 시간
+                measured = sum(timings.seconds.get(stage, 0.0) for stage in _MEASURED_STAGES) - before
+                timings.add("page_images", time.perf_counter() - started - measured)
+                return document
+
+        _converter_class = TimedPdfConverter
+        return _converter_class
+
+
+def build_converter(artifact_dict, config, timings):
+    # PdfConverter와 같은 인자를 받고, 변환할 때마다 timings에 단계별 시간을 누적
+    converter = _timed_converter_class()(artifact_dict=artifact_dict, config=config)
+    converter.timings = timings
+    return converter
@@ -0,0 +1,126 @@
+import os
+from dataclasses import dataclass
+
+# 페이지별 텍스트 레이어 판별
+# 본문 텍스트가 이미 들어 있는 페이지(born-digital)는 OCR 없이 텍스트 레이어 + 레이아웃 모델로 변환하고,
+# 스캔 페이지(텍스트 없음/깨진 텍스트/전면 이미지)만 OCR 모델을 거치게 합니다.
+# pypdfium2로 페이지당 글자 수와 이미지 면적만 확인하므로 페이지당 수 ms 수준입니다.
+
+TEXT_LAYER_FAST_PATH = os.environ.get("MARKER_TEXT_LAYER_FAST_PATH", "1") != "0"
+# 이보다 글자가 적으면 텍스트 레이어가 없는 것으로 봄
+MIN_TEXT_CHARS = int(os.environ.get("MARKER_MIN_TEXT_CHARS", "50"))
+# 깨진 글자(대체 문자/제어 문자) 비율 상한, 글자 중 영숫자 최소 비율 (Marker PdfProvider 기준과 동일)
+MAX_INVALID_RATIO = 0.05
+MIN_ALNUM_RATIO = 0.3
+# 페이지 대부분을 덮는 이미지 위의 텍스트는 스캔본에 덧씌운 OCR 레이어로 보고 다시 OCR
+FULL_PAGE_IMAGE_COVERAGE = 0.9
+
+ROUTE_TEXT_LAYER = "text_layer"
+ROUTE_OCR = "ocr"
+
+# 경로별 Marker config (DocumentBuilder/LineBuilder가 매 호출마다 읽음)
+# text_layer: OCR 빌더를 건너뛰고, 한 페이지라도 텍스트가 좋으면 라인 검출 모델도 건너뜀
+ROUTE_CONFIG = {
+    ROUTE_TEXT_LAYER: {"disable_ocr": True, "min_document_ocr_threshold": 0.0},
+    ROUTE_OCR: {"disable_ocr": False, "min_document_ocr_threshold": 0.85},
+}
+
+
+@dataclass
+class PageRoute:
+    page: int
+    route: str
+    chars: int
+    image_coverage: float
+    reason: str
+
+    def as_dict(self):
+        return {
+            "page": self.page,
+            "route": self.route,
+            "chars": self.chars,
+            "image_coverage": round(self.image_coverage, 3),
+            "reason": self.reason,
+        }
+
+
+def _invalid_ratio(text):
+    if not text:
+        return 0.0
+    invalid = sum(1 for char in text if char == "�" or (ord(char) < 32 and char not in "\r\n\t"))
+    return invalid / len(text)
+
+
+def _alnum_ratio(text):
+    visible = [char for char in text if not char.isspace()]
+    if not visible:
+        return 0.0
+    return sum(1 for char in visible if char.isalnum()) / len(visible)
+
+
+def _image_coverage(page, raw):
+    width, height = page.get_size()
+    area = width * height
+    if not area:
+        return 0.0
+    covered = 0.0
+    for image in page.get_objects(filter=(raw.FPDF_PAGEOBJ_IMAGE,), max_depth=2):
+        left, bottom, right, top = image.get_pos()
+        covered += max(0.0, min(right, width) - max(left, 0.0)) * max(0.0, min(top, height) - max(bottom, 0.0))
+    return min(covered / area, 1.0)
+
+
+def classify_page(page, page_number, raw):
+    textpage = page.get_textpage()
+    try:
+        chars = textpage.count_chars()
+        text = textpage.get_text_range() if chars else ""
+    finally:
+        textpage.close()
+    coverage = _image_coverage(page, raw)
+
+    if chars < MIN_TEXT_CHARS:
+        return PageRoute(page_number, ROUTE_OCR, chars, coverage, "no_text")
+    if _invalid_ratio(text) > MAX_INVALID_RATIO or _alnum_ratio(text) < MIN_ALNUM_RATIO:
+        return PageRoute(page_number, ROUTE_OCR, chars, coverage, "garbled_text")
+    if coverage >= FULL_PAGE_IMAGE_COVERAGE:
+        return PageRoute(page_number, ROUTE_OCR, chars, coverage, "scanned_with_text_layer")
+    return PageRoute(page_number, ROUTE_TEXT_LAYER, chars, coverage, "text_layer")
+
+
+def classify_pages(path, page_numbers=None):
+    # PDF가 아니거나 열 수 없으면 None (기존처럼 Marker가 판단)
+    if not TEXT_LAYER_FAST_PATH or not path.lower().endswith(".pdf"):
+        return None
+    try:
+        import pypdfium2
+        import pypdfium2.raw as raw
+    except ImportError:
+        return None
+    try:
+        document = pypdfium2.PdfDocument(path)
+    except Exception:
+        return None
+    try:
+        if page_numbers is None:
+            page_numbers = range(len(document))
+        routes = []
+        for page_number in page_numbers:
+            page = document[page_number]
+            try:
+                routes.append(classify_page(page, page_number, raw))
+            finally:
+                page.close()
+        return routes
+    except Exception:
+        return None
+    finally:
+        document.close()
+
+
+def route_summary(routes):
+    # 메타데이터의 page_routes 목록에서 경로별 페이지 수
+    summary = {ROUTE_TEXT_LAYER: 0, ROUTE_OCR: 0}
+    for route in routes or []:
+        summary[route["route"]] = summary.get(route["route"], 0) + 1
+    return summary
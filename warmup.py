@@ -0,0 +1,155 @@
+import argparse
+import importlib
+import os
+import sys
+import threading
+import time
+
+from engine import load_models
+from weight_store import ensure_verified, write_manifest
+
+# 시작 시간 단축
+# 1) 이미지 빌드 시: python warmup.py --prefetch 로 가중치/폰트를 MARKER_MODEL_CACHE에 미리 받아 둠
+# 2) 앱 시작 시: 백그라운드 스레드가 marker/torch import와 모델 로드를 미리 끝내 두어
+#    첫 사용자가 다운로드/import 비용을 치르지 않도록 함 (UI는 그동안 바로 렌더링됨)
+#
+#   python warmup.py --prefetch     가중치/폰트 받기 (Dockerfile)
+#   python warmup.py                import + 모델 로드 시간 측정
+
+WARMUP_ON_START = os.environ.get("MARKER_WARMUP", "1") != "0"
+# 변환 경로가 처음 import 하는 모듈 (대부분의 import 시간은 torch/transformers)
+HEAVY_MODULES = ("torch", "marker.models", "marker.converters.pdf", "marker.output")
+
+IDLE = "idle"
+IMPORTING = "importing"
+LOADING = "loading"
+READY = "ready"
+FAILED = "failed"
+
+_imported_at = time.time()
+
+
+def process_started_at():
+    # 실제 프로세스 시작 시각 (psutil이 없으면 이 모듈 import 시각)
+    try:
+        import psutil
+        return psutil.Process().create_time()
+    except Exception:
+        return _imported_at
+
+
+def import_marker():
+    # 변환 경로에서 쓰는 무거운 모듈(torch/transformers/surya/marker)을 미리 import
+    for module in HEAVY_MODULES:
+        importlib.import_module(module)
+
+
+def download_static():
+    # PdfConverter가 첫 변환 때 받는 폰트를 미리 받아 둠
+    from marker.util import download_font
+    download_font()
+
+
+class Warmup:
+    def __init__(self):
+        self.state = IDLE
+        self.error = None
+        self.started_at = None
+        self.ready_at = None
+        # 단계별 소요 시간 {단계: 초}
+        self.phases = {}
+        self._thread = None
+        self._lock = threading.Lock()
+
+    @property
+    def ready(self):
+        return self.state == READY
+
+    @property
+    def ready_seconds(self):
+        # 프로세스 시작부터 모델 준비 완료까지 걸린 시간
+        if self.ready_at is None:
+            return None
+        return self.ready_at - process_started_at()
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None:
+                return self
+            self._thread = threading.Thread(target=self.run, name="marker-warmup", daemon=True)
+            self._thread.start()
+        return self
+
+    def _phase(self, name, state, func):
+        self.state = state
+        started = time.perf_counter()
+        func()
+        self.phases[name] = time.perf_counter() - started
+
+    def run(self):
+        self.started_at = time.time()
+        try:
+            self._phase("verify", IMPORTING, ensure_verified)
+            self._phase("import", IMPORTING, import_marker)
+            self._phase("static", IMPORTING, download_static)
+            self._phase("load", LOADING, load_models)
+        except Exception as error:
+            self.error = error
+            self.state = FAILED
+            return
+        self.ready_at = time.time()
+        self.state = READY
+
+    def stats(self):
+        return {
+            "state": self.state,
+            "error": str(self.error) if self.error else None,
+            "phases": dict(self.phases),
+            "ready_seconds": self.ready_seconds,
+        }
+
+
+_warmup = Warmup()
+
+
+def get_warmup():
+    return _warmup
+
+
+def start_warmup():
+    # 프로세스당 한 번만 시작 (Streamlit rerun마다 호출되어도 기존 스레드 유지)
+    return _warmup.start()
+
+
+def prefetch():
+    # 가중치는 create_model_dict가 MODEL_CACHE_DIR에 없을 때만 받음 - 빌드 단계에서 한 번 실행
+    # 받은 뒤 파일 목록(크기/SHA-256)을 남겨 오프라인 실행 시 검증에 사용
+    started = time.perf_counter()
+    download_static()
+    load_models()
+    write_manifest()
+    return time.perf_counter() - started
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Marker 모델 미리 받기 / 시작 시간 측정")
+    parser.add_argument("--prefetch", action="store_true", help="가중치와 폰트를 캐시에 받고 종료")
+    args = parser.parse_args(argv)
+
+    if args.prefetch:
+        seconds = prefetch()
+        print(f"✅ 모델 캐시 준비 완료: {os.environ.get('MARKER_MODEL_CACHE')} ({seconds:.1f}초)")
+        return 0
+
+    warmup = get_warmup()
+    warmup.run()
+    if warmup.state == FAILED:
+        print(f"❌ 준비 실패: {warmup.error}", file=sys.stderr)
+        return 1
+    phases = ", ".join(f"{name} {seconds:.1f}초" for name, seconds in warmup.phases.items())
+    print(f"✅ 준비 완료: {phases} (프로세스 시작 후 {warmup.ready_seconds:.1f}초)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
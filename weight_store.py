@@ -0,0 +1,238 @@
+import hashlib
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+from dataclasses import dataclass, field
+
+# 오프라인 로컬 가중치 저장소
+# 이미지 빌드(warmup.py --prefetch) 때 받은 가중치/폰트의 크기와 SHA-256을 목록 파일로 남기고,
+# 프로세스 시작 후 첫 모델 로드 전에 한 번만 검증합니다. 오프라인 모드에서는 네트워크를 전혀 쓰지 않고
+# 목록에 있는 파일만으로 로드하며, 없거나 깨진 파일은 다운로드 대신 바로 오류로 알립니다.
+# 로드 후에는 safetensors 파일을 메모리 매핑해 파라미터를 파일 페이지로 교체하므로
+# 같은 가중치를 쓰는 여러 프로세스가 페이지 캐시를 공유합니다.
+
+WEIGHTS_OFFLINE = os.environ.get("MARKER_OFFLINE", "0") == "1"
+# sha256: 전체 해시 비교, size: 크기만 비교, off: 검증 안 함
+WEIGHTS_VERIFY = os.environ.get("MARKER_WEIGHTS_VERIFY", "sha256")
+WEIGHTS_MMAP = os.environ.get("MARKER_WEIGHTS_MMAP", "1") != "0"
+MANIFEST_NAME = "marker_weights.json"
+HASH_CHUNK_BYTES = 8 * 1024 * 1024
+# 오프라인 모드에서 surya가 다운로드를 시도하면 바로 실패하도록 하는 주소 (.invalid는 DNS로 풀리지 않음)
+OFFLINE_S3_URL = "http://offline.invalid"
+
+
+class WeightStoreError(Exception):
+    pass
+
+
+@dataclass
+class VerifyReport:
+    mode: str
+    files: int = 0
+    bytes: int = 0
+    seconds: float = 0.0
+    missing: list = field(default_factory=list)
+    mismatched: list = field(default_factory=list)
+
+    @property
+    def ok(self):
+        return not self.missing and not self.mismatched
+
+    def as_dict(self):
+        return {
+            "mode": self.mode,
+            "files": self.files,
+            "bytes": self.bytes,
+            "seconds": round(self.seconds, 3),
+            "missing": self.missing,
+            "mismatched": self.mismatched,
+        }
+
+
+def configure_offline():
+    # marker/surya/transformers import 전에 호출 (설정은 import 시점에 환경변수를 읽음)
+    if not WEIGHTS_OFFLINE:
+        return False
+    os.environ["HF_HUB_OFFLINE"] = "1"
+    os.environ["TRANSFORMERS_OFFLINE"] = "1"
+    os.environ["HF_DATASETS_OFFLINE"] = "1"
+    os.environ.setdefault("S3_BASE_URL", OFFLINE_S3_URL)
+    return True
+
+
+def _roots():
+    # 목록에 넣을 디렉터리 {이름: 경로} - surya 가중치와 Marker 폰트
+    roots = {}
+    if os.environ.get("MODEL_CACHE_DIR"):
+        roots["models"] = os.environ["MODEL_CACHE_DIR"]
+    if os.environ.get("FONT_DIR"):
+        roots["fonts"] = os.environ["FONT_DIR"]
+    return roots
+
+
+def manifest_path():
+    return os.path.join(os.environ.get("MARKER_MODEL_CACHE", ""), MANIFEST_NAME)
+
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as weight_file:
+        while True:
+            chunk = weight_file.read(HASH_CHUNK_BYTES)
+            if not chunk:
+                break
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def write_manifest(path=None):
+    # 빌드 단계에서 가중치를 받은 직후 호출
+    files = {}
+    for root_name, root in _roots().items():
+        for current, _, names in os.walk(root):
+            for name in sorted(names):
+                if name.startswith("."):
+                    continue
+                full_path = os.path.join(current, name)
+                relative = f"{root_name}/{os.path.relpath(full_path, root)}"
+                files[relative] = {"size": os.path.getsize(full_path), "sha256": _sha256(full_path)}
+    manifest = {"created_at": time.time(), "files": files}
+    path = path or manifest_path()
+    with open(path, "w", encoding="utf-8") as manifest_file:
+        json.dump(manifest, manifest_file, indent=2, sort_keys=True)
+    return manifest
+
+
+def verify_store(mode=None, path=None):
+    mode = mode or WEIGHTS_VERIFY
+    path = path or manifest_path()
+    report = VerifyReport(mode=mode)
+    if mode == "off":
+        return report
+    if not os.path.exists(path):
+        if WEIGHTS_OFFLINE:
+            raise WeightStoreError(
+                f"오프라인 모드인데 가중치 목록({path})이 없습니다. 이미지 빌드 시 python warmup.py --prefetch 로 받아 두세요."
+            )
+        return None
+    with open(path, "r", encoding="utf-8") as manifest_file:
+        manifest = json.load(manifest_file)
+
+    started = time.perf_counter()
+    roots = _roots()
+    for relative, expected in manifest["files"].items():
+        root_name, _, rest = relative.partition("/")
+        full_path = os.path.join(roots.get(root_name, ""), rest)
+        if not os.path.exists(full_path):
+            report.missing.append(relative)
+            continue
+        size = os.path.getsize(full_path)
+        report.files += 1
+        report.bytes += size
+        if size != expected["size"] or (mode == "sha256" and _sha256(full_path) != expected["sha256"]):
+            report.mismatched.append(relative)
+    report.seconds = time.perf_counter() - started
+    if not report.ok:
+        problems = report.missing[:3] + report.mismatched[:3]
+        raise WeightStoreError(
+            f"가중치 검증 실패: 없음 {len(report.missing)}개, 불일치 {len(report.mismatched)}개 ({', '.join(problems)})"
+        )
+    return report
+
+
+_report = None
+_verified = False
+_verify_lock = threading.Lock()
+
+
+def ensure_verified():
+    # 프로세스당 한 번만 검증 (모델 재로드 때는 다시 읽지 않음)
+    global _report, _verified
+    with _verify_lock:
+        if not _verified:
+            _report = verify_store()
+            _verified = True
+        return _report
+
+
+def verify_stats():
+    return _report.as_dict() if _report is not None else None
+
+
+# safetensors dtype 이름 -> torch dtype 이름
+_DTYPES = {
+    "F64": "float64", "F32": "float32", "F16": "float16", "BF16": "bfloat16",
+    "I64": "int64", "I32": "int32", "I16": "int16", "I8": "int8", "U8": "uint8", "BOOL": "bool",
+}
+
+
+def _map_safetensors(path, mappings):
+    # 파일 전체를 copy-on-write로 매핑하고 텐서별 뷰를 만듦 (읽기 전용 페이지는 프로세스끼리 공유)
+    import torch
+
+    with open(path, "rb") as weight_file:
+        header_size = struct.unpack("<Q", weight_file.read(8))[0]
+        header = json.loads(weight_file.read(header_size))
+        mapping = mmap.mmap(weight_file.fileno(), 0, access=mmap.ACCESS_COPY)
+    mappings.append(mapping)
+    header.pop("__metadata__", None)
+    tensors = {}
+    for name, info in header.items():
+        dtype = getattr(torch, _DTYPES.get(info["dtype"], ""), None)
+        start, end = info["data_offsets"]
+        if dtype is None or end <= start:
+            continue
+        count = (end - start) // torch.empty((), dtype=dtype).element_size()
+        tensors[name] = torch.frombuffer(mapping, dtype=dtype, count=count, offset=8 + header_size + start).view(info["shape"])
+    return tensors
+
+
+def map_module(module):
+    # 로드된 파라미터와 같은 이름/모양/dtype/값의 safetensors 텐서가 있으면 매핑된 텐서로 교체
+    # (bf16 파일을 fp32로 올린 경우처럼 값이 다르면 그대로 둠) -> (교체한 바이트, 전체 바이트)
+    import torch
+
+    directory = getattr(module, "name_or_path", None)
+    if not directory or not os.path.isdir(directory):
+        return 0, 0
+    tensors = {}
+    # 매핑은 모델이 살아 있는 동안 유지되어야 하므로 모델 객체에 붙여 둠 (언로드 시 함께 해제)
+    mappings = module.__dict__.setdefault("_marker_weight_mappings", [])
+    for name in sorted(os.listdir(directory)):
+        if name.endswith(".safetensors"):
+            tensors.update(_map_safetensors(os.path.join(directory, name), mappings))
+    prefix = getattr(module, "base_model_prefix", "")
+    mapped = total = 0
+    with torch.no_grad():
+        for name, tensor in list(module.named_parameters()) + list(module.named_buffers()):
+            size = tensor.numel() * tensor.element_size()
+            total += size
+            source = tensors.get(name)
+            if source is None and prefix:
+                source = tensors.get(f"{prefix}.{name}")
+            if source is None or source.dtype != tensor.dtype or source.shape != tensor.shape:
+                continue
+            if tensor.device.type != "cpu" or not torch.equal(source, tensor.data):
+                continue
+            tensor.data = source
+            mapped += size
+    return mapped, total
+
+
+def map_model_weights(model_dict):
+    # 모든 predictor 모델에 적용 -> {"mapped_bytes": .., "total_bytes": ..}
+    mapped = total = 0
+    for predictor in model_dict.values():
+        model = getattr(predictor, "model", None)
+        if model is None or not hasattr(model, "named_parameters"):
+            continue
+        try:
+            model_mapped, model_total = map_module(model)
+        except Exception:
+            continue  # 매핑 실패 시 이미 로드된 사본을 그대로 사용
+        mapped += model_mapped
+        total += model_total
+    return {"mapped_bytes": mapped, "total_bytes": total}